@@ -1,6 +1,16 @@
+import gc
 import time
 import pyglet
 
+from Scene import Scene
+
+# Подсчёт текстур обходит все объекты (десятки миллисекунд), поэтому только по клавише
+COUNT_KEY = pyglet.window.key.F3
+
+
+def count_textures():
+    return sum(1 for obj in gc.get_objects() if isinstance(obj, pyglet.image.Texture))
+
 
 class FPS:
     def __init__(self, average_time=1.0):
@@ -39,6 +49,7 @@ class Debuger:
         self.update_counter = 0
         self.fps = FPS()
         self.console = ''
+        self.textures = None
 
         self.debug_text = pyglet.text.Label(
             text='',
@@ -65,9 +76,21 @@ class Debuger:
         update_count = f"Updates: {self.update_counter}"
         scene_name = f"Scene: {self.app.scene.__class__.__name__}"
         objects_count = f"Objects: {len(self.app.scene.units)}"
+        scenes = self.app.scenes
+        live_scenes = f"Live scenes: {len(Scene.live)} (history {len(scenes.history)}, pool {len(scenes)})"
+        textures = f"Textures: {'F3 to count' if self.textures is None else self.textures}"
         game_version = f"Version: 0.3-dev"
 
-        self.debug_text.text = f"{fps}\n{time_elapsed}\n{update_count}\n{scene_name}\n{objects_count}\n{game_version}\n\n{self.console}"
+        game_stats = ''
+        state = getattr(self.app.scene, 'state', None)
+        if state is not None:
+            game_stats = "\n".join([f"Turn: {state.turn}", *state.stats.debug_lines()]) + "\n\n"
+
+        self.debug_text.text = f"{fps}\n{time_elapsed}\n{update_count}\n{scene_name}\n{objects_count}\n{live_scenes}\n{textures}\n{game_version}\n\n{game_stats}{self.console}"
+
+    def count_resources(self):
+        '''Пересчитать живые текстуры для отладочной строки'''
+        self.textures = count_textures()
 
     def draw(self):
         self.debug_text.draw()
\ No newline at end of file
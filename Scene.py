@@ -1,17 +1,58 @@
-import xml.etree.ElementTree as ET
-from css_parser import CSSParser
+import weakref
 from ui_element import UIEvents
+from spatial import HitIndex
+from scene_compiler import compile_scene, CACHE_PATH
 
 class Scene(UIEvents):
+    # Команда -> (путь к XML, класс сцены); цели переходов заранее готовит пул сцен
+    transitions = {}
+    # Все созданные и ещё не собранные сборщиком сцены, для отладочного счётчика
+    live = weakref.WeakSet()
+    # Шаблон, из которого собрана сцена, и единицы её текущей раскладки
+    template = None
+    layout_root = None
+
     def __init__(self, app):
         self.app = app
+        self.released = False
+        Scene.live.add(self)
         self.ctx = {}
         self.units = []
+        self.hit_index = HitIndex()
+        self.hovered = None
     
     def attach(self, units):
         self.units = units
+        self.hit_index.clear()
+        self.hovered = None
+        for unit in units:
+            rect = unit.hit_rect() if hasattr(unit, 'hit_rect') else None
+            if rect is not None:
+                self.hit_index.insert(unit, rect)
+                unit.hit_index = self.hit_index
         
+    def release(self):
+        '''Освобождение подписей, фигур и вершин всех элементов; сцена больше не рисуется'''
+        if self.released:
+            return
+        self.released = True
+        for unit in self.units:
+            unit.release()
+        self.units = []
+        self.hit_index.clear()
+        self.hovered = None
+        self.ctx.clear()
+
+    def relayout(self, root_ctx):
+        '''Пересчёт элементов, зависящих от изменившихся единиц (размер окна, масштаб интерфейса)'''
+        if self.template is None or self.released:
+            return 0
+        return self.template.relayout(self, root_ctx)
+
     def execute(self, cmd):
+        if cmd in self.transitions:
+            self.app.switch_scene(self.app.scenes.get(*self.transitions[cmd]))
+            return
         self.app.debuger.log(f'Command executed: <{cmd}>')
 
     def get_record(self):
@@ -38,18 +79,35 @@ class Scene(UIEvents):
         for unit in self.units:
             unit.on_mouse_enter(x, y)
 
-    def on_mouse_leave(self, x, y):
-        for unit in self.units:
-            unit.on_mouse_leave(x, y)
+    def hover(self, x, y):
+        '''Элемент под курсором; уведомляет прежний и новый о смене'''
+        target = self.hit_index.hit(x, y)
+        if target is not self.hovered:
+            if self.hovered is not None:
+                self.hovered.on_mouse_out(x, y)
+            self.hovered = target
+            if target is not None:
+                target.on_mouse_over(x, y)
+        return target
 
     def on_mouse_motion(self, x, y, dx, dy):
+        # Движение получает только элемент под курсором
+        target = self.hover(x, y)
+        if target is not None:
+            target.on_mouse_motion(x, y, dx, dy)
+        self.ctx.update({"on_mouse_motion": (x, y, dx, dy)})
+
+    def on_mouse_leave(self, x, y):
+        if self.hovered is not None:
+            self.hovered.on_mouse_out(x, y)
+            self.hovered = None
         for unit in self.units:
-            unit.on_mouse_motion(x, y, dx, dy)
-            self.ctx.update({"on_mouse_motion": (x, y, dx, dy)})
+            unit.on_mouse_leave(x, y)
 
     def on_mouse_scroll(self, x, y, scroll_x, scroll_y):
-        for unit in self.units:
-            unit.on_mouse_scroll(x, y, scroll_x, scroll_y)
+        target = self.hover(x, y)
+        if target is not None:
+            target.on_mouse_scroll(x, y, scroll_x, scroll_y)
 
     def on_key_press(self, symbol, modifiers):
         for unit in self.units:
@@ -80,8 +138,16 @@ class Scene(UIEvents):
             unit.update(dt)
 
 
+# Множитель rem для настройки interface.size из cfg.json
+INTERFACE_SCALES = {
+    'small': 0.85,
+    'normal': 1.0,
+    'large': 1.2,
+}
+
+
 class SceneConstructor:
-    def __init__(self, app):
+    def __init__(self, app, interface_size='normal'):
         self.app = app
         self.root_ctx = {
             'vw': self.app.width,
@@ -91,18 +157,21 @@ class SceneConstructor:
             "rem": "1vh / 18",
             "em": "1rem"
         }
+        self.configure(interface_size=interface_size)
+
+    def configure(self, width=None, height=None, interface_size=None):
+        '''Новый размер окна или масштаб интерфейса; готовые сцены пересчитываются через Scene.relayout'''
+        if width is not None:
+            self.root_ctx['vw'] = width
+        if height is not None:
+            self.root_ctx['vh'] = height
+        if interface_size is not None:
+            self.interface_size = interface_size
+            self.root_ctx['rem'] = f"1vh / 18 * {INTERFACE_SCALES[interface_size]}"
     
-    def construct_scene(self, path, scene=Scene):
-        self.units = []
-        root = self.load_scene(path)
-        self.create_element(root, self.root_ctx)
-    
-    def load_scene(self, path):
-        tree = ET.parse(path)
-        return tree.getroot()
-
-    def create_element(self, element: ET.ElementTree, parent_properties):
-        if (style:=element.get("style")):
-            css_parser = CSSParser()
-            css_parser.parse_file(style)
-            css_parser.get_stylesheet()
\ No newline at end of file
+    def construct_scene(self, path, scene=Scene, cache_dir=CACHE_PATH):
+        '''Сцена из XML-файла; разбор выполняется один раз, дальше берётся готовый шаблон'''
+        template = compile_scene(path, self.root_ctx, cache_dir)
+        result = scene(self.app)
+        result.attach(template.instantiate(result))
+        return result
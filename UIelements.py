@@ -1,7 +1,7 @@
-import re
-from typing import Any, Dict, Tuple
+from typing import Dict, Tuple
 import xml.etree.ElementTree as ET
 from box_model import *
+from parsers import compile_expression
 import pyglet
 
 class SceneEvents:
@@ -26,6 +26,12 @@ class SceneEvents:
     def on_mouse_scroll(self, x, y, scroll_x, scroll_y):
         """Прокрутка колесика мыши"""
     
+    def on_mouse_over(self, x, y):
+        """Курсор мыши наведён на элемент"""
+    
+    def on_mouse_out(self, x, y):
+        """Курсор мыши ушёл с элемента"""
+    
     def on_key_press(self, symbol, modifiers):
         """Нажатие клавиши"""
     
@@ -46,9 +52,17 @@ class SceneEvents:
     
     def update(self, dt):
         """Обновление элемента"""
+    
+    def release(self):
+        """Освобождение ресурсов видеокарты"""
 
 class UIElement(SceneEvents):
     '''Базовый UIElement с поддержкой BoxModel'''
+    # Индекс попаданий сцены, назначается в Scene.attach
+    hit_index = None
+    # Умеет ли элемент переместиться через move(); иначе при смене единиц он пересоздаётся
+    movable = False
+
     def __init__(self, element: ET.Element, extra: Dict=None, ctx: Dict=None):
         x = element.get('x', ctx.get('x', '0.5vw'))
         y = element.get('y', ctx.get('y', '0.5vh'))
@@ -84,28 +98,10 @@ class UIElement(SceneEvents):
     
     @staticmethod
     def _parse_expression(expression: str, ctx: Dict):
-        def replace_units(match):
-            value = match.group(1) or '1'
-            unit = match.group(2)
-
-            if unit == 'px':
-                return value
-            elif unit in ['vh','vw', 'em', 'rem', '%']:
-                return f'{value}*{ctx[unit]}'
-            else:
-                return match.group(0)
-    
-        allowed_names = {
-        'min': min,
-        'max': max,
-        'abs': abs,
-        'round': round,
-        }
-    
-        pattern = r'([\d.]*\.?\d+)(px|vw|vh|em|rem|%)'
-        processed_expr = re.sub(pattern, replace_units, expression)
-        
-        return eval(processed_expr, {'__builtins__': None}, allowed_names)
+        if not isinstance(expression, str):
+            # Уже вычислено компилятором сцены
+            return expression
+        return compile_expression(expression)(ctx)
     
     def is_visible(self):
         return self._visible
@@ -116,18 +112,40 @@ class UIElement(SceneEvents):
     def set_unvisible(self):
         self._visible = False
         
+    def hit_rect(self):
+        """Прямоугольник (left, bottom, right, top) для поиска элемента под курсором, None — не интерактивен"""
+        return None
+
+    def release(self):
+        """Удаление вершин всех подписей и фигур элемента"""
+        for value in vars(self).values():
+            _delete_graphics(value)
+
     def move(self, dx: float, dy: float):
         """Метод для обработки перемещения от BoxModel"""
         self._x += dx
         self._y += dy
         self._update_position()
+        if self.hit_index is not None:
+            self.hit_index.update(self, self.hit_rect())
         
     def _update_position(self):
         """Обновление позиции элемента (переопределяется в наследниках)"""
         pass
 
+def _delete_graphics(value):
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            _delete_graphics(item)
+    elif isinstance(value, OutlinedRectangle):
+        _delete_graphics(value.lines)
+    elif isinstance(value, (pyglet.text.layout.TextLayout, pyglet.shapes.ShapeBase)):
+        value.delete()
+
 class TextUIElement(UIElement):
     """Простой однострочный текст, написанный на экране"""
+    movable = True
+
     def __init__(self, element: ET.Element, extra: Dict=None, ctx: Dict=None):
         super().__init__(element, extra=extra, ctx=ctx)
 
@@ -214,12 +232,13 @@ class ButtonUIElement(TextUIElement):
         if element.get('active', ctx.get(element.get('active', 'True'))) == "False":
             self.color_manager.set_active(False)
         
-    def check_hover(self, x: int, y: int) -> bool:
+    def hit_rect(self):
         left = self._x - (self.label.content_width * {'left': 0, 'center': 0.5, 'right': 1}[self._anchor_x])
-        right = left + self.label.content_width
         bottom = self._y - (self.label.content_height * {'baseline': 0, 'center': 0.5, 'top': 1}[self._anchor_y])
-        top = bottom + self.label.content_height
-        
+        return left, bottom, left + self.label.content_width, bottom + self.label.content_height
+
+    def check_hover(self, x: int, y: int) -> bool:
+        left, bottom, right, top = self.hit_rect()
         self.is_hovered = (left <= x <= right) and (bottom <= y <= top)
         return self.is_hovered
     
@@ -227,6 +246,9 @@ class ButtonUIElement(TextUIElement):
         super().on_mouse_motion(x, y, dx, dy)
         
         self.check_hover(x, y)
+
+    def on_mouse_out(self, x, y):
+        self.is_hovered = False
         
         
     def on_mouse_press(self, x, y, button, modifiers):
@@ -280,6 +302,8 @@ class CheckButton(UIElement):
         self.frame_color = self._parse_color(element.get('frame_color', ctx.get('frame_color', '#ffffff')))
         self.color = self._parse_color(element.get('color', ctx.get('color', '#ffffff')))
         self.checked = False
+        # Движение мыши получает только элемент под курсором, поэтому начальное значение нужно здесь
+        self.is_hovered = False
         hover_color = self._parse_color(element.get('hover_color', ctx.get('hover_color', '#ffffff')))
         self.frame_color_manager = ColorManager(self, self.frame_color, hover_color)
         
@@ -320,13 +344,18 @@ class CheckButton(UIElement):
         for line in self.check_vertices:
             line.visible = self.checked
     
-    def on_mouse_motion(self, x, y, dx, dy):
+    def hit_rect(self):
         half = self.size / 2
         btn_x = self._x - {'left': 0, 'center': half, 'right': self.size}[self._anchor_x]
         btn_y = self._y - {'bottom': 0, 'center': half, 'top': self.size}[self._anchor_y]
-    
-        self.is_hovered = (btn_x <= x <= btn_x + self.size and 
-            btn_y <= y <= btn_y + self.size)
+        return btn_x, btn_y, btn_x + self.size, btn_y + self.size
+
+    def on_mouse_motion(self, x, y, dx, dy):
+        btn_x, btn_y, right, top = self.hit_rect()
+        self.is_hovered = (btn_x <= x <= right and btn_y <= y <= top)
+
+    def on_mouse_out(self, x, y):
+        self.is_hovered = False
     
     def on_mouse_press(self, x, y, button, modifiers):
         
@@ -348,6 +377,9 @@ class CheckButton(UIElement):
 
 class Entry(TextUIElement):
     """Поле ввода текста с улучшенным управлением"""
+    # Линия и курсор за подписью не перемещаются
+    movable = False
+
     def __init__(self, element: ET.Element, extra: Dict=None, ctx: Dict=None):
         super().__init__(element, extra=extra, ctx=ctx)
         
@@ -400,6 +432,11 @@ class Entry(TextUIElement):
             anchor_y='center'
         )
         return test_label.content_width
+
+    def hit_rect(self):
+        text_height = self.label.font_size/2
+        return (self._x - self.line_width/2, self._y - text_height,
+                self._x + self.line_width/2, self._y + text_height)
         
     def on_mouse_press(self, x, y, button, modifiers):
         
@@ -646,9 +683,17 @@ class RangeSlider(UIElement):
             return True
         return False
     
+    def hit_rect(self):
+        reach = max(self.thumb_radius, self.height/2)
+        return (self._x - self.width/2 - reach, self._y - reach,
+                self._x + self.width/2 + reach, self._y + reach)
+
     def on_mouse_motion(self, x, y, dx, dy):
         thumb_x = self._x - self.width/2 + self.value * self.width
         self.is_hovered = ((x - thumb_x) ** 2 + (y - self._y) ** 2) ** 0.5 <= self.thumb_radius
+
+    def on_mouse_out(self, x, y):
+        self.is_hovered = False
         
     def get(self):
         return self.value
@@ -746,6 +791,15 @@ class SelectorInRow(UIElement):
             
         return False
     
+    def hit_rect(self):
+        reach = self.label.font_size + self.max_width/2 + self.arrow_size
+        return (self._x - reach, self._y - self.arrow_size/2,
+                self._x + reach, self._y + self.arrow_size/2)
+
+    def on_mouse_out(self, x, y):
+        self.left_hover = False
+        self.right_hover = False
+
     def on_mouse_motion(self, x, y, dx, dy):
         # Проверка левой стрелки
         left_triangle = [
@@ -0,0 +1,448 @@
+import numpy as np
+import pyglet
+from pyglet import gl
+from pyglet.graphics.shader import Shader, ShaderProgram
+from typing import Optional, Sequence, Tuple
+
+from engine.board import Board
+from spatial import ChunkGrid, boxes_intersect
+
+
+PLAYER_COLORS = ('#e74c3c', '#3498db', '#2ecc71', '#f1c40f', '#9b59b6', '#e67e22', '#1abc9c', '#ecf0f1')
+NEUTRAL_COLOR = '#5a5a5a'
+EDGE_COLOR = '#3c3c3c'
+
+# Доля радиуса у пустой клетки, остальное добирается энергией
+MIN_RADIUS = 0.55
+
+# Насколько клетка под курсором светлее обычной
+HIGHLIGHT = 0.35
+
+# Радиус клетки на экране в пикселях, ниже которого рёбра скрываются,
+# а ниже второго порога клетки заменяются цветными квадратами чанков
+LOD_EDGE_PX = 4.0
+LOD_CELL_PX = 1.5
+
+_VERTEX_SOURCE = """#version 150 core
+    in vec2 position;
+    in vec2 corner;
+    in float size;
+    in vec4 colors;
+
+    out vec4 vertex_colors;
+    out vec2 local;
+
+    uniform WindowBlock
+    {
+        mat4 projection;
+        mat4 view;
+    } window;
+
+    void main()
+    {
+        gl_Position = window.projection * window.view * vec4(position + corner * size, 0.0, 1.0);
+        vertex_colors = colors;
+        local = corner;
+    }
+"""
+
+_FRAGMENT_SOURCE = """#version 150 core
+    in vec4 vertex_colors;
+    in vec2 local;
+
+    out vec4 final_colors;
+
+    void main()
+    {
+        float r = length(local);
+        if (r > 1.0) {
+            discard;
+        }
+        final_colors = vec4(vertex_colors.rgb * (1.0 - 0.35 * smoothstep(0.75, 1.0, r)), vertex_colors.a);
+    }
+"""
+
+# Квадрат клетки — два треугольника по три вершины; без индексного буфера
+# сборка миллиона клеток не упирается в построение списков индексов в pyglet
+_CORNERS = np.array([(-1, -1), (1, -1), (1, 1), (-1, -1), (1, 1), (-1, 1)], dtype=np.float32)
+VERTICES_PER_QUAD = len(_CORNERS)
+
+_program = None
+
+
+def get_board_shader() -> ShaderProgram:
+    """Get the shader program of the board, compiled once per process."""
+    global _program
+    if _program is None:
+        _program = ShaderProgram(Shader(_VERTEX_SOURCE, 'vertex'), Shader(_FRAGMENT_SOURCE, 'fragment'))
+    return _program
+
+
+def _write_vertices(vertex_list, name: str, rows: np.ndarray, values: np.ndarray):
+    """
+    Overwrite one attribute of some vertices in the client-side buffer.
+
+    Only the span from the first to the last row is marked dirty, so pyglet
+    uploads it with one ``glBufferSubData`` on the next draw. This goes
+    through pyglet 2.1 buffer internals, pinned in ``requirements.txt``: the
+    public attribute slices mark the whole list dirty.
+
+    Args:
+        vertex_list: The vertex list to write into.
+        name: The attribute name.
+        rows: Sorted vertex ids inside the list.
+        values: One row of attribute values per vertex.
+    """
+    buffer = vertex_list.domain.attrib_name_buffers[name]
+    data = np.ctypeslib.as_array(buffer.data).reshape(-1, buffer.count)
+    data[vertex_list.start + rows] = values.reshape(len(rows), -1)
+    buffer.invalidate_region(vertex_list.start + int(rows[0]), int(rows[-1] - rows[0]) + 1)
+
+
+def _draw_ranges(vertex_list, mode: int, first: np.ndarray, count: np.ndarray):
+    """
+    Draw some vertex ranges of a list with one ``glMultiDrawArrays``.
+
+    Args:
+        vertex_list: The vertex list to draw from.
+        mode: The OpenGL primitive mode.
+        first: int32 first vertex of every range inside the list.
+        count: int32 number of vertices of every range.
+    """
+    if not len(first):
+        return
+    domain = vertex_list.domain
+    domain.vao.bind()
+    for buffer, _ in domain.buffer_attributes:
+        buffer.commit()
+    first = np.ascontiguousarray(first + vertex_list.start, dtype=np.int32)
+    gl.glMultiDrawArrays(mode, (gl.GLint * len(first)).from_buffer(first),
+                         (gl.GLsizei * len(count)).from_buffer(count), len(first))
+
+
+def _chunk_runs(mask: np.ndarray, starts: np.ndarray, counts: np.ndarray,
+                per_item: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the vertex ranges of the masked chunks, touching ranges merged.
+
+    Args:
+        mask: The chunks to draw.
+        starts: First item of every chunk in the vertex list.
+        counts: Number of items of every chunk.
+        per_item: Vertices per item.
+
+    Returns:
+        int32 arrays ``(first, count)`` for :func:`_draw_ranges`.
+    """
+    keep = mask & (counts > 0)
+    first, length = starts[keep] * per_item, counts[keep] * per_item
+    if not len(first):
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+    heads = np.concatenate(([0], np.flatnonzero(first[1:] != first[:-1] + length[:-1]) + 1))
+    return first[heads].astype(np.int32), np.add.reduceat(length, heads).astype(np.int32)
+
+
+def _quad_rows(items: np.ndarray) -> np.ndarray:
+    """Get the vertex ids of quads ``items`` in a list of ``VERTICES_PER_QUAD`` vertices per quad."""
+    return (items[:, None] * VERTICES_PER_QUAD + np.arange(VERTICES_PER_QUAD)).ravel()
+
+
+def hex_to_rgba(color: str) -> Tuple[int, int, int, int]:
+    """Convert ``#rrggbb`` into an RGBA tuple."""
+    color = color.lstrip('#')
+    return int(color[0:2], 16), int(color[2:4], 16), int(color[4:6], 16), 255
+
+
+class BoardRenderer:
+    """
+    Draws the whole board from one vertex list per layer and updates it in place.
+
+    The board is split into chunks by a :class:`ChunkGrid`. All cells are
+    quads of two triangles in one vertex list, cut into discs by the
+    fragment shader, and all edges are lines in a second list; both are
+    laid out chunk by chunk, so a chunk is one contiguous vertex range. All
+    lists are allocated once. After a move only the colour and size
+    attributes of the changed cells are rewritten straight in the
+    client-side copy of the vertex buffers, and pyglet uploads the dirty
+    range on the next draw.
+
+    :meth:`update_view` turns the chunks that overlap the camera into merged
+    vertex ranges, and :meth:`draw` submits each layer with a single
+    ``glMultiDrawArrays`` over them, so the frame costs one draw call per
+    layer however many chunks are visible. When cells get smaller than a few
+    pixels the edges are hidden, and below that the cells are replaced with
+    one quad per chunk coloured by the mix of its owners.
+
+    Positions stay in map coordinates; the window view matrix maps them to
+    the screen.
+
+    Attributes:
+        board (Board): The drawn board.
+        positions (np.ndarray): Cell centres, shape ``(n_cells, 2)``.
+        radius (float): Radius of a full cell in map units.
+        grid (ChunkGrid): The chunks of the board.
+        level (int): The current level of detail: 2 cells and edges, 1 cells
+            only, 0 chunk quads.
+        highlight (Optional[int]): The cell drawn lighter, e.g. under the cursor.
+    """
+
+    def __init__(self, board: Board, positions: np.ndarray,
+                 player_colors: Sequence[str] = PLAYER_COLORS, radius: Optional[float] = None):
+        """
+        Build the vertex lists of the board.
+
+        Args:
+            board: The board to draw.
+            positions: Cell centres in map units.
+            player_colors: Colours of the players as ``#rrggbb``.
+            radius: Radius of a full cell, derived from edge lengths if omitted.
+        """
+        self.board = board
+        self.positions = np.ascontiguousarray(positions, dtype=np.float32).reshape(board.n_cells, 2)
+        # Пакет только хранит вершины: слои рисуются сами, по видимым диапазонам
+        self._storage = pyglet.graphics.Batch()
+
+        colors = [hex_to_rgba(color) for color in player_colors]
+        if len(colors) < board.n_players:
+            raise ValueError(f"Not enough player colors for {board.n_players} players")
+        # Последняя строка палитры — нейтральный цвет, owner = -1 попадает в неё
+        self.palette = np.array(colors[:board.n_players] + [hex_to_rgba(NEUTRAL_COLOR)], dtype=np.uint8)
+
+        edges = board.edges()
+        self.radius = radius if radius is not None else self._default_radius(edges)
+        self.grid = ChunkGrid(self.positions, self.radius)
+        self.level = 2
+        self.highlight = None
+
+        # Что сейчас нарисовано: при анимации волн отстаёт от доски
+        self._drawn_owner = board.owner.astype(np.int64) % len(self.palette)
+        self._drawn_energy = board.energy.astype(np.int64)
+
+        program = get_board_shader()
+        self._edge_group = pyglet.graphics.ShaderGroup(program, order=0)
+        self._cell_group = pyglet.graphics.ShaderGroup(program, order=1)
+        self._lod_group = pyglet.graphics.ShaderGroup(program, order=2)
+
+        self._edges = None
+        self._cell_shown = np.ones(self.grid.n_chunks, dtype=bool)
+        self._edge_shown = np.ones(self.grid.n_chunks, dtype=bool)
+        self._build_cells(program)
+        self._build_edges(program, edges)
+        self._build_lod(program)
+        self._cell_runs = _chunk_runs(self._cell_shown, self.grid.starts, self.grid.counts,
+                                      VERTICES_PER_QUAD)
+        self._edge_runs = _chunk_runs(self._edge_shown, self._edge_starts, self._edge_counts, 2)
+        self.refresh()
+
+    def _default_radius(self, edges: np.ndarray) -> float:
+        if not len(edges):
+            return 0.5
+        lengths = np.linalg.norm(self.positions[edges[:, 0]] - self.positions[edges[:, 1]], axis=1)
+        return 0.35 * float(np.median(lengths)) or 0.5
+
+    def _build_cells(self, program: ShaderProgram):
+        """All cells in one list in chunk order; ``_quad`` maps a cell to its quad."""
+        grid = self.grid
+        cells = grid.order
+        self._quad = np.empty(len(cells), dtype=np.int64)
+        self._quad[cells] = np.arange(len(cells))
+        count = VERTICES_PER_QUAD * len(cells)
+        self._cells = program.vertex_list(
+            max(count, VERTICES_PER_QUAD), gl.GL_TRIANGLES, self._storage, self._cell_group,
+            position='f', corner='f', size='f', colors='Bn')
+        if count:
+            rows = np.arange(count)
+            _write_vertices(self._cells, 'position', rows,
+                            np.repeat(self.positions[cells], VERTICES_PER_QUAD, axis=0))
+            _write_vertices(self._cells, 'corner', rows, np.tile(_CORNERS, (len(cells), 1)))
+
+    def _build_edges(self, program: ShaderProgram, edges: np.ndarray):
+        """Put each edge into the chunk of its first cell, with per-chunk boxes over both ends."""
+        grid = self.grid
+        self._edge_boxes = np.empty((grid.n_chunks, 4))
+        self._edge_boxes[:] = (np.inf, np.inf, -np.inf, -np.inf)
+        self._edge_counts = np.zeros(grid.n_chunks, dtype=np.int64)
+        self._edge_starts = np.zeros(grid.n_chunks, dtype=np.int64)
+        if not len(edges):
+            return
+        chunk_of = grid.chunk_of[edges[:, 0]]
+        edges = edges[np.argsort(chunk_of, kind='stable')]
+        chunk_of = grid.chunk_of[edges[:, 0]]
+        counts = np.bincount(chunk_of, minlength=grid.n_chunks)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        self._edge_counts, self._edge_starts = counts, starts
+
+        ends = self.positions[edges]
+        filled = counts > 0
+        low, high = ends.min(axis=1), ends.max(axis=1)
+        for axis in range(2):
+            self._edge_boxes[filled, axis] = np.minimum.reduceat(low[:, axis], starts[filled])
+            self._edge_boxes[filled, axis + 2] = np.maximum.reduceat(high[:, axis], starts[filled])
+
+        color = np.array(hex_to_rgba(EDGE_COLOR), dtype=np.uint8)
+        part = ends.reshape(-1, 2)
+        self._edges = program.vertex_list(
+            len(part), gl.GL_LINES, self._storage, self._edge_group,
+            position='f', corner='f', size='f', colors='Bn')
+        rows = np.arange(len(part))
+        _write_vertices(self._edges, 'position', rows, part)
+        _write_vertices(self._edges, 'corner', rows, np.zeros((len(part), 2), dtype=np.float32))
+        _write_vertices(self._edges, 'size', rows, np.zeros(len(part), dtype=np.float32))
+        _write_vertices(self._edges, 'colors', rows, np.tile(color, (len(part), 1)))
+
+    def _build_lod(self, program: ShaderProgram):
+        """One flat quad per non-empty chunk, coloured by the mix of its owners."""
+        grid = self.grid
+        self._lod_chunks = np.flatnonzero(grid.counts)
+        self._lod_slot = np.full(grid.n_chunks, -1, dtype=np.int64)
+        self._lod_slot[self._lod_chunks] = np.arange(len(self._lod_chunks))
+
+        n_colors = len(self.palette)
+        self._owner_counts = np.bincount(
+            grid.chunk_of * n_colors + self._drawn_owner,
+            minlength=grid.n_chunks * n_colors).reshape(grid.n_chunks, n_colors)
+
+        count = VERTICES_PER_QUAD * len(self._lod_chunks)
+        rects = grid.rects()[self._lod_chunks]
+        centre = (rects[:, None, :2] + rects[:, None, 2:]) / 2
+        corners = centre + _CORNERS * grid.step / 2
+        self._lod = program.vertex_list(
+            max(count, VERTICES_PER_QUAD), gl.GL_TRIANGLES, self._storage, self._lod_group,
+            position='f', corner='f', size='f', colors='Bn')
+        rows = np.arange(count)
+        _write_vertices(self._lod, 'position', rows, corners.reshape(-1, 2).astype(np.float32))
+        _write_vertices(self._lod, 'corner', rows, np.zeros((count, 2), dtype=np.float32))
+        _write_vertices(self._lod, 'size', rows, np.zeros(count, dtype=np.float32))
+        self._update_lod(self._lod_chunks)
+
+    def _update_lod(self, chunks: np.ndarray):
+        counts = self._owner_counts[chunks]
+        mix = counts @ self.palette[:, :3].astype(np.float64) / np.maximum(counts.sum(axis=1, keepdims=True), 1)
+        colors = np.concatenate((mix.round().astype(np.uint8), np.full((len(chunks), 1), 255, np.uint8)), axis=1)
+        slots = self._lod_slot[chunks]
+        _write_vertices(self._lod, 'colors', _quad_rows(slots), np.repeat(colors, VERTICES_PER_QUAD, axis=0))
+
+    def _cell_attributes(self, cells: np.ndarray, owner: np.ndarray,
+                         energy: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the RGBA colours and radii of some cells with the given owners and energy."""
+        colors = self.palette[owner]
+        if self.highlight is not None:
+            lit = cells == self.highlight
+            colors[lit, :3] += ((255 - colors[lit, :3]) * HIGHLIGHT).astype(np.uint8)
+        fill = energy / (self.board.capacity[cells] + 1.0)
+        sizes = self.radius * (MIN_RADIUS + (1 - MIN_RADIUS) * np.clip(fill, 0.0, 1.0))
+        return colors, sizes.astype(np.float32)
+
+    def update_cells(self, cells):
+        """
+        Redraw cells whose owner or energy has changed.
+
+        Args:
+            cells: Ids of the changed cells, e.g. ``CascadeResult.touched``.
+        """
+        cells = np.unique(np.asarray(cells, dtype=np.int64))
+        self.apply_changes(cells, self.board.owner[cells], self.board.energy[cells])
+
+    def apply_changes(self, cells: np.ndarray, owner: np.ndarray, energy: np.ndarray):
+        """
+        Draw cells with the given state instead of reading it from the board.
+
+        Used to play back a :class:`engine.cascade.ChangeLog` wave by wave.
+
+        Args:
+            cells: Unique ids of the cells.
+            owner: Their owners.
+            energy: Their energy.
+        """
+        grid = self.grid
+        cells = np.asarray(cells, dtype=np.int64)
+        if not len(cells):
+            return
+
+        # Клетки сортируются по месту в списке вершин
+        order = np.argsort(self._quad[cells])
+        cells = cells[order]
+        owner = np.asarray(owner, dtype=np.int64)[order] % len(self.palette)
+        energy = np.asarray(energy, dtype=np.int64)[order]
+        chunk_of = grid.chunk_of[cells]
+        colors, sizes = self._cell_attributes(cells, owner, energy)
+        rows = _quad_rows(self._quad[cells])
+        _write_vertices(self._cells, 'colors', rows, np.repeat(colors, VERTICES_PER_QUAD, axis=0))
+        _write_vertices(self._cells, 'size', rows, np.repeat(sizes, VERTICES_PER_QUAD))
+
+        n_colors = len(self.palette)
+        old, new = self._drawn_owner[cells], owner
+        self._drawn_energy[cells] = energy
+        changed = old != new
+        if changed.any():
+            flat = self._owner_counts.reshape(-1)
+            np.subtract.at(flat, chunk_of[changed] * n_colors + old[changed], 1)
+            np.add.at(flat, chunk_of[changed] * n_colors + new[changed], 1)
+            self._drawn_owner[cells] = new
+            self._update_lod(np.unique(chunk_of[changed]))
+
+    def set_highlight(self, cell: Optional[int]):
+        """Draw one cell lighter than the rest, or none with None."""
+        if cell == self.highlight:
+            return
+        changed = np.array([c for c in (self.highlight, cell) if c is not None], dtype=np.int64)
+        self.highlight = cell
+        self.apply_changes(changed, self._drawn_owner[changed], self._drawn_energy[changed])
+
+    def refresh(self):
+        """Redraw every cell, e.g. after the board was restored from a save."""
+        self.update_cells(np.arange(self.board.n_cells))
+
+    def update_view(self, camera):
+        """
+        Pick the level of detail and the vertex ranges of the chunks in view.
+
+        The ranges are rebuilt only when the set of visible chunks changes,
+        so a still camera costs one vectorized box test over the chunks.
+
+        Args:
+            camera: The :class:`camera.Camera` the board is drawn with.
+        """
+        pixels = camera.zoom * self.radius
+        self.level = 2 if pixels >= LOD_EDGE_PX else 1 if pixels >= LOD_CELL_PX else 0
+        if self.level == 0:
+            return
+
+        rect = camera.visible_rect()
+        mask = self.grid.visible(rect)
+        if not np.array_equal(mask, self._cell_shown):
+            self._cell_shown = mask
+            self._cell_runs = _chunk_runs(mask, self.grid.starts, self.grid.counts, VERTICES_PER_QUAD)
+        if self.level == 2:
+            mask = boxes_intersect(self._edge_boxes, rect)
+            if not np.array_equal(mask, self._edge_shown):
+                self._edge_shown = mask
+                self._edge_runs = _chunk_runs(mask, self._edge_starts, self._edge_counts, 2)
+
+    def bounds(self) -> Tuple[float, float, float, float]:
+        """Get ``(left, bottom, right, top)`` of the board including cell radii."""
+        if not self.board.n_cells:
+            return 0.0, 0.0, 1.0, 1.0
+        low = self.positions.min(axis=0) - self.radius
+        high = self.positions.max(axis=0) + self.radius
+        return float(low[0]), float(low[1]), float(high[0]), float(high[1])
+
+    def draw(self):
+        """Draw the current level of detail, one draw call per layer."""
+        program = get_board_shader()
+        program.use()
+        if self.level == 0:
+            count = VERTICES_PER_QUAD * len(self._lod_chunks)
+            _draw_ranges(self._lod, gl.GL_TRIANGLES, np.zeros(1, dtype=np.int32),
+                         np.array([count], dtype=np.int32))
+        else:
+            if self.level == 2 and self._edges is not None:
+                _draw_ranges(self._edges, gl.GL_LINES, *self._edge_runs)
+            _draw_ranges(self._cells, gl.GL_TRIANGLES, *self._cell_runs)
+        program.stop()
+
+    def delete(self):
+        """Release the vertex lists."""
+        for vertex_list in (self._cells, self._edges, self._lod):
+            if vertex_list is not None:
+                vertex_list.delete()
@@ -0,0 +1,129 @@
+from pyglet.math import Mat4, Vec3, Vec4
+from typing import Tuple
+
+
+class Camera:
+    """
+    2D camera over world-space content.
+
+    The camera is a view matrix applied at draw time: panning and zooming
+    change a few numbers instead of moving every drawn element, so their cost
+    does not depend on the size of the board. Input goes the other way
+    through :meth:`screen_to_world`.
+
+    Attributes:
+        width (int): Width of the viewport in pixels.
+        height (int): Height of the viewport in pixels.
+        x (float): World point shown at the viewport centre.
+        y (float): World point shown at the viewport centre.
+        zoom (float): Pixels per world unit.
+        min_zoom (float): Lower bound of ``zoom``.
+        max_zoom (float): Upper bound of ``zoom``.
+    """
+
+    def __init__(self, width: int, height: int, x: float = 0.0, y: float = 0.0, zoom: float = 1.0,
+                 min_zoom: float = 1e-4, max_zoom: float = 1e4):
+        """
+        Initialize the camera.
+
+        Args:
+            width: Width of the viewport in pixels.
+            height: Height of the viewport in pixels.
+            x: World point shown at the viewport centre.
+            y: World point shown at the viewport centre.
+            zoom: Pixels per world unit.
+            min_zoom: Lower bound of the zoom.
+            max_zoom: Upper bound of the zoom.
+        """
+        self.width, self.height = width, height
+        self.x, self.y = x, y
+        self.min_zoom, self.max_zoom = min_zoom, max_zoom
+        self.zoom = self._clamp(zoom)
+        self._view = None
+        self._key = None
+
+    def _clamp(self, zoom: float) -> float:
+        return min(max(zoom, self.min_zoom), self.max_zoom)
+
+    @property
+    def view(self) -> Mat4:
+        """Get the view matrix, rebuilt only after the camera has moved."""
+        key = (self.x, self.y, self.zoom, self.width, self.height)
+        if key != self._key:
+            self._key = key
+            self._view = (Mat4.from_translation(Vec3(self.width / 2, self.height / 2, 0))
+                          @ Mat4.from_scale(Vec3(self.zoom, self.zoom, 1))
+                          @ Mat4.from_translation(Vec3(-self.x, -self.y, 0)))
+        return self._view
+
+    def screen_to_world(self, x: float, y: float) -> Tuple[float, float]:
+        """Convert window coordinates into world coordinates."""
+        return (self.x + (x - self.width / 2) / self.zoom,
+                self.y + (y - self.height / 2) / self.zoom)
+
+    def world_to_screen(self, x: float, y: float) -> Tuple[float, float]:
+        """Convert world coordinates into window coordinates."""
+        point = self.view @ Vec4(x, y, 0, 1)
+        return point.x, point.y
+
+    def visible_rect(self) -> Tuple[float, float, float, float]:
+        """Get ``(left, bottom, right, top)`` of the world area in the viewport."""
+        left, bottom = self.screen_to_world(0, 0)
+        right, top = self.screen_to_world(self.width, self.height)
+        return left, bottom, right, top
+
+    def resize(self, width: int, height: int):
+        """Change the viewport size keeping the centre point."""
+        self.width, self.height = width, height
+
+    def pan(self, dx: float, dy: float):
+        """Move the content by a distance in pixels, e.g. the mouse drag delta."""
+        self.x -= dx / self.zoom
+        self.y -= dy / self.zoom
+
+    def zoom_at(self, x: float, y: float, factor: float):
+        """
+        Scale the view keeping one screen point over the same world point.
+
+        Args:
+            x: Window coordinate of the fixed point, usually the cursor.
+            y: Window coordinate of the fixed point.
+            factor: Zoom multiplier, above 1 to zoom in.
+        """
+        wx, wy = self.screen_to_world(x, y)
+        self.zoom = self._clamp(self.zoom * factor)
+        self.x = wx - (x - self.width / 2) / self.zoom
+        self.y = wy - (y - self.height / 2) / self.zoom
+
+    def fit(self, left: float, bottom: float, right: float, top: float, margin: float = 0.05):
+        """Center a world rectangle in the viewport and zoom to show all of it."""
+        self.x, self.y = (left + right) / 2, (bottom + top) / 2
+        scale = (1 - 2 * margin) * min(self.width / max(right - left, 1e-9),
+                                       self.height / max(top - bottom, 1e-9))
+        self.zoom = self._clamp(scale)
+
+    def apply(self, window) -> '_CameraView':
+        """
+        Get a context manager that sets the window view to this camera.
+
+        Example::
+
+            with camera.apply(window):
+                batch.draw()
+        """
+        return _CameraView(self, window)
+
+
+class _CameraView:
+    def __init__(self, camera: Camera, window):
+        self.camera = camera
+        self.window = window
+        self._saved = None
+
+    def __enter__(self):
+        self._saved = self.window.view
+        self.window.view = self.camera.view
+        return self.camera
+
+    def __exit__(self, *exc):
+        self.window.view = self._saved
@@ -5,4 +5,5 @@ with open("cfg.json", 'r', encoding="utf-8") as file:
     data = json.load(file)
     
 background =  data["default_settings"]["graphics"]["background"]
-debug = data["debug"]
\ No newline at end of file
+debug = data["debug"]
+interface_size = data["default_settings"]["interface"]["size"]
@@ -0,0 +1,25 @@
+"""
+Headless engine of Graph of energy cells.
+
+The board and the rules are plain NumPy arrays and functions with no
+dependency on pyglet, so the same code drives the game window, a server,
+bots and benchmarks.
+"""
+
+from .board import Board, NEUTRAL, edges_to_csr
+from .state import GameState
+from .journal import MoveJournal
+from .cascade import CascadeResult, ChangeLog, resolve_cascade, play_move, gather_neighbours
+from .stats import PlayerStats
+from .zobrist import ZobristKeys
+from .transposition import TranspositionTable, TTEntry, EXACT, LOWER, UPPER, NO_MOVE
+from .evaluation import Evaluator, FEATURES, DEFAULT_WEIGHTS
+from .search import AlphaBetaBot, SearchLimits, SearchResult, DIFFICULTIES, evaluate
+from .mcts import MCTSBot, MCTSResult, SearchTree, PlayoutState, grow_tree
+from .ai_host import AIHost
+from .batch import BatchSimulator, BatchResults, random_policy, NO_WINNER
+from .replay import ReplayWriter, ReplayReader, ReplayHeader, read_header
+from .distances import DistanceTable, distance_table, bfs_distances, nearest_distance
+from .symmetry import Symmetry, find_automorphisms, map_symmetry
+from .mapfile import MapFile, load_map, save_map, convert_xml
+from .generator import generate, generate_map, FAMILIES
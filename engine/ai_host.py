@@ -0,0 +1,240 @@
+import itertools
+import multiprocessing
+from typing import Optional
+
+from .search import AlphaBetaBot, SearchResult, DIFFICULTIES, INF
+from .state import GameState
+from .transposition import TranspositionTable, NO_MOVE
+
+
+class _Worker:
+    """The loop of the search process: runs one search at a time and streams its progress."""
+
+    def __init__(self, conn, bot: AlphaBetaBot):
+        self.conn = conn
+        self.bot = bot
+        self.job = None
+        self.pending = None
+        self.closed = False
+
+    def run(self):
+        while not self.closed:
+            command, self.pending = self.pending or self.conn.recv(), None
+            kind = command[0]
+            if kind == 'search':
+                _, job, state, seconds = command
+                self._search(job, state, seconds)
+            elif kind == 'ponder':
+                _, job, state = command
+                self._ponder(job, state)
+            elif kind == 'close':
+                self.closed = True
+            # Остальные команды относятся к уже закончившимся поискам
+
+    def _search(self, job: int, state: GameState, seconds: float):
+        self.job = job
+        limits = self.bot.limits._replace(time=seconds)
+        result = self.bot.choose_move(
+            state, limits,
+            on_iteration=lambda best: self.conn.send(('progress', job, best)),
+            should_stop=self._should_stop)
+        self.job = None
+        self.conn.send(('done', job, result))
+
+    def _ponder(self, job: int, state: GameState):
+        # Ожидаемый ответ соперника берётся из таблицы прошлого поиска
+        key, frame = state.canonical_key()
+        entry = self.bot.tt.probe(key)
+        move = state.from_canonical(entry.move, frame) if entry is not None else NO_MOVE
+        if move == NO_MOVE or not state.is_legal(move):
+            moves = state.legal_moves()
+            if not len(moves):
+                self.conn.send(('done', job, None))
+                return
+            move = int(moves[0])
+        child = state.copy()
+        child.play(move)
+        self.conn.send(('ponder', job, move, child.hash))
+        self._search(job, child, INF)
+
+    def _should_stop(self) -> bool:
+        while self.conn.poll():
+            command = self.conn.recv()
+            kind = command[0]
+            if kind in ('search', 'ponder', 'close'):
+                self.pending = command
+                return True
+            if command[1] != self.job:
+                continue
+            if kind == 'stop':
+                return True
+            if kind == 'extend':
+                self.bot.extend(command[2])
+            elif kind == 'budget':
+                self.bot.set_budget(command[2])
+        return False
+
+
+def _serve(conn, limits, tt_buckets: int):
+    """Entry point of the search process."""
+    bot = AlphaBetaBot(limits, TranspositionTable(tt_buckets))
+    try:
+        _Worker(conn, bot).run()
+    except (EOFError, KeyboardInterrupt):
+        pass
+
+
+class AIHost:
+    """
+    Alpha-beta bot running in its own process.
+
+    Searches never block the caller: :meth:`start` sends the position to the
+    worker and returns at once, and :meth:`poll` picks up the best move so
+    far, which the worker sends after every finished iteration. A search can
+    be stopped, cancelled or given more time while it runs.
+
+    On the opponent's turn :meth:`ponder` lets the worker guess the reply
+    from its transposition table and search the position after it. If the
+    guess is played, :meth:`start` turns the running ponder search into the
+    real one with a normal time budget; otherwise it is cancelled. The table
+    lives in the worker for its whole life, so every search reuses the
+    results of the previous ones either way.
+
+    Example::
+
+        host = AIHost('hard')
+        host.start(state)
+        ...
+        if host.poll() and host.done:
+            state.play(host.best.move)
+
+    Attributes:
+        limits (SearchLimits): Depth, width and default time of a search.
+        job (int): Id of the current search, None when idle.
+        best (SearchResult): The best result of the current search so far.
+        done (bool): Whether the current search has finished.
+        pondering (bool): Whether the current search is a ponder search.
+        predicted (int): The opponent move the ponder search assumes.
+    """
+
+    def __init__(self, limits='normal', tt_buckets: int = 1 << 16):
+        """
+        Start the worker process.
+
+        Args:
+            limits: A ``SearchLimits`` or the name of a difficulty level.
+            tt_buckets: Size of the worker's transposition table.
+        """
+        if isinstance(limits, str):
+            limits = DIFFICULTIES[limits]
+        self.limits = limits
+        # Окно держит GL-контекст; процесс поиска стартует с чистого интерпретатора, без fork
+        context = multiprocessing.get_context('spawn')
+        self._conn, child = context.Pipe()
+        self._process = context.Process(target=_serve, args=(child, limits, tt_buckets),
+                                        daemon=True)
+        self._process.start()
+        child.close()
+        self._jobs = itertools.count(1)
+        self._ponder_hash = None
+        self._reset()
+
+    def _reset(self, job: Optional[int] = None, pondering: bool = False):
+        self.job = job
+        self.best: Optional[SearchResult] = None
+        self.done = False
+        self.pondering = pondering
+        self.predicted = NO_MOVE
+        self._ponder_hash = None
+
+    @property
+    def busy(self) -> bool:
+        """Check whether a search is running."""
+        return self.job is not None and not self.done
+
+    def poll(self) -> bool:
+        """
+        Read the messages of the worker without waiting.
+
+        Returns:
+            Whether anything about the current search has changed.
+        """
+        changed = False
+        while self._conn.poll():
+            kind, job, *data = self._conn.recv()
+            if job != self.job:
+                continue
+            changed = True
+            if kind == 'progress':
+                self.best = data[0]
+            elif kind == 'done':
+                self.best = data[0] if data[0] is not None else self.best
+                self.done = True
+            elif kind == 'ponder':
+                self.predicted, self._ponder_hash = data
+        return changed
+
+    def start(self, state: GameState, seconds: Optional[float] = None) -> int:
+        """
+        Begin searching the move of the player to move.
+
+        Args:
+            state: The position, it is copied into the worker.
+            seconds: Time budget, the default of ``limits`` if omitted.
+
+        Returns:
+            Id of the search.
+        """
+        seconds = self.limits.time if seconds is None else seconds
+        if self.pondering:
+            self.poll()
+            if self._ponder_hash == state.hash:
+                self.pondering = False
+                if not self.done:
+                    self._send('budget', self.job, seconds)
+                return self.job
+        self.cancel()
+        self._reset(next(self._jobs))
+        self._send('search', self.job, state, seconds)
+        return self.job
+
+    def ponder(self, state: GameState):
+        """Think on the opponent's turn about the reply it is most likely to make."""
+        self.cancel()
+        if state.is_over:
+            return
+        self._reset(next(self._jobs), pondering=True)
+        self._send('ponder', self.job, state)
+
+    def stop(self):
+        """Ask the current search to finish now; its best move still arrives through :meth:`poll`."""
+        if self.busy:
+            self._send('stop', self.job)
+
+    def extend(self, seconds: float):
+        """Give the current search more time, or less with a negative value."""
+        if self.busy:
+            self._send('extend', self.job, seconds)
+
+    def cancel(self):
+        """Drop the current search, its results are ignored."""
+        self.stop()
+        self._reset()
+
+    def _send(self, *command):
+        self._conn.send(command)
+
+    def close(self, timeout: float = 1.0):
+        """Stop the worker process."""
+        if self._process is None:
+            return
+        try:
+            self.cancel()
+            self._send('close')
+        except (BrokenPipeError, OSError):
+            pass
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._conn.close()
+        self._process = None
@@ -0,0 +1,264 @@
+import numpy as np
+from typing import Callable, NamedTuple, Optional
+
+from .board import Board, NEUTRAL
+from .cascade import gather_neighbours, COMPONENT_CHECK_WAVES, DEFAULT_MAX_WAVES
+
+
+NO_WINNER = -1
+
+
+class BatchResults(NamedTuple):
+    """
+    Final outcome of every game of a batch.
+
+    Attributes:
+        winner: Winner of each game, ``NO_WINNER`` if the turn limit ended it.
+        turns: The number of moves played in each game.
+        cells: Cells owned at the end, shape ``(n_games, n_players)``.
+        energy: Energy held at the end, shape ``(n_games, n_players)``.
+        frontier: Border cells at the end, shape ``(n_games, n_players)``.
+    """
+    winner: np.ndarray
+    turns: np.ndarray
+    cells: np.ndarray
+    energy: np.ndarray
+    frontier: np.ndarray
+
+    def save(self, path: str):
+        """Write the results into a compressed ``.npz`` file."""
+        np.savez_compressed(path, **self._asdict())
+
+    @classmethod
+    def load(cls, path: str) -> 'BatchResults':
+        """Read results written by :meth:`save`."""
+        with np.load(path) as data:
+            return cls(**{name: data[name] for name in cls._fields})
+
+
+def random_policy(sim: 'BatchSimulator', rng: np.random.Generator) -> np.ndarray:
+    """Pick a uniformly random legal move in every active game."""
+    keys = rng.random(sim.owner.shape, dtype=np.float32)
+    keys[~sim.legal_mask()] = -1.0
+    return keys.argmax(axis=1)
+
+
+class BatchSimulator:
+    """
+    Lockstep self-play of many independent games on one map.
+
+    The state of all active games is kept in ``(n_active, n_cells)`` arrays,
+    so a move in every game and every wave of their capture chains is one
+    vectorized step over the whole batch: cells are addressed by the flat id
+    ``game * n_cells + cell`` and the shared CSR adjacency of the map.
+    Finished games are removed from the arrays and their outcome is recorded.
+
+    Attributes:
+        board (Board): The map, its state is the start position of all games.
+        owner (np.ndarray): Owners of the active games.
+        energy (np.ndarray): Energy of the active games.
+        games (np.ndarray): Original index of each active game.
+        current (np.ndarray): The player to move in each active game.
+        turn (np.ndarray): Moves played in each active game.
+        alive (np.ndarray): Players still in each active game.
+        moved (np.ndarray): Players who have moved in each active game.
+        cells (np.ndarray): Cells owned per active game and player.
+    """
+
+    def __init__(self, board: Board, n_games: int, seed: int = 0,
+                 max_turns: Optional[int] = None, max_waves: int = DEFAULT_MAX_WAVES,
+                 policy: Optional[Callable] = None):
+        """
+        Initialize the batch.
+
+        Args:
+            board: The map with the start position.
+            n_games: The number of games to play.
+            seed: Seed of the random generator passed to the policy.
+            max_turns: Turn limit of a game, ``16 * n_cells`` if omitted.
+            max_waves: Wave limit of a single capture chain.
+            policy: ``policy(sim, rng)`` returning one move per active game,
+                random legal moves if omitted.
+        """
+        self.board = board
+        self.n_games = n_games
+        self.max_turns = max_turns if max_turns is not None else 16 * board.n_cells
+        self.max_waves = max_waves
+        self.policy = policy or random_policy
+        self.rng = np.random.default_rng(seed)
+
+        n, p = n_games, board.n_players
+        self.owner = np.tile(board.owner, (n, 1))
+        self.energy = np.tile(board.energy, (n, 1))
+        self.games = np.arange(n)
+        self.current = np.zeros(n, dtype=np.int64)
+        self.turn = np.zeros(n, dtype=np.int64)
+        self.alive = np.ones((n, p), dtype=bool)
+        self.moved = np.zeros((n, p), dtype=bool)
+        owned = board.owner != NEUTRAL
+        self.cells = np.tile(np.bincount(board.owner[owned], minlength=p), (n, 1))
+
+        self.results = BatchResults(
+            winner=np.full(n, NO_WINNER, dtype=np.int8),
+            turns=np.zeros(n, dtype=np.int32),
+            cells=np.zeros((n, p), dtype=np.int32),
+            energy=np.zeros((n, p), dtype=np.int64),
+            frontier=np.zeros((n, p), dtype=np.int32),
+        )
+
+    @property
+    def n_active(self) -> int:
+        """Get the number of games still running."""
+        return len(self.games)
+
+    def legal_mask(self) -> np.ndarray:
+        """Get the cells the player to move may play, shape ``(n_active, n_cells)``."""
+        return (self.owner == self.current[:, None]) | (self.owner == NEUTRAL)
+
+    def run(self) -> BatchResults:
+        """Play every game to the end and return the results."""
+        while self.n_active:
+            self.step()
+        return self.results
+
+    def step(self):
+        """Play one move in every active game and retire the finished ones."""
+        if not self.n_active:
+            return
+        moves = np.asarray(self.policy(self, self.rng), dtype=np.int64)
+        rows = np.arange(self.n_active)
+        n_cells = self.board.n_cells
+
+        flat = rows * n_cells + moves
+        owner, energy = self.owner.reshape(-1), self.energy.reshape(-1)
+        self._account(flat, owner[flat].copy(), rows)
+        owner[flat] = self.current
+        energy[flat] += 1
+        self._resolve(flat)
+
+        self.moved[rows, self.current] = True
+        self.turn += 1
+        self.alive &= ~(self.moved & (self.cells == 0))
+        self._pass_turn()
+        self._retire()
+
+    def _account(self, flat: np.ndarray, old_owner: np.ndarray, rows: np.ndarray):
+        """Move captured cells between the per-game counters."""
+        p = self.board.n_players
+        new_owner = self.current[rows]
+        changed = old_owner != new_owner
+        counts = self.cells.reshape(-1)
+        was = changed & (old_owner != NEUTRAL)
+        counts -= np.bincount(rows[was] * p + old_owner[was], minlength=counts.size)
+        counts += np.bincount(rows[changed] * p + new_owner[changed], minlength=counts.size)
+
+    def _resolve(self, start: np.ndarray):
+        """
+        Resolve the capture chains of all games together, wave by wave.
+
+        As in :func:`resolve_cascade`, chains longer than ``COMPONENT_CHECK_WAVES``
+        count the cells the mover does not own per game and connected
+        component, and stop spilling in the components where none are left.
+        """
+        board = self.board
+        n_cells = board.n_cells
+        owner, energy = self.owner.reshape(-1), self.energy.reshape(-1)
+        capacity, degree = board.capacity, board.degree
+
+        def overloaded(flat):
+            cells = flat % n_cells
+            return flat[(energy[flat] > capacity[cells]) & (degree[cells] > 0)]
+
+        frontier = overloaded(start)
+        components = None
+        waves = 0
+        while len(frontier) and waves < self.max_waves:
+            if waves == COMPONENT_CHECK_WAVES:
+                components = board.components
+                n_components = int(components.max()) + 1
+                keys = np.arange(self.n_active)[:, None] * n_components + components
+                foreign = self.owner != self.current[:, None]
+                foreign_in = np.bincount(keys[foreign], minlength=self.n_active * n_components)
+            if components is not None:
+                # Компоненты, целиком захваченные ходящим, дальше не перетекают
+                rows, cells = np.divmod(frontier, n_cells)
+                frontier = frontier[foreign_in[rows * n_components + components[cells]] > 0]
+                if not len(frontier):
+                    break
+            waves += 1
+            rows, cells = np.divmod(frontier, n_cells)
+
+            deg = degree[cells]
+            times = (energy[frontier] - capacity[cells] + deg - 1) // deg
+            energy[frontier] -= times * deg
+
+            targets = gather_neighbours(board, cells) + np.repeat(rows * n_cells, deg)
+            hit, inverse = np.unique(targets, return_inverse=True)
+            gained = np.bincount(inverse, weights=np.repeat(times, deg)).astype(energy.dtype)
+            hit_rows = hit // n_cells
+
+            old_owner = owner[hit].copy()
+            self._account(hit, old_owner, hit_rows)
+            if components is not None:
+                taken = old_owner != self.current[hit_rows]
+                foreign_in -= np.bincount((hit_rows * n_components + components[hit % n_cells])[taken],
+                                          minlength=len(foreign_in))
+            energy[hit] += gained
+            owner[hit] = self.current[hit_rows]
+
+            # Игры, где ходящий захватил всё поле, дальше не считаем
+            captured = self.cells[np.arange(self.n_active), self.current] >= n_cells
+            candidates = np.union1d(frontier, hit)
+            candidates = candidates[~captured[candidates // n_cells]]
+            frontier = overloaded(candidates)
+
+    def _pass_turn(self):
+        p = self.board.n_players
+        rows = np.arange(self.n_active)
+        nxt = (self.current + 1) % p
+        for _ in range(p):
+            dead = ~self.alive[rows, nxt]
+            if not dead.any():
+                break
+            nxt[dead] = (nxt[dead] + 1) % p
+        self.current = np.where(self.alive.sum(axis=1) > 1, nxt, self.current)
+
+    def _retire(self):
+        """Record and drop the games that are over."""
+        over = (self.alive.sum(axis=1) <= 1) | (self.turn >= self.max_turns)
+        if not over.any():
+            return
+
+        done = np.flatnonzero(over)
+        games = self.games[done]
+        res = self.results
+        decided = self.alive[done].sum(axis=1) == 1
+        res.winner[games] = np.where(decided, self.alive[done].argmax(axis=1), NO_WINNER)
+        res.turns[games] = self.turn[done]
+        res.cells[games] = self.cells[done]
+        res.energy[games], res.frontier[games] = self._final_stats(done)
+
+        keep = ~over
+        for name in ('owner', 'energy', 'games', 'current', 'turn', 'alive', 'moved', 'cells'):
+            setattr(self, name, getattr(self, name)[keep])
+
+    def _final_stats(self, rows: np.ndarray):
+        """Count energy and border cells per player for some games in one pass."""
+        board = self.board
+        p, n_cells = board.n_players, board.n_cells
+        owner, energy = self.owner[rows], self.energy[rows]
+        k = len(rows)
+        offset = np.arange(k)[:, None] * p
+
+        owned = owner != NEUTRAL
+        key = (offset + owner)[owned]
+        held = np.bincount(key, weights=energy[owned], minlength=k * p).reshape(k, p)
+
+        src = np.repeat(np.arange(n_cells), board.degree)
+        mismatch = owner[:, src] != owner[:, board.indices]
+        touching = np.zeros(k * n_cells, dtype=np.int64)
+        flat = (np.arange(k)[:, None] * n_cells + src)[mismatch]
+        touching += np.bincount(flat, minlength=k * n_cells)
+        border = (touching.reshape(k, n_cells) > 0) & owned
+        frontier = np.bincount((offset + owner)[border], minlength=k * p).reshape(k, p)
+        return held.astype(np.int64), frontier
@@ -0,0 +1,193 @@
+import hashlib
+import numpy as np
+from typing import Optional, Tuple
+
+
+NEUTRAL = -1
+
+OWNER_DTYPE = np.int8
+ENERGY_DTYPE = np.int32
+INDEX_DTYPE = np.int32
+
+
+class Board:
+    """
+    The energy-cell graph stored as flat NumPy arrays.
+
+    The adjacency is kept in CSR form: the neighbours of cell ``i`` are
+    ``indices[indptr[i]:indptr[i + 1]]``. Per-cell state lives in parallel
+    arrays indexed by cell id, so every rule can be expressed as whole-array
+    operations without creating a Python object per cell.
+
+    A cell holds at most ``capacity`` energy. When its energy exceeds the
+    capacity the cell overloads and sends one unit of energy to every
+    neighbour, so ``capacity`` must be at least ``degree - 1``.
+
+    Attributes:
+        n_players (int): The number of players on the board.
+        indptr (np.ndarray): CSR row pointers, shape ``(n_cells + 1,)``.
+        indices (np.ndarray): CSR neighbour ids, shape ``(2 * n_edges,)``.
+        owner (np.ndarray): Owner of each cell, ``NEUTRAL`` for free cells.
+        energy (np.ndarray): Energy stored in each cell.
+        capacity (np.ndarray): Maximum stable energy of each cell.
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, n_players: int = 2,
+                 owner: Optional[np.ndarray] = None, energy: Optional[np.ndarray] = None,
+                 capacity: Optional[np.ndarray] = None):
+        """
+        Initialize the board from a ready CSR adjacency.
+
+        Args:
+            indptr: CSR row pointers.
+            indices: CSR neighbour ids, each undirected edge stored twice.
+            n_players: The number of players.
+            owner: Initial owners, all cells neutral if omitted.
+            energy: Initial energy, zero if omitted.
+            capacity: Cell capacities, ``degree - 1`` if omitted.
+
+        Raises:
+            ValueError: If the arrays are inconsistent.
+        """
+        self.indptr = np.ascontiguousarray(indptr, dtype=np.int64)
+        self.indices = np.ascontiguousarray(indices, dtype=INDEX_DTYPE)
+        self.n_players = int(n_players)
+
+        n = self.n_cells
+        if self.indptr[0] != 0 or self.indptr[-1] != len(self.indices):
+            raise ValueError("indptr does not match indices")
+        if not 1 <= self.n_players <= np.iinfo(OWNER_DTYPE).max:
+            raise ValueError(f"Invalid number of players: {n_players}")
+
+        self.degree = np.diff(self.indptr).astype(ENERGY_DTYPE)
+        self._components = None
+
+        self.owner = self._state_array(owner, NEUTRAL, OWNER_DTYPE)
+        self.energy = self._state_array(energy, 0, ENERGY_DTYPE)
+        if capacity is None:
+            capacity = np.maximum(self.degree - 1, 0)
+        # Ёмкости не меняются за партию, их можно делить так же, как смежность
+        self.capacity = np.ascontiguousarray(capacity, dtype=ENERGY_DTYPE)
+
+        if np.any(self.capacity < self.degree - 1):
+            raise ValueError("Cell capacity must be at least degree - 1")
+        if np.any((self.owner < NEUTRAL) | (self.owner >= self.n_players)):
+            raise ValueError("Cell owner out of range")
+        if len(self.owner) != n or len(self.energy) != n or len(self.capacity) != n:
+            raise ValueError("State arrays must have one value per cell")
+
+    def _state_array(self, values, default, dtype) -> np.ndarray:
+        if values is None:
+            return np.full(self.n_cells, default, dtype=dtype)
+        return np.array(values, dtype=dtype)
+
+    @classmethod
+    def from_edges(cls, n_cells: int, edges, **kwargs) -> 'Board':
+        """
+        Build a board from an undirected edge list.
+
+        Duplicate edges and self-loops are dropped.
+
+        Args:
+            n_cells: The number of cells.
+            edges: Array-like of shape ``(n_edges, 2)`` with cell id pairs.
+            **kwargs: Passed through to the constructor.
+
+        Returns:
+            The new board.
+        """
+        indptr, indices = edges_to_csr(n_cells, edges)
+        return cls(indptr, indices, **kwargs)
+
+    @property
+    def n_cells(self) -> int:
+        """Get the number of cells."""
+        return len(self.indptr) - 1
+
+    @property
+    def n_edges(self) -> int:
+        """Get the number of undirected edges."""
+        return len(self.indices) // 2
+
+    @property
+    def components(self) -> np.ndarray:
+        """Get the connected component id of every cell, computed once per map."""
+        if self._components is None:
+            labels = np.arange(self.n_cells, dtype=INDEX_DTYPE)
+            src = np.repeat(labels, self.degree)
+            while True:
+                # Метка клетки — наименьшая метка соседей, затем прыжок по указателям
+                smallest = labels.copy()
+                np.minimum.at(smallest, src, labels[self.indices])
+                smallest = smallest[smallest]
+                if np.array_equal(smallest, labels):
+                    break
+                labels = smallest
+            self._components = np.unique(labels, return_inverse=True)[1].astype(INDEX_DTYPE)
+        return self._components
+
+    def neighbours(self, cell: int) -> np.ndarray:
+        """Get the neighbour ids of a cell as an array view."""
+        return self.indices[self.indptr[cell]:self.indptr[cell + 1]]
+
+    def edges(self) -> np.ndarray:
+        """Get every undirected edge once as an ``(n_edges, 2)`` array."""
+        src = np.repeat(np.arange(self.n_cells, dtype=INDEX_DTYPE), self.degree)
+        mask = src < self.indices
+        return np.stack((src[mask], self.indices[mask]), axis=1)
+
+    def copy(self) -> 'Board':
+        """Create a copy with its own state arrays and a shared adjacency."""
+        board = Board.__new__(Board)
+        board.__dict__.update(self.__dict__)
+        board.owner = self.owner.copy()
+        board.energy = self.energy.copy()
+        return board
+
+    def map_hash(self) -> str:
+        """
+        Get a fingerprint of the map: adjacency, capacities and player count.
+
+        Cell state is not part of it, so the hash stays the same during a match.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.int64(self.n_players).tobytes())
+        for array in (self.indptr, self.indices, self.capacity):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    def restore(self, other: 'Board'):
+        """Copy the cell state of another board of the same map into this one."""
+        np.copyto(self.owner, other.owner)
+        np.copyto(self.energy, other.energy)
+
+
+def edges_to_csr(n_cells: int, edges) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert an undirected edge list into CSR arrays.
+
+    Args:
+        n_cells: The number of cells.
+        edges: Array-like of shape ``(n_edges, 2)``.
+
+    Returns:
+        ``(indptr, indices)`` with every edge stored in both directions and
+        neighbour lists sorted by id.
+    """
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    if len(edges) and (edges.min() < 0 or edges.max() >= n_cells):
+        raise ValueError("Edge refers to a cell outside the board")
+
+    src = np.concatenate((edges[:, 0], edges[:, 1]))
+    dst = np.concatenate((edges[:, 1], edges[:, 0]))
+
+    # Сортируем по (src, dst) и убираем дубликаты одним проходом
+    keys = np.sort(src * n_cells + dst)
+    if len(keys):
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+    src, dst = np.divmod(keys, n_cells)
+
+    indptr = np.zeros(n_cells + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n_cells), out=indptr[1:])
+    return indptr, dst.astype(INDEX_DTYPE)
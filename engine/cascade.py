@@ -0,0 +1,255 @@
+import numpy as np
+from typing import NamedTuple, Optional, TYPE_CHECKING
+
+from .board import Board
+
+if TYPE_CHECKING:
+    from .stats import PlayerStats
+
+
+DEFAULT_MAX_WAVES = 1 << 16
+# Wave after which foreign cells are counted per connected component
+COMPONENT_CHECK_WAVES = 64
+
+
+class ChangeLog(NamedTuple):
+    """
+    Cell changes of a capture chain, wave by wave.
+
+    Wave 0 holds the start cells after the move; every later wave holds the
+    cells that spilled or received energy in it, with their values right
+    after that wave. The waves are packed into flat arrays, wave ``k`` being
+    the slice ``offsets[k]:offsets[k + 1]``, so the log is a few arrays no
+    matter how long the chain is.
+
+    Attributes:
+        cells: Cell ids of all waves, unique within a wave.
+        owner: Owner of each logged cell after its wave.
+        energy: Energy of each logged cell after its wave.
+        offsets: Start of every wave in the flat arrays plus the total length.
+    """
+    cells: np.ndarray
+    owner: np.ndarray
+    energy: np.ndarray
+    offsets: np.ndarray
+
+    @property
+    def n_waves(self) -> int:
+        """Get the number of logged waves, the start wave included."""
+        return len(self.offsets) - 1
+
+    def wave(self, k: int):
+        """Get ``(cells, owner, energy)`` of one wave."""
+        part = slice(self.offsets[k], self.offsets[k + 1])
+        return self.cells[part], self.owner[part], self.energy[part]
+
+    def final(self):
+        """Get ``(cells, owner, energy)`` with the last logged value of every cell."""
+        # Последняя запись клетки — первая в развёрнутом логе
+        cells, first = np.unique(self.cells[::-1], return_index=True)
+        return cells, self.owner[::-1][first], self.energy[::-1][first]
+
+    @classmethod
+    def from_waves(cls, waves) -> 'ChangeLog':
+        """Pack a list of ``(cells, owner, energy)`` tuples."""
+        sizes = [len(cells) for cells, _, _ in waves]
+        offsets = np.zeros(len(waves) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        return cls(*(np.concatenate([wave[i] for wave in waves]) for i in range(3)), offsets)
+
+
+class CascadeResult(NamedTuple):
+    """
+    Summary of one resolved capture chain.
+
+    Attributes:
+        waves: The number of spill waves processed.
+        touched: Sorted ids of the start cells and every cell the chain reached.
+        old_owner: Owners of the ``touched`` cells before the chain.
+        old_energy: Energy of the ``touched`` cells before the chain.
+        settled: Whether the board ended with no overloaded cells.
+        capped: Whether the wave limit stopped the cascade.
+        log: The per-wave changes, if they were asked for.
+    """
+    waves: int
+    touched: np.ndarray
+    old_owner: np.ndarray
+    old_energy: np.ndarray
+    settled: bool
+    capped: bool
+    log: Optional[ChangeLog] = None
+
+    @property
+    def n_touched(self) -> int:
+        """Get the number of cells the cascade changed."""
+        return len(self.touched)
+
+
+def gather_neighbours(board: Board, cells: np.ndarray) -> np.ndarray:
+    """
+    Concatenate the neighbour lists of several cells without a Python loop.
+
+    Args:
+        board: The board to read the adjacency from.
+        cells: Ids of the cells.
+
+    Returns:
+        Neighbour ids, the list of ``cells[0]`` first, then ``cells[1]`` and so on.
+    """
+    counts = board.degree[cells]
+    total = int(counts.sum())
+    # Смещение каждого элемента в indices: начало строки + номер внутри строки
+    shift = board.indptr[cells] - (np.cumsum(counts) - counts)
+    return board.indices[np.repeat(shift, counts) + np.arange(total)]
+
+
+def resolve_cascade(board: Board, start, player: int,
+                    max_waves: int = DEFAULT_MAX_WAVES,
+                    stats: Optional['PlayerStats'] = None,
+                    start_owner: Optional[np.ndarray] = None,
+                    start_energy: Optional[np.ndarray] = None,
+                    record_waves: bool = False,
+                    foreign: Optional[int] = None) -> CascadeResult:
+    """
+    Resolve the capture chain started by overloaded cells.
+
+    Every wave takes the whole frontier of overloaded cells at once: each of
+    them spills as many times as needed to drop back to its capacity, and the
+    spilled energy is scatter-added into the neighbours, which are captured by
+    ``player``. Cells that are overloaded after the wave form the next frontier.
+
+    A board holding more energy than it can store never settles, so the
+    cascade is stopped after ``max_waves`` waves or, when ``stats`` or
+    ``foreign`` are given, as soon as ``player`` owns every cell, whichever
+    comes first. Chains
+    longer than ``COMPONENT_CHECK_WAVES`` also count the cells ``player``
+    does not own in every connected component, and stop spilling in the
+    components where that count reaches zero, so a saturated island of a
+    disconnected map does not run until ``max_waves``.
+
+    Args:
+        board: The board, modified in place.
+        start: Id or ids of cells to start from.
+        player: The player the chain captures cells for.
+        max_waves: Upper bound on the number of waves.
+        stats: Player counters describing the board before ``start`` was
+            changed; updated with the deltas of the whole chain.
+        start_owner: Owners of the start cells before they were changed,
+            their current owners if omitted.
+        start_energy: Energy of the start cells before they were changed,
+            their current energy if omitted.
+        record_waves: Whether to keep a :class:`ChangeLog` of every wave.
+        foreign: The number of cells ``player`` does not own with ``start``
+            already changed, for callers that count cells without ``stats``.
+
+    Returns:
+        The cascade summary.
+    """
+    owner, energy = board.owner, board.energy
+    capacity, degree = board.capacity, board.degree
+
+    start = np.atleast_1d(np.asarray(start, dtype=np.int64))
+    if start_owner is None:
+        start_owner = owner[start]
+    if start_energy is None:
+        start_energy = energy[start]
+    frontier = start[(energy[start] > capacity[start]) & (degree[start] > 0)]
+
+    if stats is not None:
+        taken = np.count_nonzero((start_owner != player) & (owner[start] == player))
+        foreign = board.n_cells - int(stats.cells[player]) - int(taken)
+
+    # Прежние значения запоминаются при каждом касании, в итог идёт первое
+    touched = [start]
+    old_owner = [np.asarray(start_owner, dtype=owner.dtype).reshape(-1)]
+    old_energy = [np.asarray(start_energy, dtype=energy.dtype).reshape(-1)]
+    log = None
+    if record_waves:
+        first = np.unique(start)
+        log = [(first, owner[first], energy[first])]
+    components = None
+    stalled = False
+    waves = 0
+    while len(frontier) and waves < max_waves:
+        if foreign is not None and foreign <= 0:
+            break
+        if waves == COMPONENT_CHECK_WAVES:
+            components = board.components
+            n_components = int(components.max()) + 1
+            foreign_in = np.bincount(components[owner != player], minlength=n_components)
+        if components is not None:
+            # Компоненты, целиком захваченные ходящим, дальше не перетекают
+            live = foreign_in[components[frontier]] > 0
+            if not live.all():
+                stalled = True
+                frontier = frontier[live]
+                if not len(frontier):
+                    break
+        waves += 1
+
+        deg = degree[frontier]
+        times = (energy[frontier] - capacity[frontier] + deg - 1) // deg
+        energy[frontier] -= times * deg
+
+        targets = gather_neighbours(board, frontier)
+        cells, inverse = np.unique(targets, return_inverse=True)
+        gained = np.bincount(inverse, weights=np.repeat(times, deg)).astype(energy.dtype)
+
+        touched.append(cells)
+        old_owner.append(owner[cells])
+        old_energy.append(energy[cells])
+        if foreign is not None:
+            foreign -= int(np.count_nonzero(old_owner[-1] != player))
+        if components is not None:
+            foreign_in -= np.bincount(components[cells[old_owner[-1] != player]],
+                                      minlength=n_components)
+        energy[cells] += gained
+        owner[cells] = player
+
+        candidates = np.union1d(frontier, cells)
+        if log is not None:
+            log.append((candidates, owner[candidates], energy[candidates]))
+        frontier = candidates[(energy[candidates] > capacity[candidates]) &
+                              (degree[candidates] > 0)]
+
+    cells, first = np.unique(np.concatenate(touched), return_index=True)
+    result = CascadeResult(
+        waves=waves,
+        touched=cells,
+        old_owner=np.concatenate(old_owner)[first],
+        old_energy=np.concatenate(old_energy)[first],
+        settled=not len(frontier) and not stalled,
+        capped=bool(len(frontier)) and waves >= max_waves,
+        log=ChangeLog.from_waves(log) if log is not None else None,
+    )
+    if stats is not None:
+        stats.apply(result.touched, result.old_owner, result.old_energy)
+    return result
+
+
+def play_move(board: Board, cell: int, player: int,
+              max_waves: int = DEFAULT_MAX_WAVES,
+              stats: Optional['PlayerStats'] = None,
+              record_waves: bool = False) -> CascadeResult:
+    """
+    Put one unit of energy into a cell for a player and resolve the chain.
+
+    Legality is not checked here.
+
+    Args:
+        board: The board, modified in place.
+        cell: The cell the energy goes into.
+        player: The player making the move.
+        max_waves: Upper bound on the number of waves.
+        stats: Player counters to update.
+        record_waves: Whether to keep a :class:`ChangeLog` of every wave.
+
+    Returns:
+        The cascade summary, with the played cell always in ``touched``.
+    """
+    start_owner = board.owner[cell:cell + 1].copy()
+    start_energy = board.energy[cell:cell + 1].copy()
+    board.owner[cell] = player
+    board.energy[cell] += 1
+    return resolve_cascade(board, cell, player, max_waves, stats, start_owner, start_energy,
+                           record_waves)
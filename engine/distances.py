@@ -0,0 +1,333 @@
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from typing import Optional, Tuple
+
+from .board import Board
+from .cascade import gather_neighbours
+
+
+# Карты до этого размера получают полную матрицу, дальше — ориентиры
+FULL_TABLE_CELLS = 4096
+LANDMARKS = 16
+BATCH_ROWS = 64
+NEIGHBOURHOOD_CACHE = 1024
+
+UNREACHED16 = np.iinfo(np.uint16).max
+UNREACHED32 = np.iinfo(np.uint32).max
+
+
+def _bfs_rows(board: Board, sources: np.ndarray, out: np.ndarray, unreached: int,
+              max_depth: Optional[int] = None):
+    """
+    Fill ``out[i]`` with the hop distances from ``sources[i]``.
+
+    All rows advance together one level at a time: the frontier is a list of
+    flat ``row * n_cells + cell`` ids, so one level of every BFS is a single
+    gather over the CSR adjacency.
+    """
+    n = board.n_cells
+    flat_out = out.reshape(-1)
+    rows = np.arange(len(sources), dtype=np.int64)
+    cells = np.asarray(sources, dtype=np.int64)
+    flat_out[rows * n + cells] = 0
+    level = 0
+    while len(cells) and (max_depth is None or level < max_depth):
+        level += 1
+        targets = gather_neighbours(board, cells).astype(np.int64)
+        flat = np.repeat(rows, board.degree[cells]) * n + targets
+        flat = np.unique(flat[flat_out[flat] == unreached])
+        flat_out[flat] = level
+        rows, cells = np.divmod(flat, n)
+
+
+def bfs_distances(board: Board, sources, dtype=np.uint16, workers: Optional[int] = None,
+                  batch_rows: int = BATCH_ROWS) -> np.ndarray:
+    """
+    Compute hop distances from many sources, one row per source.
+
+    The sources are split into batches that run in a thread pool; every
+    batch is a vectorized multi-row BFS writing into its own rows of the
+    result, and NumPy releases the GIL for the heavy sorting and gathering.
+
+    Args:
+        board: The map.
+        sources: Cell ids to measure from.
+        dtype: ``np.uint16`` or ``np.uint32``; its maximum marks unreachable cells.
+        workers: Threads, one per CPU if omitted.
+        batch_rows: Sources per batch.
+
+    Returns:
+        Array of shape ``(len(sources), n_cells)``.
+    """
+    sources = np.atleast_1d(np.asarray(sources, dtype=np.int64))
+    unreached = np.iinfo(dtype).max
+    out = np.full((len(sources), board.n_cells), unreached, dtype=dtype)
+    starts = range(0, len(sources), max(1, batch_rows))
+    if workers == 0 or len(starts) <= 1:
+        for start in starts:
+            _bfs_rows(board, sources[start:start + batch_rows], out[start:start + batch_rows], unreached)
+        return out
+    with ThreadPoolExecutor(workers or os.cpu_count() or 1) as pool:
+        futures = [pool.submit(_bfs_rows, board, sources[start:start + batch_rows],
+                               out[start:start + batch_rows], unreached)
+                   for start in starts]
+        for future in futures:
+            future.result()
+    return out
+
+
+def nearest_distance(board: Board, sources, max_depth: Optional[int] = None) -> np.ndarray:
+    """
+    Get the hop distance from every cell to the nearest of some cells.
+
+    One BFS starts from all sources at once, e.g. from every cell of an
+    opponent to see how close the threat is.
+
+    Args:
+        board: The map.
+        sources: Cell ids at distance 0.
+        max_depth: Stop after this many levels, farther cells stay unreached.
+
+    Returns:
+        uint32 distances, ``UNREACHED32`` where no source can be reached.
+    """
+    sources = np.unique(np.asarray(sources, dtype=np.int64))
+    out = np.full((1, board.n_cells), UNREACHED32, dtype=np.uint32)
+    if len(sources):
+        flat = out.reshape(-1)
+        flat[sources] = 0
+        cells, level = sources, 0
+        while len(cells) and (max_depth is None or level < max_depth):
+            level += 1
+            targets = np.unique(gather_neighbours(board, cells))
+            cells = targets[flat[targets] == UNREACHED32].astype(np.int64)
+            flat[cells] = level
+    return out[0]
+
+
+class DistanceTable:
+    """
+    Hop distances of a map, precomputed once.
+
+    Small maps keep the full ``n_cells x n_cells`` matrix, so any distance is
+    one lookup. Larger maps keep only the rows of a few landmarks spread over
+    the graph, which bound every distance from both sides by the triangle
+    inequality: ``|d(l, u) - d(l, v)| <= d(u, v) <= d(l, u) + d(l, v)``.
+    Distances are stored as uint16 whenever the graph is small enough for
+    them to fit.
+
+    k-hop neighbourhoods are answered from the table or, on landmark maps,
+    by a short local BFS, and the latest ones are kept in a small cache.
+
+    Attributes:
+        sources (np.ndarray): The cell of every row of ``table``.
+        table (np.ndarray): Distances, shape ``(len(sources), n_cells)``.
+        exact (bool): Whether the table holds every pair of cells.
+        unreached (int): The value of cells not reachable from a row's source.
+    """
+
+    def __init__(self, board: Board, sources: np.ndarray, table: np.ndarray):
+        """
+        Wrap a computed table.
+
+        Args:
+            board: The map.
+            sources: The cell of every row.
+            table: The distances.
+        """
+        self.board = board
+        self.sources = np.asarray(sources, dtype=np.int64)
+        self.table = table
+        self.exact = len(self.sources) == board.n_cells and np.array_equal(
+            self.sources, np.arange(board.n_cells))
+        self.unreached = int(np.iinfo(table.dtype).max)
+        self._neighbourhoods = OrderedDict()
+
+    @classmethod
+    def build(cls, board: Board, full_cells: int = FULL_TABLE_CELLS, landmarks: int = LANDMARKS,
+              workers: Optional[int] = None, seed: int = 0) -> 'DistanceTable':
+        """
+        Compute the table of a map.
+
+        Args:
+            board: The map.
+            full_cells: The largest map that gets the full matrix.
+            landmarks: The number of landmarks of larger maps.
+            workers: BFS threads, one per CPU if omitted.
+            seed: Seed of the landmark choice.
+
+        Returns:
+            The new table.
+        """
+        n = board.n_cells
+        if n <= full_cells:
+            sources = np.arange(n)
+            return cls(board, sources, bfs_distances(board, sources, np.uint16, workers))
+        return cls._build_landmarks(board, min(landmarks, n), workers, seed)
+
+    @classmethod
+    def _build_landmarks(cls, board: Board, count: int, workers: Optional[int],
+                         seed: int) -> 'DistanceTable':
+        rng = np.random.default_rng(seed)
+        workers = workers or os.cpu_count() or 1
+        # Первый ориентир — самая дальняя клетка от нулевой, он же даёт оценку диаметра
+        probe = nearest_distance(board, [0])
+        reached = probe != UNREACHED32
+        first = int(np.argmax(np.where(reached, probe, 0)))
+        # Диаметр не больше удвоенного эксцентриситета, если граф связный
+        small = board.n_cells < UNREACHED16 or (
+            reached.all() and 2 * int(probe.max()) < UNREACHED16)
+        dtype = np.uint16 if small else np.uint32
+
+        sources = [first]
+        rows = [bfs_distances(board, sources, dtype, workers=0)]
+        nearest = rows[0][0].astype(np.float64)
+        unreached = np.iinfo(dtype).max
+        while len(sources) < count:
+            # Следующие ориентиры выбираются пачками как в k-means++:
+            # вероятность пропорциональна квадрату расстояния до уже выбранных
+            weight = np.where(nearest == unreached, nearest.max() + 1, nearest) ** 2
+            weight[sources] = 0
+            if not weight.sum():
+                break
+            size = min(workers, count - len(sources), int(np.count_nonzero(weight)))
+            batch = rng.choice(board.n_cells, size=size, replace=False, p=weight / weight.sum())
+            batch_rows = bfs_distances(board, batch, dtype, workers, batch_rows=1)
+            sources.extend(batch.tolist())
+            rows.append(batch_rows)
+            nearest = np.minimum(nearest, batch_rows.min(axis=0))
+        return cls(board, np.asarray(sources), np.concatenate(rows))
+
+    def save(self, cache_dir: str, map_hash: str):
+        """Write the table into ``cache_dir`` under a key starting with the map hash."""
+        os.makedirs(cache_dir, exist_ok=True)
+        for path, array in zip(_cache_paths(cache_dir, map_hash), (self.sources, self.table)):
+            # Сначала во временный файл: оборванная запись не испортит кэш
+            temporary = f'{path}.{os.getpid()}.tmp'
+            with open(temporary, 'wb') as file:
+                np.save(file, array)
+            os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, board: Board, cache_dir: str, map_hash: str) -> Optional['DistanceTable']:
+        """
+        Read a cached table, memory-mapped.
+
+        Returns:
+            The table, or None if it is not cached or does not fit the board.
+        """
+        sources_path, table_path = _cache_paths(cache_dir, map_hash)
+        try:
+            sources = np.load(sources_path)
+            table = np.load(table_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        if table.ndim != 2 or table.shape != (len(sources), board.n_cells):
+            return None
+        return cls(board, sources, table)
+
+    def distances_from(self, cell: int) -> np.ndarray:
+        """
+        Get the distances from a cell to every cell.
+
+        Exact on full tables; on landmark tables the upper bound through the
+        best landmark.
+        """
+        if self.exact:
+            return self.table[cell]
+        # По одному ориентиру за раз: в памяти только две строки, а не копия таблицы
+        wide = np.int32 if self.table.dtype == np.uint16 else np.int64
+        best = np.full(self.board.n_cells, self.unreached, dtype=wide)
+        through = np.empty_like(best)
+        for row in self.table:
+            offset = row[cell]
+            if offset == self.unreached:
+                continue
+            np.add(row, wide(offset), out=through)
+            np.minimum(best, through, out=best)
+        # Клетки, недостижимые из ориентира, получили сумму больше unreached
+        return np.minimum(best, self.unreached).astype(self.table.dtype)
+
+    def bounds(self, u: int, v: int) -> Tuple[int, int]:
+        """
+        Get the lower and upper bound of the distance between two cells.
+
+        Both equal the distance on full tables; both are ``unreached`` if the
+        cells are known to lie in different components.
+        """
+        if self.exact:
+            distance = int(self.table[u, v])
+            return distance, distance
+        du = self.table[:, u].astype(np.int64)
+        dv = self.table[:, v].astype(np.int64)
+        seen_u, seen_v = du != self.unreached, dv != self.unreached
+        if np.any(seen_u != seen_v):
+            return self.unreached, self.unreached
+        both = seen_u & seen_v
+        if not both.any():
+            return 0, self.unreached
+        return int(np.abs(du - dv)[both].max()), int((du + dv)[both].min())
+
+    def distance(self, u: int, v: int) -> int:
+        """Get the distance between two cells, the upper bound on landmark tables."""
+        return self.bounds(u, v)[1]
+
+    def neighbourhood(self, cell: int, k: int) -> np.ndarray:
+        """Get the sorted ids of the cells at most ``k`` hops from a cell, itself included."""
+        key = (cell, k)
+        cached = self._neighbourhoods.get(key)
+        if cached is not None:
+            self._neighbourhoods.move_to_end(key)
+            return cached
+
+        if self.exact:
+            cells = np.flatnonzero(self.table[cell] <= k)
+        else:
+            cells = np.flatnonzero(nearest_distance(self.board, [cell], max_depth=k) <= k)
+        self._neighbourhoods[key] = cells
+        if len(self._neighbourhoods) > NEIGHBOURHOOD_CACHE:
+            self._neighbourhoods.popitem(last=False)
+        return cells
+
+
+def _layout(board: Board, full_cells: int = FULL_TABLE_CELLS, landmarks: int = LANDMARKS,
+            seed: int = 0, **_) -> str:
+    # Потоки на результат не влияют, в ключ идёт только то, какую таблицу даст build
+    if board.n_cells <= full_cells:
+        return 'full'
+    return f'landmarks{min(landmarks, board.n_cells)}-seed{seed}'
+
+
+def _cache_paths(cache_dir: str, map_hash: str) -> Tuple[str, str]:
+    base = os.path.join(cache_dir, map_hash)
+    return f'{base}.sources.npy', f'{base}.distances.npy'
+
+
+def distance_table(board: Board, cache_dir: Optional[str] = None, map_hash: Optional[str] = None,
+                   **options) -> DistanceTable:
+    """
+    Get the distance table of a map, from the disk cache when possible.
+
+    Tables are cached under the map hash and the kind of table the options
+    give, so a landmark table is never returned for a call that would build
+    the full matrix, or one with other landmarks.
+
+    Args:
+        board: The map.
+        cache_dir: Directory of cached tables, no caching if omitted.
+        map_hash: ``Board.map_hash`` of the map, computed if omitted.
+        **options: Passed to :meth:`DistanceTable.build` on a cache miss.
+
+    Returns:
+        The table.
+    """
+    if cache_dir is None:
+        return DistanceTable.build(board, **options)
+    key = f'{map_hash or board.map_hash()}.{_layout(board, **options)}'
+    table = DistanceTable.load(board, cache_dir, key)
+    if table is None:
+        table = DistanceTable.build(board, **options)
+        table.save(cache_dir, key)
+    return table
@@ -0,0 +1,129 @@
+import numpy as np
+from typing import Optional
+
+from .board import Board, NEUTRAL
+
+
+FEATURES = ('cells', 'energy', 'critical', 'contested', 'mobility')
+CELLS, ENERGY, CRITICAL, CONTESTED, MOBILITY = range(len(FEATURES))
+
+DEFAULT_WEIGHTS = np.array([1.0, 0.25, 0.5, 0.1, 0.02])
+
+
+class Evaluator:
+    """
+    Whole-array position features of a map.
+
+    For every player the features are the cells owned, the energy held, the
+    cells one unit away from overflowing, the owned cells touching another
+    player's cell and the number of legal moves. They are counted with a few
+    ``bincount`` calls over the owner and energy arrays, and the same code
+    takes either one position of shape ``(n_cells,)`` or a stack of positions
+    of shape ``(N, n_cells)``, e.g. the active games of a
+    :class:`BatchSimulator` or the leaves of a search.
+
+    Attributes:
+        board (Board): The map; only its adjacency and capacities are used.
+        weights (np.ndarray): Weight of every feature in :data:`FEATURES` order.
+    """
+
+    def __init__(self, board: Board, weights: Optional[np.ndarray] = None):
+        """
+        Initialize the evaluator.
+
+        Args:
+            board: The map.
+            weights: Feature weights, :data:`DEFAULT_WEIGHTS` if omitted.
+        """
+        self.board = board
+        self.weights = np.asarray(DEFAULT_WEIGHTS if weights is None else weights, dtype=np.float64)
+        edges = board.edges()
+        self._a = edges[:, 0].astype(np.int64)
+        self._b = edges[:, 1].astype(np.int64)
+
+    def features(self, owner: np.ndarray, energy: np.ndarray) -> np.ndarray:
+        """
+        Count the features of one or many positions.
+
+        Args:
+            owner: Cell owners, shape ``(n_cells,)`` or ``(N, n_cells)``.
+            energy: Cell energy of the same shape.
+
+        Returns:
+            Array of shape ``(n_players, n_features)``, or
+            ``(N, n_players, n_features)`` for a stack.
+        """
+        single = np.ndim(owner) == 1
+        owner = np.atleast_2d(owner)
+        energy = np.atleast_2d(energy)
+        n_games, n_cells = owner.shape
+        p = self.board.n_players
+        size = n_games * p
+
+        # Ключ (партия, игрок) для каждой клетки, нейтральные отбрасываются
+        owned = owner >= 0
+        rows = np.broadcast_to(np.arange(n_games)[:, None], owner.shape)
+        keys = (rows * p + owner)[owned]
+
+        out = np.zeros((n_games, p, len(FEATURES)))
+        out[:, :, CELLS] = np.bincount(keys, minlength=size).reshape(n_games, p)
+        out[:, :, ENERGY] = np.bincount(keys, weights=energy[owned], minlength=size).reshape(n_games, p)
+        critical = (energy == self.board.capacity)[owned]
+        out[:, :, CRITICAL] = np.bincount(keys[critical], minlength=size).reshape(n_games, p)
+
+        a, b = owner[:, self._a], owner[:, self._b]
+        clash = (a != b) & (a != NEUTRAL) & (b != NEUTRAL)
+        flags = np.zeros(owner.shape, dtype=bool)
+        edge_rows = np.broadcast_to(np.arange(n_games)[:, None], clash.shape)[clash]
+        flags[edge_rows, np.broadcast_to(self._a, clash.shape)[clash]] = True
+        flags[edge_rows, np.broadcast_to(self._b, clash.shape)[clash]] = True
+        contested = flags[owned]
+        out[:, :, CONTESTED] = np.bincount(keys[contested], minlength=size).reshape(n_games, p)
+
+        neutral = np.count_nonzero(~owned, axis=1)
+        out[:, :, MOBILITY] = out[:, :, CELLS] + neutral[:, None]
+        return out[0] if single else out
+
+    def player_scores(self, owner: np.ndarray, energy: np.ndarray) -> np.ndarray:
+        """Get the weighted feature sum of every player, shape ``(n_players,)`` or ``(N, n_players)``."""
+        return self.features(owner, energy) @ self.weights
+
+    def scores(self, owner: np.ndarray, energy: np.ndarray, player) -> np.ndarray:
+        """
+        Score positions for a player against the strongest opponent.
+
+        Players without cells are out of the game and ignored.
+
+        Args:
+            owner: Cell owners, shape ``(n_cells,)`` or ``(N, n_cells)``.
+            energy: Cell energy of the same shape.
+            player: The player, one per position for a stack.
+
+        Returns:
+            Positive values favour the player, a float or shape ``(N,)``.
+        """
+        features = self.features(np.atleast_2d(owner), np.atleast_2d(energy))
+        totals = features @ self.weights
+        alive = features[:, :, CELLS] > 0
+        rows = np.arange(len(totals))
+        player = np.broadcast_to(np.asarray(player, dtype=np.int64), rows.shape)
+        others = np.where(alive, totals, -np.inf)
+        others[rows, player] = -np.inf
+        best_other = others.max(axis=1)
+        result = totals[rows, player] - np.where(np.isfinite(best_other), best_other, 0.0)
+        return float(result[0]) if np.ndim(owner) == 1 else result
+
+    def rewards(self, owner: np.ndarray, energy: np.ndarray) -> np.ndarray:
+        """
+        Turn positions into rewards in [0, 1] that sum to 1 over the players.
+
+        Every player living gets its share of the positive weighted scores,
+        as leaf values of a Monte Carlo search.
+
+        Returns:
+            Shape ``(n_players,)`` or ``(N, n_players)``.
+        """
+        features = self.features(owner, energy)
+        totals = np.maximum(features @ self.weights, 0.0) * (features[..., CELLS] > 0)
+        sums = totals.sum(axis=-1, keepdims=True)
+        return np.divide(totals, sums, out=np.zeros_like(totals), where=sums > 0)
@@ -0,0 +1,227 @@
+import argparse
+import numpy as np
+from typing import Tuple
+
+from .board import Board
+from .mapfile import save_map
+
+
+FAMILIES = ('grid', 'hex', 'planar', 'geometric', 'scale_free')
+
+
+def _lattice(n_cells: int) -> Tuple[int, int]:
+    cols = int(np.ceil(np.sqrt(n_cells)))
+    rows = int(np.ceil(n_cells / cols))
+    return rows, cols
+
+
+def _trim(n_cells: int, edges: np.ndarray) -> np.ndarray:
+    """Drop edges to cells past ``n_cells`` of a lattice that was rounded up."""
+    return edges[(edges < n_cells).all(axis=1)]
+
+
+def grid_graph(n_cells: int, rng: np.random.Generator):
+    """Square lattice with 4 neighbours per inner cell."""
+    rows, cols = _lattice(n_cells)
+    idx = np.arange(rows * cols).reshape(rows, cols)
+    edges = np.concatenate([
+        np.stack((idx[:, :-1].ravel(), idx[:, 1:].ravel()), axis=1),
+        np.stack((idx[:-1].ravel(), idx[1:].ravel()), axis=1),
+    ])
+    r, c = np.divmod(np.arange(n_cells), cols)
+    return np.stack((c, r), axis=1).astype(np.float32), _trim(n_cells, edges)
+
+
+def hex_graph(n_cells: int, rng: np.random.Generator):
+    """Hexagonal lattice in odd-row offset layout, 6 neighbours per inner cell."""
+    rows, cols = _lattice(n_cells)
+    idx = np.arange(rows * cols).reshape(rows, cols)
+    odd = (np.arange(rows - 1) % 2 == 1)[:, None]
+    below = idx[1:]
+    # В нечётных строках соседи снизу сдвинуты вправо на половину клетки
+    down_left = np.where(odd, below, np.roll(below, 1, axis=1))
+    down_right = np.where(odd, np.roll(below, -1, axis=1), below)
+    col = np.arange(cols)[None, :]
+    keep_left = odd | (col > 0)
+    keep_right = ~odd | (col < cols - 1)
+    upper = idx[:-1]
+    edges = np.concatenate([
+        np.stack((idx[:, :-1].ravel(), idx[:, 1:].ravel()), axis=1),
+        np.stack((upper[np.broadcast_to(keep_left, upper.shape)],
+                  down_left[np.broadcast_to(keep_left, upper.shape)]), axis=1),
+        np.stack((upper[np.broadcast_to(keep_right, upper.shape)],
+                  down_right[np.broadcast_to(keep_right, upper.shape)]), axis=1),
+    ])
+    r, c = np.divmod(np.arange(n_cells), cols)
+    positions = np.stack((c + 0.5 * (r % 2), r * np.sqrt(3) / 2), axis=1)
+    return positions.astype(np.float32), _trim(n_cells, edges)
+
+
+def planar_graph(n_cells: int, rng: np.random.Generator):
+    """Jittered lattice triangulated with random diagonals, a Delaunay-like planar graph."""
+    rows, cols = _lattice(n_cells)
+    idx = np.arange(rows * cols).reshape(rows, cols)
+    a, b = idx[:-1, :-1].ravel(), idx[:-1, 1:].ravel()
+    c, d = idx[1:, :-1].ravel(), idx[1:, 1:].ravel()
+    flip = rng.random(len(a)) < 0.5
+    diagonal = np.where(flip[:, None], np.stack((a, d), 1), np.stack((b, c), 1))
+    edges = np.concatenate([
+        np.stack((idx[:, :-1].ravel(), idx[:, 1:].ravel()), axis=1),
+        np.stack((idx[:-1].ravel(), idx[1:].ravel()), axis=1),
+        diagonal,
+    ])
+    r, c = np.divmod(np.arange(n_cells), cols)
+    positions = np.stack((c, r), axis=1) + rng.uniform(-0.3, 0.3, (n_cells, 2))
+    return positions.astype(np.float32), _trim(n_cells, edges)
+
+
+def _morton(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Interleave the bits of 16-bit coordinates into a Z-order key."""
+    def spread(v):
+        v = v.astype(np.uint64) & np.uint64(0xFFFF)
+        v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF)
+        v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F)
+        v = (v | (v << np.uint64(2))) & np.uint64(0x33333333)
+        return (v | (v << np.uint64(1))) & np.uint64(0x55555555)
+    return spread(x) | (spread(y) << np.uint64(1))
+
+
+def geometric_graph(n_cells: int, rng: np.random.Generator, degree: float = 6.0):
+    """
+    Random geometric graph: uniform points joined when closer than a radius.
+
+    Pairs are found through a bucket grid with the radius as its step, so
+    only points in neighbouring buckets are compared. A chain along the
+    Z-order curve is added to keep the graph connected.
+    """
+    side = np.sqrt(n_cells)
+    positions = rng.random((n_cells, 2)) * side
+    radius = np.sqrt(degree / np.pi)
+
+    buckets = int(np.ceil(side / radius))
+    bx = np.minimum((positions[:, 0] / radius).astype(np.int64), buckets - 1)
+    by = np.minimum((positions[:, 1] / radius).astype(np.int64), buckets - 1)
+    bucket = by * buckets + bx
+    order = np.argsort(bucket, kind='stable')
+    counts = np.bincount(bucket, minlength=buckets * buckets)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    pairs = []
+    for dx, dy in ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1)):
+        nx, ny = bx + dx, by + dy
+        ok = (nx >= 0) & (nx < buckets) & (ny < buckets)
+        src = np.flatnonzero(ok)
+        other = (ny * buckets + nx)[ok]
+        size = counts[other]
+        shift = starts[other] - (np.cumsum(size) - size)
+        dst = order[np.repeat(shift, size) + np.arange(int(size.sum()))]
+        src = np.repeat(src, size)
+        if dx == 0 and dy == 0:
+            keep = src < dst
+            src, dst = src[keep], dst[keep]
+        near = np.sum((positions[src] - positions[dst]) ** 2, axis=1) < radius ** 2
+        pairs.append(np.stack((src[near], dst[near]), axis=1))
+
+    scale = 0xFFFF / max(side, 1e-9)
+    chain = np.argsort(_morton(positions[:, 0] * scale, positions[:, 1] * scale))
+    pairs.append(np.stack((chain[:-1], chain[1:]), axis=1))
+    return positions.astype(np.float32), np.concatenate(pairs)
+
+
+def scale_free_graph(n_cells: int, rng: np.random.Generator, links: int = 2):
+    """
+    Scale-free graph close to the Barabasi-Albert model, built without a loop.
+
+    In preferential attachment the degree of the ``j``-th node grows like
+    ``sqrt(i / j)``, so every new node ``i`` takes its ``links`` targets as
+    ``floor(i * u ** 2)`` with uniform ``u``. The first link of every node
+    keeps the graph connected. Hubs are placed near the centre.
+    """
+    i = np.arange(1, n_cells)
+    targets = (i[:, None] * rng.random((n_cells - 1, links)) ** 2).astype(np.int64)
+    edges = np.stack((np.repeat(i, links), targets.ravel()), axis=1)
+
+    radius = np.sqrt(np.arange(n_cells) / max(n_cells, 1)) * np.sqrt(n_cells)
+    angle = rng.random(n_cells) * 2 * np.pi
+    positions = np.stack((radius * np.cos(angle), radius * np.sin(angle)), axis=1)
+    return positions.astype(np.float32), edges
+
+
+_BUILDERS = {
+    'grid': grid_graph,
+    'hex': hex_graph,
+    'planar': planar_graph,
+    'geometric': geometric_graph,
+    'scale_free': scale_free_graph,
+}
+
+
+def _place_players(positions: np.ndarray, n_players: int) -> np.ndarray:
+    """Pick one start cell per player, spread evenly on a circle around the centre."""
+    centre = (positions.min(axis=0) + positions.max(axis=0)) / 2
+    reach = 0.8 * (positions.max(axis=0) - positions.min(axis=0)) / 2
+    angle = 2 * np.pi * np.arange(n_players) / n_players + np.pi
+    targets = centre + reach * np.stack((np.cos(angle), np.sin(angle)), axis=1)
+    starts = []
+    for target in targets:
+        dist = np.sum((positions - target) ** 2, axis=1)
+        dist[starts] = np.inf
+        starts.append(int(np.argmin(dist)))
+    return np.asarray(starts)
+
+
+def generate(family: str, n_cells: int, n_players: int = 2, seed: int = 0):
+    """
+    Build a reproducible random map.
+
+    Args:
+        family: One of ``FAMILIES``.
+        n_cells: The number of cells.
+        n_players: The number of players, each gets one start cell.
+        seed: Seed of the generator; the same arguments give the same map.
+
+    Returns:
+        ``(board, positions)``.
+
+    Raises:
+        ValueError: If the family is unknown or the map is too small.
+    """
+    if family not in _BUILDERS:
+        raise ValueError(f"Unknown map family: {family}. Must be one of {', '.join(FAMILIES)}")
+    if n_cells < max(2, n_players):
+        raise ValueError("Map is too small for the players")
+
+    rng = np.random.default_rng(seed)
+    positions, edges = _BUILDERS[family](n_cells, rng)
+    board = Board.from_edges(n_cells, edges, n_players=n_players)
+    board.owner[_place_players(positions, n_players)] = np.arange(n_players)
+    return board, positions
+
+
+def generate_map(path: str, family: str, n_cells: int, n_players: int = 2, seed: int = 0):
+    """
+    Build a map with :func:`generate` and write it in the binary map format.
+
+    Returns:
+        The generated board.
+    """
+    board, positions = generate(family, n_cells, n_players, seed)
+    meta = dict(name=f"{family}-{n_cells}-{seed}", family=family, seed=seed)
+    save_map(path, board, positions, meta)
+    return board
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a random map")
+    parser.add_argument('family', choices=FAMILIES)
+    parser.add_argument('cells', type=int)
+    parser.add_argument('output')
+    parser.add_argument('--players', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    board = generate_map(args.output, args.family, args.cells, args.players, args.seed)
+    print(f"{args.output}: {board.n_cells} cells, {board.n_edges} edges")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+import numpy as np
+from typing import TYPE_CHECKING, Optional, Tuple
+
+from .board import OWNER_DTYPE, ENERGY_DTYPE, INDEX_DTYPE
+
+if TYPE_CHECKING:
+    from .state import GameState
+
+
+DEFAULT_CELLS = 1 << 20
+DEFAULT_MOVES = 1 << 12
+
+_BUFFERS = ('cells', 'owner', 'energy', 'border')
+_RECORDS = ('start', 'length', 'current', 'turn', 'hash', 'alive', 'moved', 'counters')
+
+
+class MoveJournal:
+    """
+    Ring buffer of reversible moves.
+
+    A move is stored as the cells it changed and their neighbours, with the
+    owner, energy and border flag each of them had before the move, plus the
+    player counters and the few scalars of the match state. Undoing it swaps
+    the stored values with the state, so the same entry then holds the values
+    after the move and redoing it is the same swap again. Both cost
+    O(changed cells) with no recounting, and no board array is ever copied.
+
+    All memory is allocated up front. When the cell buffer or the move slots
+    run out, the oldest moves are forgotten, so the history is as long as
+    the memory cap allows. A search, which must be able to unwind every move
+    it made, passes ``grow=True`` instead to have the buffers doubled. Recording
+    a move after an undo drops the moves that could have been redone.
+
+    Attributes:
+        n_players (int): Players of the journaled match.
+        cell_capacity (int): Size of the cell buffer.
+        move_capacity (int): The number of move slots.
+        cursor (int): Virtual index of the next move to record, moves
+            ``oldest .. cursor - 1`` can be undone.
+        oldest (int): Virtual index of the oldest remembered move.
+        newest (int): Virtual index after the last move that can be redone.
+        grow (bool): Whether full buffers are enlarged instead of dropping moves.
+    """
+
+    def __init__(self, n_players: int, cell_capacity: int = DEFAULT_CELLS,
+                 move_capacity: int = DEFAULT_MOVES, grow: bool = False):
+        """
+        Allocate the journal.
+
+        Args:
+            n_players: Players of the match.
+            cell_capacity: Total number of cell changes the journal holds.
+            move_capacity: Maximum number of remembered moves.
+            grow: Enlarge the buffers when they are full instead of
+                forgetting the oldest moves.
+        """
+        self.n_players = n_players
+        self.grow = grow
+        self._allocate(max(1, int(cell_capacity)), max(1, int(move_capacity)))
+        self.clear()
+
+    def _allocate(self, cell_capacity: int, move_capacity: int):
+        self.cell_capacity = cell_capacity
+        self.move_capacity = move_capacity
+        self.cells = np.zeros(cell_capacity, dtype=INDEX_DTYPE)
+        self.owner = np.zeros(cell_capacity, dtype=OWNER_DTYPE)
+        self.energy = np.zeros(cell_capacity, dtype=ENERGY_DTYPE)
+        self.border = np.zeros(cell_capacity, dtype=bool)
+
+        m = move_capacity
+        self.start = np.zeros(m, dtype=np.int64)
+        self.length = np.zeros(m, dtype=np.int64)
+        self.current = np.zeros(m, dtype=np.int64)
+        self.turn = np.zeros(m, dtype=np.int64)
+        self.hash = np.zeros(m, dtype=np.uint64)
+        self.alive = np.zeros((m, self.n_players), dtype=bool)
+        self.moved = np.zeros((m, self.n_players), dtype=bool)
+        self.counters = np.zeros((m, 3, self.n_players), dtype=np.int64)
+
+    def _enlarge(self, count: int):
+        """Reallocate the buffers with room for one more move of ``count`` cells."""
+        old = {name: getattr(self, name) for name in _BUFFERS + _RECORDS}
+        old_capacity = self.cell_capacity
+        slots = [v % self.move_capacity for v in range(self.oldest, self.cursor)]
+        used = int(self.length[slots].sum())
+        cell_capacity = self.cell_capacity
+        while cell_capacity < used + count:
+            cell_capacity *= 2
+        move_capacity = self.move_capacity
+        while move_capacity <= len(slots):
+            move_capacity *= 2
+        self._allocate(cell_capacity, move_capacity)
+
+        # Живые ходы переписываются подряд с начала новых буферов
+        position = 0
+        for slot, old_slot in enumerate(slots):
+            length = int(old['length'][old_slot])
+            begin = int(old['start'][old_slot] % old_capacity)
+            source, target = slice(begin, begin + length), slice(position, position + length)
+            for name in _BUFFERS:
+                getattr(self, name)[target] = old[name][source]
+            for name in _RECORDS:
+                getattr(self, name)[slot] = old[name][old_slot]
+            self.start[slot] = position
+            position += length
+        self.oldest, self.cursor = 0, len(slots)
+        self.newest = self.cursor
+
+    def clear(self):
+        """Forget every move."""
+        self.oldest = self.cursor = self.newest = 0
+
+    def __len__(self) -> int:
+        """Get the number of moves that can be undone."""
+        return self.cursor - self.oldest
+
+    @property
+    def n_redo(self) -> int:
+        """Get the number of moves that can be redone."""
+        return self.newest - self.cursor
+
+    def record(self, cells: np.ndarray, old_owner: np.ndarray, old_energy: np.ndarray,
+               old_border: np.ndarray, old_counters: np.ndarray, old_current: int,
+               old_turn: int, old_hash: int, old_alive: np.ndarray, old_moved: np.ndarray) -> bool:
+        """
+        Remember a move as the inverse delta of the state it left.
+
+        Args:
+            cells: Unique ids of the cells the move changed and of the cells
+                whose border flag it recomputed.
+            old_owner: Their owners before the move.
+            old_energy: Their energy before the move.
+            old_border: Their border flags before the move.
+            old_counters: ``cells``, ``energy`` and ``frontier`` player
+                counters before the move, shape ``(3, n_players)``.
+            old_current: The player to move before the move.
+            old_turn: The turn counter before the move.
+            old_hash: The position hash before the move.
+            old_alive: The alive mask before the move.
+            old_moved: The moved mask before the move.
+
+        Returns:
+            False if the move alone does not fit the cell buffer; the
+            history is then cleared, as older moves can no longer be undone.
+        """
+        count = len(cells)
+        start, end = self._place(count)
+        if self.grow and (count > self.cell_capacity or self._evicts(end)):
+            self._enlarge(count)
+            start, end = self._place(count)
+        if count > self.cell_capacity:
+            self.clear()
+            return False
+        while self._evicts(end):
+            self.oldest += 1
+
+        slot = self.cursor % self.move_capacity
+        where = slice(start % self.cell_capacity, start % self.cell_capacity + count)
+        self.cells[where] = cells
+        self.owner[where] = old_owner
+        self.energy[where] = old_energy
+        self.border[where] = old_border
+        self.counters[slot] = old_counters
+        self.start[slot], self.length[slot] = start, count
+        self.current[slot], self.turn[slot] = old_current, old_turn
+        self.hash[slot] = old_hash
+        self.alive[slot], self.moved[slot] = old_alive, old_moved
+
+        self.cursor += 1
+        self.newest = self.cursor
+        return True
+
+    def _place(self, count: int) -> Tuple[int, int]:
+        """Get the virtual cell range of the next move."""
+        start = 0
+        if self.cursor > self.oldest:
+            last = (self.cursor - 1) % self.move_capacity
+            start = int(self.start[last] + self.length[last])
+        # Запись не переходит через конец буфера, остаток в конце пропускается
+        if start % self.cell_capacity + count > self.cell_capacity:
+            start += self.cell_capacity - start % self.cell_capacity
+        return start, start + count
+
+    def _evicts(self, end: int) -> bool:
+        """Check whether the oldest move has to go to make room up to ``end``."""
+        return self.cursor > self.oldest and (
+            self.cursor - self.oldest >= self.move_capacity or
+            end - self.start[self.oldest % self.move_capacity] > self.cell_capacity)
+
+    def _swap(self, state: 'GameState', slot: int) -> np.ndarray:
+        """Exchange the stored state of a move with the state of the match."""
+        start = int(self.start[slot] % self.cell_capacity)
+        where = slice(start, start + int(self.length[slot]))
+        cells = self.cells[where].astype(np.int64)
+        board = state.board
+
+        stats = state.stats
+        owner, energy, border = board.owner[cells], board.energy[cells], stats.border[cells]
+        board.owner[cells] = self.owner[where]
+        board.energy[cells] = self.energy[where]
+        stats.border[cells] = self.border[where]
+        self.owner[where], self.energy[where], self.border[where] = owner, energy, border
+
+        counters = np.stack((stats.cells, stats.energy, stats.frontier))
+        stats.cells[:], stats.energy[:], stats.frontier[:] = self.counters[slot]
+        self.counters[slot] = counters
+
+        player = state.current
+        self.current[slot], state.current = state.current, int(self.current[slot])
+        self.turn[slot], state.turn = state.turn, int(self.turn[slot])
+        self.hash[slot], state.hash = state.hash, int(self.hash[slot])
+        alive, moved = state.alive.copy(), state.moved.copy()
+        state.alive[:], state.moved[:] = self.alive[slot], self.moved[slot]
+        self.alive[slot], self.moved[slot] = alive, moved
+        state.last_cascade = None
+        state.update_symmetric_hashes(cells, owner, energy, player)
+        return cells
+
+    def undo(self, state: 'GameState') -> Optional[np.ndarray]:
+        """
+        Take the last move back.
+
+        Args:
+            state: The match the moves were recorded from.
+
+        Returns:
+            Ids of the cells that changed, or None if there is nothing to undo.
+        """
+        if self.cursor <= self.oldest:
+            return None
+        self.cursor -= 1
+        return self._swap(state, self.cursor % self.move_capacity)
+
+    def redo(self, state: 'GameState') -> Optional[np.ndarray]:
+        """Play the last undone move again, see :meth:`undo`."""
+        if self.cursor >= self.newest:
+            return None
+        cells = self._swap(state, self.cursor % self.move_capacity)
+        self.cursor += 1
+        return cells
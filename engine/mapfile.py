@@ -0,0 +1,294 @@
+import json
+import struct
+import xml.etree.ElementTree as ET
+import numpy as np
+from typing import Dict, Optional
+
+from .board import Board, NEUTRAL, edges_to_csr, OWNER_DTYPE, ENERGY_DTYPE
+from .distances import DistanceTable, distance_table
+from .symmetry import Symmetry, map_symmetry
+
+
+MAGIC = b'GECM'
+VERSION = 1
+ALIGN = 64
+
+_PREFIX = struct.Struct('<4sBI')
+
+# Разделы, без которых карту не загрузить; остальные читаются по запросу
+REQUIRED = ('position', 'indptr', 'indices', 'owner', 'energy', 'capacity')
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def save_map(path: str, board: Board, positions: np.ndarray,
+             meta: Optional[Dict] = None, extra: Optional[Dict] = None):
+    """
+    Write a map in the binary container format.
+
+    The file is a short prefix, a JSON table of contents and then every
+    section as raw little-endian array data aligned to 64 bytes, so that it
+    can be memory-mapped back without parsing.
+
+    Args:
+        path: The output file.
+        board: The map with its starting position.
+        positions: Cell centres, shape ``(n_cells, 2)``.
+        meta: Free-form map metadata (name, author, ...).
+        extra: Optional sections, arrays or JSON-serialisable values.
+    """
+    sections = {
+        'position': np.asarray(positions, dtype=np.float32).reshape(board.n_cells, 2),
+        'indptr': board.indptr,
+        'indices': board.indices,
+        'owner': board.owner,
+        'energy': board.energy,
+        'capacity': board.capacity,
+    }
+    kinds = dict.fromkeys(sections, 'array')
+    for name, value in (extra or {}).items():
+        if isinstance(value, np.ndarray):
+            sections[name], kinds[name] = value, 'array'
+        else:
+            sections[name] = np.frombuffer(json.dumps(value).encode('utf-8'), dtype=np.uint8)
+            kinds[name] = 'json'
+
+    toc, offset = {}, 0
+    for name, array in sections.items():
+        array = np.ascontiguousarray(array)
+        sections[name] = array
+        toc[name] = {
+            'dtype': array.dtype.newbyteorder('<').str,
+            'shape': list(array.shape),
+            'offset': offset,
+            'kind': kinds[name],
+        }
+        offset = _align(offset + array.nbytes)
+
+    header = json.dumps({
+        'n_players': board.n_players,
+        'map_hash': board.map_hash(),
+        'meta': meta or {},
+        'sections': toc,
+    }).encode('utf-8')
+    data_start = _align(_PREFIX.size + len(header))
+
+    with open(path, 'wb') as file:
+        file.write(_PREFIX.pack(MAGIC, VERSION, len(header)) + header)
+        for name, array in sections.items():
+            file.seek(data_start + toc[name]['offset'])
+            file.write(array.astype(toc[name]['dtype'], copy=False).tobytes())
+        file.truncate(data_start + offset)
+
+
+class MapFile:
+    """
+    Lazily memory-mapped binary map.
+
+    Opening reads only the table of contents. Each section is mapped with
+    ``np.memmap`` on first access, so a map with a million cells opens
+    instantly and optional sections such as decorations or editor notes cost
+    nothing until they are asked for.
+
+    Attributes:
+        path (str): The map file.
+        n_players (int): The number of players.
+        map_hash (str): ``Board.map_hash`` of the map.
+        meta (Dict): Free-form map metadata.
+        sections (Dict): The table of contents.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a map file.
+
+        Args:
+            path: The map file.
+
+        Raises:
+            ValueError: If the file is not a map of a supported version.
+        """
+        self.path = path
+        with open(path, 'rb') as file:
+            magic, version, length = _PREFIX.unpack(file.read(_PREFIX.size))
+            if magic != MAGIC:
+                raise ValueError("Not a map file")
+            if version != VERSION:
+                raise ValueError(f"Unsupported map version: {version}")
+            header = json.loads(file.read(length).decode('utf-8'))
+
+        self._data_start = _align(_PREFIX.size + length)
+        self.n_players = header['n_players']
+        self.map_hash = header['map_hash']
+        self.meta = header['meta']
+        self.sections = header['sections']
+        self._cache = {}
+
+        missing = [name for name in REQUIRED if name not in self.sections]
+        if missing:
+            raise ValueError(f"Map file lacks sections: {', '.join(missing)}")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.sections
+
+    def section(self, name: str):
+        """
+        Get a section, mapping it on first use.
+
+        Args:
+            name: The section name.
+
+        Returns:
+            A read-only memory-mapped array, or the decoded value of a JSON section.
+
+        Raises:
+            KeyError: If there is no such section.
+        """
+        if name not in self._cache:
+            entry = self.sections[name]
+            shape = tuple(entry['shape'])
+            if not np.prod(shape, dtype=np.int64):
+                array = np.zeros(shape, dtype=entry['dtype'])
+            else:
+                array = np.memmap(self.path, dtype=entry['dtype'], mode='r',
+                                  offset=self._data_start + entry['offset'], shape=shape)
+            if entry['kind'] == 'json':
+                self._cache[name] = json.loads(array.tobytes().decode('utf-8'))
+            else:
+                self._cache[name] = array
+        return self._cache[name]
+
+    @property
+    def positions(self) -> np.ndarray:
+        """Get the cell centres, shape ``(n_cells, 2)``."""
+        return self.section('position')
+
+    def board(self) -> Board:
+        """
+        Build a board from the mapped arrays.
+
+        The adjacency and capacities stay memory-mapped; only the mutable
+        owner and energy arrays are copied into memory.
+        """
+        return Board(
+            self.section('indptr'), self.section('indices'), n_players=self.n_players,
+            owner=self.section('owner'), energy=self.section('energy'),
+            capacity=self.section('capacity'),
+        )
+
+    def distances(self, cache_dir: Optional[str] = None, board: Optional[Board] = None,
+                  **options) -> DistanceTable:
+        """
+        Get the distance table of the map, cached under the stored map hash.
+
+        Args:
+            cache_dir: Directory of cached tables, no caching if omitted.
+            board: The board of the map, built from the file if omitted.
+            **options: Passed to :meth:`DistanceTable.build` on a cache miss.
+        """
+        return distance_table(board if board is not None else self.board(), cache_dir,
+                              self.map_hash, **options)
+
+    def symmetry(self, cache_dir: Optional[str] = None, board: Optional[Board] = None,
+                 **options) -> Symmetry:
+        """
+        Get the symmetries of the map, cached under the stored map hash.
+
+        Args:
+            cache_dir: Directory of cached results, no caching if omitted.
+            board: The board of the map, built from the file if omitted.
+            **options: Passed to :func:`engine.symmetry.find_automorphisms` on a cache miss.
+        """
+        return map_symmetry(board if board is not None else self.board(), self.positions,
+                            cache_dir, self.map_hash, **options)
+
+
+def load_map(path: str) -> MapFile:
+    """Open a binary map file, see :class:`MapFile`."""
+    return MapFile(path)
+
+
+def convert_xml(xml_path: str, out_path: str) -> MapFile:
+    """
+    Convert an XML map into the binary format.
+
+    The XML form follows the scene files::
+
+        <map players="2" name="...">
+            <cell id="0" x="10" y="20" owner="0" energy="1" capacity="3"/>
+            <edge a="0" b="1"/>
+            <decoration .../>
+            <note>...</note>
+        </map>
+
+    Cells without ``id`` are numbered in document order; ``owner``,
+    ``energy`` and ``capacity`` are optional. Any other child tags are kept
+    as optional JSON sections named after the tag, with one object per
+    element. The file is read with ``iterparse``, so large maps are converted
+    without building the whole tree.
+
+    Args:
+        xml_path: The XML map.
+        out_path: The binary map to write.
+
+    Returns:
+        The converted map, opened.
+    """
+    meta = {}
+    ids, xs, ys, owners, energies, capacities = [], [], [], [], [], []
+    edges = []
+    extra = {}
+    depth = 0
+
+    for event, element in ET.iterparse(xml_path, events=('start', 'end')):
+        if event == 'start':
+            if depth == 0:
+                meta = dict(element.attrib)
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+
+        tag = element.tag
+        if tag == 'cell':
+            ids.append(int(element.get('id', len(ids))))
+            xs.append(float(element.get('x', 0)))
+            ys.append(float(element.get('y', 0)))
+            owners.append(int(element.get('owner', NEUTRAL)))
+            energies.append(int(element.get('energy', 0)))
+            capacities.append(int(element.get('capacity', -1)))
+        elif tag == 'edge':
+            edges.append((int(element.get('a')), int(element.get('b'))))
+        else:
+            item = dict(element.attrib)
+            if element.text and element.text.strip():
+                item['text'] = element.text.strip()
+            extra.setdefault(tag, []).append(item)
+        element.clear()
+
+    n = len(ids)
+    order = np.argsort(np.asarray(ids, dtype=np.int64))
+    if n and not np.array_equal(np.asarray(ids)[order], np.arange(n)):
+        raise ValueError("Cell ids must be 0..n-1")
+
+    def column(values, dtype):
+        return np.asarray(values, dtype=dtype)[order]
+
+    indptr, indices = edges_to_csr(n, edges)
+    degree = np.diff(indptr)
+    capacity = column(capacities, np.int64)
+    capacity = np.where(capacity < 0, np.maximum(degree - 1, 0), capacity)
+
+    board = Board(
+        indptr, indices,
+        n_players=int(meta.pop('players', 2)),
+        owner=column(owners, OWNER_DTYPE),
+        energy=column(energies, ENERGY_DTYPE),
+        capacity=capacity.astype(ENERGY_DTYPE),
+    )
+    positions = np.stack((column(xs, np.float32), column(ys, np.float32)), axis=1)
+    save_map(out_path, board, positions, meta, extra)
+    return MapFile(out_path)
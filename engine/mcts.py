@@ -0,0 +1,414 @@
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional
+
+from .board import NEUTRAL
+from .cascade import gather_neighbours, resolve_cascade
+from .evaluation import Evaluator
+from .state import GameState
+from .transposition import NO_MOVE
+
+
+ROOT = 0
+# Time left to send the trees back and merge them, in seconds
+MERGE_MARGIN = 0.005
+
+
+class MCTSResult(NamedTuple):
+    """
+    Outcome of a Monte Carlo search.
+
+    Attributes:
+        move: The most visited root move, ``NO_MOVE`` if there is none.
+        value: Average reward of that move for the player to move.
+        visits: Visits of that move summed over all trees.
+        playouts: The number of playouts over all workers.
+        elapsed: Wall-clock time of the search in seconds.
+    """
+    move: int
+    value: float
+    visits: int
+    playouts: int
+    elapsed: float
+
+    @property
+    def playouts_per_second(self) -> float:
+        """Get the playout throughput of the search."""
+        return self.playouts / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class SearchTree:
+    """
+    Monte Carlo search tree kept in preallocated flat arrays.
+
+    A node is a row index; its children occupy one contiguous block
+    ``first_child .. first_child + n_children``. No Python object is created
+    per node, and a full tree simply stops expanding.
+
+    Attributes:
+        move (np.ndarray): The move leading to each node.
+        player (np.ndarray): The player who made that move.
+        parent (np.ndarray): Parent row of each node.
+        first_child (np.ndarray): First child row, -1 if not expanded.
+        n_children (np.ndarray): Number of children.
+        visits (np.ndarray): Visit counts.
+        reward (np.ndarray): Summed rewards for ``player``.
+        size (int): The number of nodes in use.
+    """
+
+    def __init__(self, capacity: int):
+        """
+        Initialize an empty tree with only the root.
+
+        Args:
+            capacity: Maximum number of nodes.
+        """
+        self.move = np.full(capacity, NO_MOVE, dtype=np.int32)
+        self.player = np.full(capacity, NEUTRAL, dtype=np.int8)
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.first_child = np.full(capacity, -1, dtype=np.int32)
+        self.n_children = np.zeros(capacity, dtype=np.int32)
+        self.visits = np.zeros(capacity, dtype=np.float64)
+        self.reward = np.zeros(capacity, dtype=np.float64)
+        self.size = 1
+
+    def expand(self, node: int, moves: np.ndarray, player: int) -> bool:
+        """Add one child per move below a node, if there is room left."""
+        count = len(moves)
+        if not count or self.size + count > len(self.move):
+            return False
+        block = slice(self.size, self.size + count)
+        self.move[block] = moves
+        self.player[block] = player
+        self.parent[block] = node
+        self.first_child[node] = self.size
+        self.n_children[node] = count
+        self.size += count
+        return True
+
+    def select_child(self, node: int, exploration: float) -> int:
+        """Pick the child with the best UCT score."""
+        start = self.first_child[node]
+        block = slice(start, start + self.n_children[node])
+        visits = self.visits[block]
+        unvisited = np.flatnonzero(visits == 0)
+        if len(unvisited):
+            return int(start + unvisited[0])
+        uct = self.reward[block] / visits + exploration * np.sqrt(
+            np.log(self.visits[node]) / visits)
+        return int(start + np.argmax(uct))
+
+    def backpropagate(self, node: int, rewards: np.ndarray):
+        """Add a playout result to a node and all its ancestors."""
+        while node >= 0:
+            self.visits[node] += 1
+            player = self.player[node]
+            if player != NEUTRAL:
+                self.reward[node] += rewards[player]
+            node = self.parent[node]
+
+    def root_children(self):
+        """Get the moves, visits and rewards of the root's children."""
+        start = self.first_child[ROOT]
+        if start < 0:
+            empty = np.zeros(0)
+            return empty.astype(np.int32), empty, empty
+        block = slice(start, start + self.n_children[ROOT])
+        return self.move[block].copy(), self.visits[block].copy(), self.reward[block].copy()
+
+
+class PlayoutState:
+    """
+    Light copy of a match for the search: moves go straight into the board arrays.
+
+    Only the rules are kept: cell counts, eliminations and the turn order.
+    Position hashes, symmetric keys, the undo journal and the player stats of
+    :class:`GameState` are skipped, and a non-spilling move costs a few scalar
+    writes. The changed cells are remembered, so :meth:`reset` loads the root
+    back by rewriting only them instead of whole arrays.
+
+    Attributes:
+        root (GameState): The position every search pass starts from.
+        board (Board): Working copy of the root board.
+        current (int): The player to move.
+        cells (np.ndarray): Number of cells owned by each player.
+        alive (np.ndarray): Boolean mask of players still in the game.
+        moved (np.ndarray): Boolean mask of players who have made a move.
+    """
+
+    def __init__(self, root: GameState):
+        """
+        Initialize a working copy of a position.
+
+        Args:
+            root: The position, left unchanged.
+        """
+        self.root = root
+        self.board = root.board.copy()
+        self.max_waves = root.max_waves
+        self.current = root.current
+        self.cells = root.stats.cells.copy()
+        self.alive = root.alive.copy()
+        self.moved = root.moved.copy()
+        self._played = []
+        self._spilled = []
+
+    def reset(self):
+        """Load the root position back, rewriting only the cells changed since."""
+        board, origin = self.board, self.root.board
+        if self._spilled:
+            changed = np.concatenate(self._spilled)
+            board.owner[changed] = origin.owner[changed]
+            board.energy[changed] = origin.energy[changed]
+            self._spilled.clear()
+        if self._played:
+            changed = np.array(self._played)
+            board.owner[changed] = origin.owner[changed]
+            board.energy[changed] = origin.energy[changed]
+            self._played.clear()
+        self.current = self.root.current
+        np.copyto(self.cells, self.root.stats.cells)
+        np.copyto(self.alive, self.root.alive)
+        np.copyto(self.moved, self.root.moved)
+
+    def legal_moves(self) -> np.ndarray:
+        """Get the ids of cells the current player may put energy into."""
+        owner = self.board.owner
+        return np.flatnonzero((owner == self.current) | (owner == NEUTRAL))
+
+    def border(self, cells: np.ndarray) -> np.ndarray:
+        """Check which of the given cells are owned and touch another owner."""
+        board = self.board
+        owner = board.owner
+        deg = board.degree[cells]
+        mismatch = owner[gather_neighbours(board, cells)] != np.repeat(owner[cells], deg)
+        row = np.repeat(np.arange(len(cells)), deg)
+        flags = np.bincount(row, weights=mismatch, minlength=len(cells)) > 0
+        return flags & (owner[cells] != NEUTRAL)
+
+    def play(self, cell: int):
+        """Make a legal move for the current player and pass the turn."""
+        board = self.board
+        player = self.current
+        self._played.append(cell)
+        if board.owner[cell] == NEUTRAL:
+            self.cells[player] += 1
+        board.owner[cell] = player
+        board.energy[cell] += 1
+        if board.energy[cell] > board.capacity[cell]:
+            result = resolve_cascade(board, cell, player, self.max_waves,
+                                     foreign=board.n_cells - int(self.cells[player]))
+            self._spilled.append(result.touched)
+            # Все задетые цепью клетки теперь принадлежат ходящему
+            was = result.old_owner != NEUTRAL
+            self.cells -= np.bincount(result.old_owner[was], minlength=len(self.cells))
+            self.cells[player] += len(result.touched)
+
+        self.moved[player] = True
+        self.alive &= ~(self.moved & (self.cells == 0))
+        if self.is_over:
+            return
+        n = board.n_players
+        player = (player + 1) % n
+        while not self.alive[player]:
+            player = (player + 1) % n
+        self.current = player
+
+    @property
+    def is_over(self) -> bool:
+        """Check whether only one player is left."""
+        return np.count_nonzero(self.alive) <= 1
+
+    @property
+    def winner(self) -> Optional[int]:
+        """Get the winning player, or None while the match goes on."""
+        if not self.is_over:
+            return None
+        alive = np.flatnonzero(self.alive)
+        return int(alive[0]) if len(alive) else None
+
+
+def _candidate_moves(state: PlayoutState, width: int) -> np.ndarray:
+    """Get up to ``width`` legal moves, cells about to overload and border cells first."""
+    moves = state.legal_moves()
+    if len(moves) <= width:
+        return moves
+    board = state.board
+    priority = (board.energy[moves] == board.capacity[moves]) * 2.0
+    priority += state.border(moves) + (board.owner[moves] == NEUTRAL) * 0.5
+    return moves[np.argpartition(-priority, width - 1)[:width]]
+
+
+def _rewards(state: PlayoutState, evaluator: Evaluator) -> np.ndarray:
+    """Score the end of a playout, one value in [0, 1] per player."""
+    rewards = np.zeros(state.board.n_players)
+    if state.winner is not None:
+        rewards[state.winner] = 1.0
+        return rewards
+    return evaluator.rewards(state.board.owner, state.board.energy) * state.alive
+
+
+def _playout(state: PlayoutState, depth: int, rng: np.random.Generator,
+             evaluator: Evaluator) -> np.ndarray:
+    for _ in range(depth):
+        if state.is_over:
+            break
+        moves = state.legal_moves()
+        state.play(int(moves[rng.integers(len(moves))]))
+    return _rewards(state, evaluator)
+
+
+def grow_tree(state: GameState, budget: float, iterations: Optional[int] = None,
+              seed: int = 0, exploration: float = 1.4, width: int = 32,
+              playout_depth: int = 64, capacity: int = 1 << 18,
+              until: Optional[float] = None):
+    """
+    Run MCTS from a position in the current process.
+
+    This is the worker of the root-parallel search; it is a plain module-level
+    function so that it can be sent to a process pool. At least one playout
+    is always made, so the root has children even when the time ran out
+    before the worker started.
+
+    Args:
+        state: The root position, left unchanged.
+        budget: Wall-clock budget in seconds.
+        iterations: Optional cap on the number of playouts.
+        seed: Seed of the playout random generator.
+        exploration: The UCT exploration constant.
+        width: Maximum number of children per node.
+        playout_depth: Maximum number of random moves per playout.
+        capacity: Maximum number of tree nodes.
+        until: Absolute :func:`time.time` deadline replacing ``budget``, so
+            that the time spent starting workers counts against the move.
+
+    Returns:
+        ``(moves, visits, rewards, playouts)`` of the root's children.
+    """
+    # perf_counter несравним между процессами, срок передаётся по time.time
+    if until is not None:
+        budget = until - time.time()
+    deadline = time.perf_counter() + budget
+    rng = np.random.default_rng(seed)
+    tree = SearchTree(capacity)
+    # Одна рабочая копия на весь поиск, каждый проход возвращает в ней только изменённые клетки
+    sim = PlayoutState(state)
+    evaluator = Evaluator(state.board)
+    playouts = 0
+
+    while ((time.perf_counter() < deadline or not playouts)
+           and (iterations is None or playouts < iterations)):
+        sim.reset()
+
+        node = ROOT
+        while tree.first_child[node] >= 0 and not sim.is_over:
+            node = tree.select_child(node, exploration)
+            sim.play(int(tree.move[node]))
+
+        if not sim.is_over and (tree.visits[node] > 0 or node == ROOT):
+            if tree.expand(node, _candidate_moves(sim, width), sim.current):
+                node = tree.select_child(node, exploration)
+                sim.play(int(tree.move[node]))
+
+        tree.backpropagate(node, _playout(sim, playout_depth, rng, evaluator))
+        playouts += 1
+
+    moves, visits, rewards = tree.root_children()
+    return moves, visits, rewards, playouts
+
+
+class MCTSBot:
+    """
+    Root-parallel Monte Carlo Tree Search player.
+
+    Every worker process grows its own tree from the same root with its own
+    random seed; the root statistics of all trees are then merged and the
+    most visited move wins. The pool is created once and reused between
+    moves, and ``workers=0`` runs a single tree in the calling process.
+
+    Attributes:
+        budget (float): Wall-clock budget of a move in seconds.
+        workers (int): The number of worker processes.
+        last_result (MCTSResult): The result of the latest search.
+    """
+
+    def __init__(self, budget: float = 1.0, workers: Optional[int] = None,
+                 exploration: float = 1.4, width: int = 32, playout_depth: int = 64,
+                 capacity: int = 1 << 18, seed: int = 0):
+        """
+        Initialize the bot.
+
+        Args:
+            budget: Wall-clock budget of a move in seconds.
+            workers: Worker processes, one per CPU if omitted.
+            exploration: The UCT exploration constant.
+            width: Maximum number of children per node.
+            playout_depth: Maximum number of random moves per playout.
+            capacity: Maximum number of nodes of each tree.
+            seed: Base seed, every worker and move gets its own stream.
+        """
+        self.budget = budget
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.options = dict(exploration=exploration, width=width,
+                            playout_depth=playout_depth, capacity=capacity)
+        self._seeds = np.random.SeedSequence(seed)
+        self._pool = None
+        self.last_result: Optional[MCTSResult] = None
+
+    def choose_move(self, state: GameState, budget: Optional[float] = None,
+                    iterations: Optional[int] = None) -> MCTSResult:
+        """
+        Search the best move for the player to move.
+
+        Args:
+            state: The position, left unchanged.
+            budget: Wall-clock budget, the bot's own if omitted.
+            iterations: Optional cap on playouts per tree.
+
+        Returns:
+            The merged result of all trees.
+        """
+        budget = self.budget if budget is None else budget
+        start = time.perf_counter()
+        if state.is_over:
+            return MCTSResult(NO_MOVE, 0.0, 0, 0, 0.0)
+        # Запуск пула и передача позиции входят в бюджет хода
+        until = time.time() + budget - MERGE_MARGIN
+
+        seeds = [int(s.generate_state(1)[0]) for s in self._seeds.spawn(max(1, self.workers))]
+        if self.workers <= 0:
+            trees = [grow_tree(state, budget, iterations, seeds[0], until=until, **self.options)]
+        else:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers)
+            futures = [self._pool.submit(grow_tree, state, budget, iterations, seed, until=until,
+                                         **self.options)
+                       for seed in seeds]
+            trees = [future.result() for future in futures]
+
+        moves = np.concatenate([tree[0] for tree in trees])
+        playouts = sum(tree[3] for tree in trees)
+        if not len(moves):
+            return MCTSResult(NO_MOVE, 0.0, 0, playouts, time.perf_counter() - start)
+
+        merged, inverse = np.unique(moves, return_inverse=True)
+        visits = np.bincount(inverse, weights=np.concatenate([tree[1] for tree in trees]))
+        rewards = np.bincount(inverse, weights=np.concatenate([tree[2] for tree in trees]))
+        best = int(np.argmax(visits))
+
+        self.last_result = MCTSResult(
+            move=int(merged[best]),
+            value=float(rewards[best] / visits[best]) if visits[best] else 0.0,
+            visits=int(visits[best]),
+            playouts=playouts,
+            elapsed=time.perf_counter() - start,
+        )
+        return self.last_result
+
+    def close(self):
+        """Shut the worker pool down."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
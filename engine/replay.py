@@ -0,0 +1,362 @@
+import json
+import mmap
+import struct
+import zlib
+import numpy as np
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from .board import Board, OWNER_DTYPE, ENERGY_DTYPE
+from .state import GameState
+from .zobrist import ZobristKeys
+
+
+MAGIC = b'GECR'
+VERSION = 1
+
+TAG_MOVES = 1
+TAG_KEYFRAME = 2
+TAG_END = 3
+
+_HEADER = struct.Struct('<4sBI')
+_KEYFRAME = struct.Struct('<QQB')
+
+
+def encode_varints(values) -> bytes:
+    """
+    Pack non-negative integers as LEB128 varints without a Python loop.
+
+    Args:
+        values: Array-like of non-negative integers.
+
+    Returns:
+        The packed bytes.
+    """
+    values = np.asarray(values, dtype=np.uint64).reshape(-1)
+    if not len(values):
+        return b''
+    sizes = np.ones(len(values), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        sizes += values >= (np.uint64(1) << np.uint64(shift))
+    ends = np.cumsum(sizes)
+    starts = ends - sizes
+    out = np.empty(int(ends[-1]), dtype=np.uint8)
+    for k in range(int(sizes.max())):
+        sel = sizes > k
+        part = (values[sel] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (sizes[sel] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[sel] + k] = (part | more).astype(np.uint8)
+    return out.tobytes()
+
+
+def decode_varints(data) -> np.ndarray:
+    """
+    Unpack a buffer of LEB128 varints without a Python loop.
+
+    Args:
+        data: Bytes or a uint8 array holding whole varints only.
+
+    Returns:
+        The decoded values as uint64.
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if not len(raw):
+        return np.zeros(0, dtype=np.uint64)
+    ends = raw < 0x80
+    starts = np.concatenate(([0], np.flatnonzero(ends)[:-1] + 1))
+    position = np.arange(len(raw)) - np.repeat(starts, np.diff(np.append(starts, len(raw))))
+    parts = (raw & 0x7F).astype(np.uint64) << (np.uint64(7) * position.astype(np.uint64))
+    return np.add.reduceat(parts, starts)
+
+
+def _read_varint(buffer, offset: int):
+    """Read one varint, return ``(value, next_offset)``."""
+    value = shift = 0
+    while True:
+        byte = buffer[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+class ReplayHeader(NamedTuple):
+    """
+    The fixed part at the start of a replay file.
+
+    Attributes:
+        map_hash: ``Board.map_hash`` of the map the match was played on.
+        rules: Match settings: player count, wave limit, hash seed and so on.
+        seed: Seed the match was started with, for bots and random maps.
+        size: Length of the header in bytes.
+    """
+    map_hash: str
+    rules: Dict
+    seed: int
+    size: int
+
+
+class ReplayWriter:
+    """
+    Append-only recorder of a match.
+
+    The file is a header followed by framed records (tag byte, varint
+    length, payload): chunks of varint-packed moves and, every
+    ``keyframe_interval`` turns, a zlib-compressed full state. Moves are
+    buffered only until the next keyframe, so a crashed game loses at most
+    one interval.
+
+    Attributes:
+        state (GameState): The recorded match.
+        keyframe_interval (int): Turns between two keyframes.
+    """
+
+    def __init__(self, path: str, state: GameState, seed: int = 0,
+                 rules: Optional[Dict] = None, keyframe_interval: int = 256):
+        """
+        Create the file and write the header and the starting keyframe.
+
+        Args:
+            path: The replay file.
+            state: The match, recorded from its current position.
+            seed: Seed of the match.
+            rules: Extra settings to keep in the header.
+            keyframe_interval: Turns between two keyframes.
+        """
+        self.state = state
+        self.keyframe_interval = keyframe_interval
+        self._pending: List[int] = []
+        self._pending_turn = state.turn
+        self._file = open(path, 'wb')
+
+        rules = dict(rules or {})
+        rules.setdefault('n_players', state.board.n_players)
+        rules.setdefault('n_cells', state.board.n_cells)
+        rules.setdefault('max_waves', state.max_waves)
+        rules.setdefault('hash_seed', state.keys.seed)
+        rules.setdefault('keyframe_interval', keyframe_interval)
+        body = json.dumps({
+            'map_hash': state.board.map_hash(),
+            'rules': rules,
+            'seed': int(seed),
+        }).encode('utf-8')
+        self._file.write(_HEADER.pack(MAGIC, VERSION, len(body)) + body)
+        self._write_keyframe()
+
+    def _write_record(self, tag: int, payload: bytes):
+        self._file.write(bytes((tag,)) + encode_varints([len(payload)]) + payload)
+
+    def _write_keyframe(self):
+        state = self.state
+        board = state.board
+        payload = _KEYFRAME.pack(state.turn, state.hash, state.current)
+        payload += np.packbits(state.alive).tobytes() + np.packbits(state.moved).tobytes()
+        payload += zlib.compress(board.owner.tobytes() + board.energy.tobytes())
+        self._write_record(TAG_KEYFRAME, payload)
+
+    def flush(self):
+        """Write the buffered moves to the file."""
+        if self._pending:
+            payload = encode_varints([self._pending_turn, len(self._pending)])
+            payload += encode_varints(self._pending)
+            self._write_record(TAG_MOVES, payload)
+            self._pending.clear()
+        self._pending_turn = self.state.turn
+        self._file.flush()
+
+    def record(self, move: int):
+        """
+        Add a move that has just been played on the recorded state.
+
+        Args:
+            move: The played cell.
+        """
+        self._pending.append(int(move))
+        if self.state.turn % self.keyframe_interval == 0:
+            self.flush()
+            self._write_keyframe()
+
+    def close(self):
+        """Finish the file with the match result."""
+        if self._file.closed:
+            return
+        self.flush()
+        winner = self.state.winner
+        self._write_record(TAG_END, encode_varints([self.state.turn, 0 if winner is None else winner + 1]))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_header(path: str) -> ReplayHeader:
+    """
+    Read only the header of a replay file.
+
+    Args:
+        path: The replay file.
+
+    Raises:
+        ValueError: If the file is not a replay of a supported version.
+    """
+    with open(path, 'rb') as file:
+        return _parse_header(file.read(_HEADER.size), file.read)
+
+
+def _parse_header(prefix: bytes, read) -> ReplayHeader:
+    magic, version, length = _HEADER.unpack(prefix)
+    if magic != MAGIC:
+        raise ValueError("Not a replay file")
+    if version != VERSION:
+        raise ValueError(f"Unsupported replay version: {version}")
+    body = json.loads(read(length).decode('utf-8'))
+    return ReplayHeader(body['map_hash'], body['rules'], body['seed'], _HEADER.size + length)
+
+
+class ReplayReader:
+    """
+    Memory-mapped reader of a replay file.
+
+    Opening a replay maps the file and walks the record frames once, reading
+    only tags and lengths, to index keyframes and move chunks. Payloads are
+    decoded on demand, so scanning many replays touches little more than
+    their headers and frames.
+
+    Attributes:
+        header (ReplayHeader): The replay header.
+        keyframes (List[Tuple[int, int]]): ``(turn, offset)`` of each keyframe.
+        chunks (List[Tuple[int, int, int]]): ``(first_turn, count, offset)`` of
+            each move chunk.
+        turns (int): The number of recorded moves.
+        finished (bool): Whether the end record was written.
+        winner (Optional[int]): The winner of a finished match, if any.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a replay file.
+
+        Args:
+            path: The replay file.
+        """
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.header = _parse_header(self._map[:_HEADER.size],
+                                    lambda n: self._map[_HEADER.size:_HEADER.size + n])
+        self.keyframes = []
+        self.chunks = []
+        self.turns = 0
+        self.winner = None
+        self.finished = False
+        self._index()
+
+    def _records(self) -> Iterator:
+        buffer = self._map
+        offset = self.header.size
+        while offset < len(buffer):
+            tag = buffer[offset]
+            length, start = _read_varint(buffer, offset + 1)
+            if start + length > len(buffer):
+                break
+            yield tag, start, length
+            offset = start + length
+
+    def _index(self):
+        self._lengths = {}
+        for tag, start, length in self._records():
+            self._lengths[start] = length
+            if tag == TAG_KEYFRAME:
+                turn = _KEYFRAME.unpack_from(self._map, start)[0]
+                self.keyframes.append((turn, start))
+                self.turns = max(self.turns, turn)
+            elif tag == TAG_MOVES:
+                first, offset = _read_varint(self._map, start)
+                count, offset = _read_varint(self._map, offset)
+                self.chunks.append((first, count, start))
+                self.turns = max(self.turns, first + count)
+            elif tag == TAG_END:
+                values = decode_varints(self._map[start:start + length])
+                self.winner = int(values[1]) - 1 if values[1] else None
+                self.finished = True
+
+    def moves(self, first: int = 0, last: Optional[int] = None) -> Iterator[int]:
+        """
+        Stream the recorded moves.
+
+        Args:
+            first: Turn of the first move to yield.
+            last: Turn to stop before, the end of the replay if omitted.
+        """
+        last = self.turns if last is None else last
+        for start_turn, count, offset in self.chunks:
+            if start_turn + count <= first or start_turn >= last:
+                continue
+            for turn, move in enumerate(self._chunk_moves(offset), start_turn):
+                if first <= turn < last:
+                    yield int(move)
+
+    def _chunk_moves(self, offset: int) -> np.ndarray:
+        length = self._lengths[offset]
+        _, pos = _read_varint(self._map, offset)
+        _, pos = _read_varint(self._map, pos)
+        return decode_varints(self._map[pos:offset + length])
+
+    def seek(self, board: Board, turn: int) -> GameState:
+        """
+        Rebuild the match at a given turn from the nearest earlier keyframe.
+
+        Args:
+            board: The map the match was played on; its state is overwritten.
+            turn: The turn to stop at.
+
+        Returns:
+            The match with ``turn`` moves played.
+
+        Raises:
+            ValueError: If the board is not the map of the replay.
+        """
+        if board.map_hash() != self.header.map_hash:
+            raise ValueError("The board is not the map of this replay")
+        turn = max(0, min(turn, self.turns))
+        frame_turn, offset = max((k for k in self.keyframes if k[0] <= turn), default=self.keyframes[0])
+        state = self._load_keyframe(board, offset)
+        for move in self.moves(frame_turn, turn):
+            state.play(move)
+        return state
+
+    def _load_keyframe(self, board: Board, offset: int) -> GameState:
+        n, p = board.n_cells, board.n_players
+        turn, hash_, current = _KEYFRAME.unpack_from(self._map, offset)
+        pos = offset + _KEYFRAME.size
+        mask_size = (p + 7) // 8
+        alive = np.unpackbits(np.frombuffer(self._map, np.uint8, mask_size, pos))[:p].astype(bool)
+        moved = np.unpackbits(np.frombuffer(self._map, np.uint8, mask_size, pos + mask_size))[:p].astype(bool)
+        pos += 2 * mask_size
+
+        raw = zlib.decompress(self._map[pos:offset + self._lengths[offset]])
+        owner_size = n * np.dtype(OWNER_DTYPE).itemsize
+        board.owner[:] = np.frombuffer(raw, OWNER_DTYPE, n)
+        board.energy[:] = np.frombuffer(raw, ENERGY_DTYPE, n, owner_size)
+
+        rules = self.header.rules
+        state = GameState(board, current, ZobristKeys(rules.get('hash_seed', 0)))
+        state.max_waves = rules.get('max_waves', state.max_waves)
+        state.turn = turn
+        state.alive[:] = alive
+        state.moved[:] = moved
+        state.hash = hash_
+        return state
+
+    def close(self):
+        """Unmap and close the file."""
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
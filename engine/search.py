@@ -0,0 +1,282 @@
+import time
+import numpy as np
+from typing import Callable, NamedTuple, Optional
+
+from .board import NEUTRAL
+from .journal import MoveJournal
+from .state import GameState
+from .transposition import TranspositionTable, EXACT, LOWER, UPPER, NO_MOVE
+
+
+WIN = 1e6
+INF = float('inf')
+
+MAX_PLY = 128
+CRITICAL_BONUS = 1e9
+BORDER_BONUS = 1e8
+# Как часто (в узлах) поиск спрашивает, не пора ли остановиться
+STOP_CHECK_NODES = 64
+
+
+class SearchLimits(NamedTuple):
+    """
+    Budget of one move search.
+
+    Attributes:
+        time: Wall-clock budget in seconds.
+        depth: Maximum iterative-deepening depth.
+        width: Maximum number of moves tried in a node, best-ordered first.
+    """
+    time: float
+    depth: int
+    width: int = 24
+
+
+DIFFICULTIES = {
+    'easy': SearchLimits(time=0.01, depth=1, width=8),
+    'normal': SearchLimits(time=0.1, depth=3, width=16),
+    'hard': SearchLimits(time=0.5, depth=6, width=24),
+    'expert': SearchLimits(time=2.0, depth=MAX_PLY, width=32),
+}
+
+
+class SearchResult(NamedTuple):
+    """
+    Outcome of a move search.
+
+    Attributes:
+        move: The best move found, ``NO_MOVE`` if there is none.
+        value: Its value for the player to move.
+        depth: The deepest fully completed iteration.
+        nodes: The number of positions visited.
+        elapsed: Time spent in seconds.
+    """
+    move: int
+    value: float
+    depth: int
+    nodes: int
+    elapsed: float
+
+
+class _Timeout(Exception):
+    """Raised inside the search when the time budget is spent."""
+
+
+def evaluate(state: GameState) -> float:
+    """
+    Score a position for the player to move.
+
+    The score compares the player's own cells, energy and frontier with the
+    strongest opponent, read from the incrementally kept player statistics.
+
+    Args:
+        state: The position.
+
+    Returns:
+        Positive values favour the player to move.
+    """
+    stats = state.stats
+    score = stats.cells + 0.25 * stats.energy + 0.1 * stats.frontier
+    player = state.current
+    others = np.delete(score, player)[np.delete(state.alive, player)]
+    return float(score[player] - (others.max() if len(others) else 0.0))
+
+
+class AlphaBetaBot:
+    """
+    Negamax alpha-beta player with iterative deepening.
+
+    Moves are ordered by the transposition-table move, two killer moves per
+    ply and the history heuristic, with cells about to overload tried first.
+    The search plays and takes back moves on one working copy of the root
+    through its move journal, so a node costs only the cells its move changed.
+    The clock is checked inside the search, and the bot always answers with
+    the best move of the deepest finished iteration, or the best root move of
+    the unfinished one, once the time budget runs out. A running search can
+    be given more time with :meth:`extend` or stopped early by the
+    ``should_stop`` callback, which lets another thread or process drive it.
+
+    Attributes:
+        limits (SearchLimits): The budget of every search.
+        tt (TranspositionTable): The table shared by all searches of the bot.
+    """
+
+    def __init__(self, limits='normal', tt: Optional[TranspositionTable] = None):
+        """
+        Initialize the bot.
+
+        Args:
+            limits: A ``SearchLimits`` or the name of a difficulty level.
+            tt: The transposition table to use, a new one if omitted.
+        """
+        if isinstance(limits, str):
+            limits = DIFFICULTIES[limits]
+        self.limits = limits
+        self.tt = tt if tt is not None else TranspositionTable()
+        self._history = None
+        self._killers = np.full((MAX_PLY, 2), NO_MOVE, dtype=np.int64)
+        self._deadline = 0.0
+        self._should_stop = None
+        self._journal = None
+        self.nodes = 0
+
+    def extend(self, seconds: float):
+        """Move the deadline of the running search, a negative value brings it closer."""
+        self._deadline += seconds
+
+    def set_budget(self, seconds: float):
+        """Let the running search go on for a number of seconds from now."""
+        self._deadline = time.perf_counter() + seconds
+
+    def choose_move(self, state: GameState, limits: Optional[SearchLimits] = None,
+                    on_iteration: Optional[Callable[[SearchResult], None]] = None,
+                    should_stop: Optional[Callable[[], bool]] = None) -> SearchResult:
+        """
+        Search the best move for the player to move.
+
+        Args:
+            state: The position, left unchanged.
+            limits: The budget of this search, the bot's own if omitted.
+            on_iteration: Called with the best result so far after every
+                finished iteration.
+            should_stop: Polled every ``STOP_CHECK_NODES`` nodes, the search
+                ends as on timeout when it returns True.
+
+        Returns:
+            The search result.
+        """
+        limits = limits or self.limits
+        start = time.perf_counter()
+        self._deadline = start + limits.time
+        self._should_stop = should_stop
+        self.nodes = 0
+        self.tt.new_search()
+        self._killers.fill(NO_MOVE)
+        shape = (state.board.n_players, state.board.n_cells)
+        if self._history is None or self._history.shape != shape:
+            self._history = np.zeros(shape, dtype=np.float64)
+        else:
+            self._history *= 0.5
+
+        moves = state.legal_moves()
+        if state.is_over or not len(moves):
+            return SearchResult(NO_MOVE, evaluate(state), 0, 0, 0.0)
+
+        root = state.copy()
+        if self._journal is None or self._journal.n_players != state.board.n_players:
+            self._journal = MoveJournal(state.board.n_players, state.board.n_cells, MAX_PLY, grow=True)
+        self._journal.clear()
+        root.journal = self._journal
+
+        best_move, best_value, depth_done = int(moves[0]), -INF, 0
+        for depth in range(1, limits.depth + 1):
+            self._root_best = (NO_MOVE, -INF)
+            try:
+                value = self._negamax(root, depth, -INF, INF, 0, limits.width)
+            except _Timeout:
+                # Незаконченная итерация годится, если успела найти ход
+                if self._root_best[0] != NO_MOVE:
+                    best_move, best_value = self._root_best
+                break
+            best_move, best_value = self._root_best[0], value
+            depth_done = depth
+            if on_iteration is not None:
+                on_iteration(SearchResult(best_move, best_value, depth_done, self.nodes,
+                                          time.perf_counter() - start))
+            if abs(value) >= WIN - MAX_PLY:
+                break
+
+        return SearchResult(best_move, best_value, depth_done, self.nodes,
+                            time.perf_counter() - start)
+
+    def _negamax(self, state: GameState, depth: int, alpha: float, beta: float,
+                 ply: int, width: int) -> float:
+        self.nodes += 1
+        if time.perf_counter() > self._deadline:
+            raise _Timeout
+        if (self._should_stop is not None and self.nodes % STOP_CHECK_NODES == 0
+                and self._should_stop()):
+            raise _Timeout
+
+        if state.is_over:
+            return WIN - ply if state.winner == state.current else -(WIN - ply)
+        if depth == 0 or ply >= MAX_PLY - 1:
+            return evaluate(state)
+
+        alpha_orig = alpha
+        # С симметриями варианты позиции делят одну запись, ход хранится в её системе
+        key, frame = state.canonical_key()
+        entry = self.tt.probe(key)
+        tt_move = NO_MOVE
+        if entry is not None:
+            tt_move = state.from_canonical(entry.move, frame)
+            if entry.depth >= depth and ply > 0:
+                if entry.flag == EXACT:
+                    return entry.value
+                if entry.flag == LOWER:
+                    alpha = max(alpha, entry.value)
+                elif entry.flag == UPPER:
+                    beta = min(beta, entry.value)
+                if alpha >= beta:
+                    return entry.value
+
+        player = state.current
+        best_value, best_move = -INF, NO_MOVE
+        for move in self._ordered_moves(state, ply, tt_move, width):
+            state.play(move)
+            # Ход переходит не всегда: после победы очередь остаётся у игрока
+            if state.current != player:
+                value = -self._negamax(state, depth - 1, -beta, -alpha, ply + 1, width)
+            else:
+                value = self._negamax(state, depth - 1, alpha, beta, ply + 1, width)
+            state.undo()
+
+            if value > best_value:
+                best_value, best_move = value, move
+                if ply == 0:
+                    self._root_best = (move, value)
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                self._store_cutoff(player, move, depth, ply)
+                break
+
+        if best_value <= alpha_orig:
+            flag = UPPER
+        elif best_value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.store(key, depth, best_value, flag, state.to_canonical(best_move, frame))
+        return best_value
+
+    def _store_cutoff(self, player: int, move: int, depth: int, ply: int):
+        killers = self._killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self._history[player, move] += depth * depth
+
+    def _ordered_moves(self, state: GameState, ply: int, tt_move: int, width: int) -> list:
+        board = state.board
+        player = state.current
+        moves = state.legal_moves()
+
+        priority = self._history[player, moves].copy()
+        mine = board.owner[moves] == player
+        priority += CRITICAL_BONUS * (mine & (board.energy[moves] == board.capacity[moves]))
+        priority += BORDER_BONUS * state.stats.border[moves]
+        # Нейтральные клетки рядом с чужими тоже на границе, но флага у них нет
+        priority += BORDER_BONUS * 0.5 * (board.owner[moves] == NEUTRAL)
+
+        if len(moves) > width:
+            top = np.argpartition(-priority, width - 1)[:width]
+            moves, priority = moves[top], priority[top]
+        ordered = moves[np.argsort(-priority, kind='stable')].tolist()
+
+        front = [tt_move, *self._killers[ply].tolist()]
+        for move in reversed(front):
+            if move != NO_MOVE and state.is_legal(move):
+                if move in ordered:
+                    ordered.remove(move)
+                ordered.insert(0, move)
+        return ordered
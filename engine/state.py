@@ -0,0 +1,245 @@
+import numpy as np
+from typing import Optional, Tuple
+
+from .board import Board, NEUTRAL
+from .cascade import CascadeResult, play_move, DEFAULT_MAX_WAVES
+from .journal import MoveJournal
+from .symmetry import Symmetry
+from .stats import PlayerStats
+from .zobrist import ZobristKeys
+
+
+class GameState:
+    """
+    A match on a board: whose turn it is and which players are still alive.
+
+    A move puts one unit of energy into a neutral cell or a cell owned by the
+    player to move and takes the cell over. Overloaded cells then spill into
+    their neighbours and capture them. A player who has moved at least once
+    and owns no cells is eliminated; the last player standing wins.
+
+    Attributes:
+        board (Board): The board the match is played on.
+        current (int): The player to move.
+        turn (int): The number of moves played so far.
+        alive (np.ndarray): Boolean mask of players still in the game.
+        moved (np.ndarray): Boolean mask of players who have made a move.
+        max_waves (int): Wave limit for a single capture chain.
+        last_cascade (CascadeResult): Summary of the chain of the last move.
+        stats (PlayerStats): Per-player counters kept in sync with the board.
+        keys (ZobristKeys): The keying scheme of position hashes.
+        hash (int): Zobrist hash of the position, updated on every move.
+        journal (MoveJournal): Undo history, None until :meth:`enable_undo`.
+        symmetry (Symmetry): Symmetries of the map, None until :meth:`enable_symmetry`.
+        symmetric_hashes (np.ndarray): Hash of the position under every symmetry.
+    """
+
+    def __init__(self, board: Board, current: int = 0, keys: Optional[ZobristKeys] = None):
+        """
+        Initialize the match.
+
+        Args:
+            board: The board to play on. It is used in place, not copied.
+            current: The player who moves first.
+            keys: The keying scheme for position hashes, seed 0 if omitted.
+        """
+        self.board = board
+        self.current = current
+        self.turn = 0
+        self.alive = np.ones(board.n_players, dtype=bool)
+        self.moved = np.zeros(board.n_players, dtype=bool)
+        self.max_waves = DEFAULT_MAX_WAVES
+        self.last_cascade: Optional[CascadeResult] = None
+        self.stats = PlayerStats(board)
+        self.keys = keys if keys is not None else ZobristKeys()
+        self.hash = self.keys.full_hash(board, current)
+        self.journal: Optional[MoveJournal] = None
+        self.symmetry: Optional[Symmetry] = None
+        self.symmetric_hashes = None
+
+    def enable_symmetry(self, symmetry: Symmetry):
+        """
+        Start keeping the hashes of all symmetric variants of the position.
+
+        Args:
+            symmetry: The symmetries of the map.
+        """
+        self.symmetry = symmetry
+        self.symmetric_hashes = symmetry.full_hashes(self.keys, self.board.owner,
+                                                     self.board.energy, self.current)
+
+    def canonical_key(self) -> Tuple[int, int]:
+        """
+        Get the hash shared by all symmetric variants of the position.
+
+        Returns:
+            ``(hash, symmetry index)``; the index tells which frame moves stored
+            under the hash are in, see :class:`Symmetry`. Without symmetries
+            this is the plain hash and index 0.
+        """
+        if self.symmetry is None:
+            return self.hash, 0
+        return Symmetry.canonical(self.symmetric_hashes)
+
+    def to_canonical(self, move: int, frame: int) -> int:
+        """Map a move into the frame given by :meth:`canonical_key`."""
+        return self.symmetry.to_frame(move, frame) if self.symmetry is not None else move
+
+    def from_canonical(self, move: int, frame: int) -> int:
+        """Map a move stored in a canonical frame back onto this position."""
+        return self.symmetry.from_frame(move, frame) if self.symmetry is not None else move
+
+    def update_symmetric_hashes(self, cells: np.ndarray, old_owner: np.ndarray,
+                                old_energy: np.ndarray, old_player: int):
+        """Account for changed cells and turn in the symmetric hashes, if they are kept."""
+        if self.symmetry is None:
+            return
+        board = self.board
+        self.symmetric_hashes ^= self.symmetry.delta(self.keys, cells, old_owner, old_energy,
+                                                     board.owner[cells], board.energy[cells])
+        self.symmetric_hashes ^= np.uint64(self.keys.turn_key(old_player) ^
+                                           self.keys.turn_key(self.current))
+
+    def enable_undo(self, cell_capacity: Optional[int] = None, move_capacity: Optional[int] = None):
+        """
+        Start journaling moves so they can be taken back.
+
+        Args:
+            cell_capacity: Cell changes the history may hold.
+            move_capacity: Moves the history may hold.
+        """
+        options = {}
+        if cell_capacity is not None:
+            options['cell_capacity'] = cell_capacity
+        if move_capacity is not None:
+            options['move_capacity'] = move_capacity
+        self.journal = MoveJournal(self.board.n_players, **options)
+
+    def legal_moves(self) -> np.ndarray:
+        """Get the ids of cells the current player may put energy into."""
+        owner = self.board.owner
+        return np.flatnonzero((owner == self.current) | (owner == NEUTRAL))
+
+    def is_legal(self, cell: int) -> bool:
+        """Check whether the current player may put energy into a cell."""
+        if self.is_over or not 0 <= cell < self.board.n_cells:
+            return False
+        return self.board.owner[cell] in (NEUTRAL, self.current)
+
+    def play(self, cell: int, record_waves: bool = False) -> CascadeResult:
+        """
+        Make a move for the current player and pass the turn.
+
+        Args:
+            cell: The cell to put energy into.
+            record_waves: Whether to keep the per-wave change log of the
+                chain in the result, e.g. to animate it.
+
+        Returns:
+            The summary of the capture chain the move caused.
+
+        Raises:
+            ValueError: If the move is not legal.
+        """
+        if not self.is_legal(cell):
+            raise ValueError(f"Illegal move: player {self.current} -> cell {cell}")
+
+        player = self.current
+        if self.journal is not None:
+            stats = self.stats
+            counters = np.stack((stats.cells, stats.energy, stats.frontier))
+            before = (counters, player, self.turn, self.hash, self.alive.copy(), self.moved.copy())
+        result = play_move(self.board, cell, player, self.max_waves, self.stats, record_waves)
+        self.last_cascade = result
+
+        self.moved[player] = True
+        self.turn += 1
+        self._update_alive()
+        self._pass_turn()
+
+        self.hash ^= self.keys.delta(self.board, result.touched, result.old_owner, result.old_energy)
+        self.hash ^= self.keys.turn_key(player) ^ self.keys.turn_key(self.current)
+        self.update_symmetric_hashes(result.touched, result.old_owner, result.old_energy, player)
+        if self.journal is not None:
+            self._record(result, *before)
+        return result
+
+    def _record(self, result: CascadeResult, *before):
+        # В журнал идут и соседи изменённых клеток: их флаги границы тоже пересчитаны
+        cells = self.stats.last_affected
+        changed = np.searchsorted(cells, result.touched)
+        owner, energy = self.board.owner[cells], self.board.energy[cells]
+        owner[changed], energy[changed] = result.old_owner, result.old_energy
+        self.journal.record(cells, owner, energy, self.stats.last_border, *before)
+
+    def undo(self) -> Optional[np.ndarray]:
+        """
+        Take the last journaled move back in place.
+
+        Returns:
+            Ids of the cells that changed, or None if there is nothing to undo.
+        """
+        return self.journal.undo(self) if self.journal is not None else None
+
+    def redo(self) -> Optional[np.ndarray]:
+        """Play the last undone move again, see :meth:`undo`."""
+        return self.journal.redo(self) if self.journal is not None else None
+
+    def _update_alive(self):
+        self.alive &= ~(self.moved & (self.stats.cells == 0))
+
+    def _pass_turn(self):
+        if self.is_over:
+            return
+        n = self.board.n_players
+        player = (self.current + 1) % n
+        while not self.alive[player]:
+            player = (player + 1) % n
+        self.current = player
+
+    @property
+    def is_over(self) -> bool:
+        """Check whether only one player is left."""
+        return np.count_nonzero(self.alive) <= 1
+
+    @property
+    def winner(self) -> Optional[int]:
+        """Get the winning player, or None while the match goes on."""
+        if not self.is_over:
+            return None
+        alive = np.flatnonzero(self.alive)
+        return int(alive[0]) if len(alive) else None
+
+    def copy(self) -> 'GameState':
+        """Create an independent copy of the match."""
+        state = GameState.__new__(GameState)
+        state.__dict__.update(self.__dict__)
+        state.board = self.board.copy()
+        state.stats = self.stats.copy(state.board)
+        state.alive = self.alive.copy()
+        state.moved = self.moved.copy()
+        state.journal = None
+        if self.symmetric_hashes is not None:
+            state.symmetric_hashes = self.symmetric_hashes.copy()
+        return state
+
+    def __getstate__(self):
+        # Журнал отмены — история этой партии, в копии для другого процесса он не нужен
+        state = self.__dict__.copy()
+        state['journal'] = None
+        return state
+
+    def restore(self, other: 'GameState'):
+        """Load another position of the same map into this state without new arrays."""
+        self.board.restore(other.board)
+        self.stats.restore(other.stats)
+        np.copyto(self.alive, other.alive)
+        np.copyto(self.moved, other.moved)
+        self.current = other.current
+        self.turn = other.turn
+        self.hash = other.hash
+        self.last_cascade = other.last_cascade
+        if self.symmetry is not None:
+            self.symmetric_hashes[:] = other.symmetric_hashes
+        if self.journal is not None:
+            self.journal.clear()
@@ -0,0 +1,125 @@
+import numpy as np
+
+from .board import Board, NEUTRAL
+from .cascade import gather_neighbours
+
+
+class PlayerStats:
+    """
+    Per-player counters kept up to date from cell deltas.
+
+    The counters are never rebuilt from the board after a move: the cascade
+    resolver passes the cells it changed together with their previous owner
+    and energy, and only those cells and their neighbours are looked at.
+
+    Attributes:
+        cells (np.ndarray): Number of cells owned by each player.
+        energy (np.ndarray): Total energy held by each player.
+        frontier (np.ndarray): Number of each player's cells that touch a cell
+            of another owner or a neutral cell.
+        border (np.ndarray): Per-cell flag of the cells counted in ``frontier``.
+        last_affected (np.ndarray): Sorted ids of the cells whose border flag
+            the last :meth:`apply` recomputed, the changed cells included.
+        last_border (np.ndarray): Their border flags before that call.
+    """
+
+    def __init__(self, board: Board):
+        """
+        Initialize the counters with one full pass over the board.
+
+        Args:
+            board: The board to count.
+        """
+        self.board = board
+        n = board.n_players
+        self.cells = np.zeros(n, dtype=np.int64)
+        self.energy = np.zeros(n, dtype=np.int64)
+        self.frontier = np.zeros(n, dtype=np.int64)
+        self.border = np.zeros(board.n_cells, dtype=bool)
+        self.last_affected = np.zeros(0, dtype=np.int64)
+        self.last_border = np.zeros(0, dtype=bool)
+        self.recount()
+
+    def recount(self):
+        """Rebuild every counter from the board state."""
+        board = self.board
+        owned = board.owner != NEUTRAL
+        owners = board.owner[owned]
+        n = board.n_players
+        self.cells[:] = np.bincount(owners, minlength=n)
+        self.energy[:] = np.bincount(owners, weights=board.energy[owned], minlength=n)
+        self.border[:] = self._border_flags(np.arange(board.n_cells))
+        self.frontier[:] = np.bincount(board.owner[self.border], minlength=n)
+
+    def _border_flags(self, cells: np.ndarray) -> np.ndarray:
+        """Check which of the given cells are owned and touch another owner."""
+        board = self.board
+        owner = board.owner
+        deg = board.degree[cells]
+        neighbours = gather_neighbours(board, cells)
+        mismatch = owner[neighbours] != np.repeat(owner[cells], deg)
+        row = np.repeat(np.arange(len(cells)), deg)
+        flags = np.bincount(row, weights=mismatch, minlength=len(cells)) > 0
+        return flags & (owner[cells] != NEUTRAL)
+
+    def apply(self, cells: np.ndarray, old_owner: np.ndarray, old_energy: np.ndarray):
+        """
+        Account for cells whose owner or energy has changed.
+
+        Args:
+            cells: Unique ids of the changed cells, already updated on the board.
+            old_owner: Owners of these cells before the change.
+            old_energy: Energy of these cells before the change.
+        """
+        board = self.board
+        n = board.n_players
+        new_owner = board.owner[cells]
+        new_energy = board.energy[cells]
+
+        was, now = old_owner != NEUTRAL, new_owner != NEUTRAL
+        self.cells -= np.bincount(old_owner[was], minlength=n)
+        self.cells += np.bincount(new_owner[now], minlength=n)
+        self.energy -= np.bincount(old_owner[was], weights=old_energy[was],
+                                   minlength=n).astype(np.int64)
+        self.energy += np.bincount(new_owner[now], weights=new_energy[now],
+                                   minlength=n).astype(np.int64)
+
+        # Граница меняется только у изменённых клеток и их соседей
+        affected = np.union1d(cells, gather_neighbours(board, cells))
+
+        previous = board.owner[affected].copy()
+        previous[np.searchsorted(affected, cells)] = old_owner
+        old_flags = self.border[affected]
+        self.frontier -= np.bincount(previous[old_flags], minlength=n)
+
+        new_flags = self._border_flags(affected)
+        self.border[affected] = new_flags
+        self.last_affected, self.last_border = affected, old_flags
+        self.frontier += np.bincount(board.owner[affected][new_flags], minlength=n)
+
+    def copy(self, board: Board) -> 'PlayerStats':
+        """Create a copy of the counters attached to another board of the same state."""
+        stats = PlayerStats.__new__(PlayerStats)
+        stats.board = board
+        stats.cells = self.cells.copy()
+        stats.energy = self.energy.copy()
+        stats.frontier = self.frontier.copy()
+        stats.border = self.border.copy()
+        stats.last_affected = self.last_affected
+        stats.last_border = self.last_border
+        return stats
+
+    def restore(self, other: 'PlayerStats'):
+        """Copy the counters of another instance for the same map into this one."""
+        np.copyto(self.cells, other.cells)
+        np.copyto(self.energy, other.energy)
+        np.copyto(self.frontier, other.frontier)
+        np.copyto(self.border, other.border)
+
+    def debug_lines(self):
+        """Get one text line per player for the debug overlay."""
+        return [
+            f"P{player}: cells {self.cells[player]}, energy {self.energy[player]}, "
+            f"frontier {self.frontier[player]}"
+            for player in range(self.board.n_players)
+        ]
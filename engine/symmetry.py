@@ -0,0 +1,247 @@
+import os
+import numpy as np
+from typing import List, Optional, Tuple
+
+from .board import Board
+from .zobrist import ZobristKeys
+
+
+# Оси отражений и углы поворотов перебираются с шагом 15 градусов:
+# этого хватает на симметрии квадратной и шестиугольной решёток
+ANGLE_STEP = 15
+TOLERANCE = 1e-3
+
+
+def _isometries() -> List[np.ndarray]:
+    """Get the candidate 2x2 rotation and reflection matrices, identity first."""
+    matrices = []
+    for degrees in range(0, 360, ANGLE_STEP):
+        t = np.radians(degrees)
+        c, s = np.cos(t), np.sin(t)
+        matrices.append(np.array([[c, -s], [s, c]]))
+    for degrees in range(0, 180, ANGLE_STEP):
+        t = np.radians(2 * degrees)
+        c, s = np.cos(t), np.sin(t)
+        matrices.append(np.array([[c, s], [s, -c]]))
+    return matrices
+
+
+def _match_points(points: np.ndarray, targets: np.ndarray, tolerance: float) -> Optional[np.ndarray]:
+    """
+    Find the target equal to every point within a tolerance.
+
+    Targets are put into a hash grid of cells ``2 * tolerance`` wide; a point
+    is looked up in its grid cell and the eight around it.
+
+    Returns:
+        Index of the matching target of every point, or None if some point
+        has no match or two points share a target.
+    """
+    size = 2 * tolerance
+    origin = np.minimum(points.min(axis=0), targets.min(axis=0)) - 2 * size
+    span = int(np.ceil((max(points.max(), targets.max()) - origin.min()) / size)) + 4
+
+    def keys(cells):
+        return cells[:, 0] * span + cells[:, 1]
+
+    target_keys = keys(np.floor((targets - origin) / size).astype(np.int64))
+    order = np.argsort(target_keys, kind='stable')
+    sorted_keys = target_keys[order]
+
+    base = np.floor((points - origin) / size).astype(np.int64)
+    match = np.full(len(points), -1, dtype=np.int64)
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            todo = np.flatnonzero(match < 0)
+            if not len(todo):
+                break
+            key = keys(base[todo] + (dx, dy))
+            at = np.minimum(np.searchsorted(sorted_keys, key), len(sorted_keys) - 1)
+            found = sorted_keys[at] == key
+            candidate = order[at[found]]
+            close = np.sum((targets[candidate] - points[todo[found]]) ** 2, axis=1) <= tolerance ** 2
+            match[todo[found][close]] = candidate[close]
+    if np.any(match < 0) or len(np.unique(match)) != len(match):
+        return None
+    return match
+
+
+def is_automorphism(board: Board, perm: np.ndarray) -> bool:
+    """Check that a cell permutation keeps every edge and every capacity."""
+    n = board.n_cells
+    if not np.array_equal(board.capacity[perm], board.capacity):
+        return False
+    edges = board.edges().astype(np.int64)
+    a, b = perm[edges[:, 0]], perm[edges[:, 1]]
+    mapped = np.sort(np.minimum(a, b) * n + np.maximum(a, b))
+    return np.array_equal(mapped, np.sort(edges[:, 0] * n + edges[:, 1]))
+
+
+def find_automorphisms(board: Board, positions: np.ndarray,
+                       tolerance: float = TOLERANCE) -> np.ndarray:
+    """
+    Find the symmetries of a map that come from its drawing.
+
+    Search for graph automorphisms in general is expensive, but symmetric
+    maps are drawn symmetric. Every rotation and reflection of the cell
+    positions around their centroid is tried as a candidate cell mapping;
+    the candidates that map the point set onto itself are then verified on
+    the graph, so a wrong drawing can only lose symmetries, never add false
+    ones.
+
+    Args:
+        board: The map.
+        positions: Cell centres, shape ``(n_cells, 2)``.
+        tolerance: Largest position mismatch, relative to the median edge length.
+
+    Returns:
+        Array of shape ``(order, n_cells)``, one permutation per row with the
+        identity first.
+    """
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+    n = board.n_cells
+    identity = np.arange(n)
+    if n < 2:
+        return identity[None, :]
+    edges = board.edges()
+    scale = 1.0
+    if len(edges):
+        scale = float(np.median(np.linalg.norm(positions[edges[:, 0]] - positions[edges[:, 1]], axis=1)))
+        scale = scale if scale > 0 else 1.0
+    centred = positions - positions.mean(axis=0)
+
+    found = [identity]
+    seen = {identity.tobytes()}
+    for matrix in _isometries()[1:]:
+        perm = _match_points(centred @ matrix.T, centred, tolerance * scale)
+        if perm is None or perm.tobytes() in seen:
+            continue
+        if is_automorphism(board, perm):
+            found.append(perm)
+            seen.add(perm.tobytes())
+    return np.stack(found)
+
+
+class Symmetry:
+    """
+    Automorphism group of a map used to merge equivalent positions.
+
+    A permutation ``perm`` moves the state of cell ``c`` to cell ``perm[c]``.
+    The hash of a position under every permutation is the XOR of the
+    Zobrist keys of ``(perm[c], owner[c], energy[c])``, so all of them can be
+    kept up to date from the same cell deltas as the plain hash. The
+    canonical hash is the smallest of them: equivalent positions share it.
+    Moves are translated into and out of the frame that gave the minimum,
+    so a transposition table or opening book keyed by the canonical hash can
+    store and return moves for any of the variants.
+
+    Attributes:
+        perms (np.ndarray): The permutations, shape ``(order, n_cells)``,
+            the identity first.
+        inverse (np.ndarray): The inverse permutations.
+    """
+
+    def __init__(self, perms: np.ndarray):
+        """
+        Wrap a group of permutations.
+
+        Args:
+            perms: One permutation per row, the identity first.
+        """
+        self.perms = np.asarray(perms, dtype=np.int64)
+        self.inverse = np.empty_like(self.perms)
+        rows = np.arange(len(self.perms))[:, None]
+        self.inverse[rows, self.perms] = np.arange(self.perms.shape[1])
+
+    @property
+    def order(self) -> int:
+        """Get the number of symmetries, the identity included."""
+        return len(self.perms)
+
+    @classmethod
+    def find(cls, board: Board, positions: np.ndarray, **options) -> 'Symmetry':
+        """Detect the symmetries of a map, see :func:`find_automorphisms`."""
+        return cls(find_automorphisms(board, positions, **options))
+
+    def full_hashes(self, keys: ZobristKeys, owner: np.ndarray, energy: np.ndarray,
+                    player: int) -> np.ndarray:
+        """Get the hash of a position under every symmetry, uint64 of shape ``(order,)``."""
+        turn = np.uint64(keys.turn_key(player))
+        return np.array([np.bitwise_xor.reduce(keys.cell_keys(perm, owner, energy)) ^ turn
+                         for perm in self.perms], dtype=np.uint64)
+
+    def delta(self, keys: ZobristKeys, cells: np.ndarray, old_owner: np.ndarray,
+              old_energy: np.ndarray, new_owner: np.ndarray, new_energy: np.ndarray) -> np.ndarray:
+        """Get the values to XOR into the hashes of :meth:`full_hashes` after some cells changed."""
+        if not len(cells):
+            return np.zeros(self.order, dtype=np.uint64)
+        mapped = self.perms[:, cells].reshape(-1)
+        old = keys.cell_keys(mapped, np.tile(old_owner, self.order), np.tile(old_energy, self.order))
+        new = keys.cell_keys(mapped, np.tile(new_owner, self.order), np.tile(new_energy, self.order))
+        return np.bitwise_xor.reduce((old ^ new).reshape(self.order, -1), axis=1)
+
+    @staticmethod
+    def canonical(hashes: np.ndarray) -> Tuple[int, int]:
+        """Get ``(canonical hash, index of the symmetry giving it)``."""
+        index = int(np.argmin(hashes))
+        return int(hashes[index]), index
+
+    def to_frame(self, cell: int, index: int) -> int:
+        """Map a cell into the frame of a symmetry."""
+        return int(self.perms[index, cell]) if cell >= 0 else cell
+
+    def from_frame(self, cell: int, index: int) -> int:
+        """Map a cell of the frame of a symmetry back, see :meth:`to_frame`."""
+        return int(self.inverse[index, cell]) if cell >= 0 else cell
+
+    def transform(self, values: np.ndarray, index: int) -> np.ndarray:
+        """Move per-cell values into the frame of a symmetry."""
+        out = np.empty_like(values)
+        out[..., self.perms[index]] = values
+        return out
+
+    def save(self, cache_dir: str, map_hash: str):
+        """Write the permutations into ``cache_dir`` under the map hash."""
+        os.makedirs(cache_dir, exist_ok=True)
+        path = _cache_path(cache_dir, map_hash)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as file:
+            np.save(file, self.perms.astype(np.int32))
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, board: Board, cache_dir: str, map_hash: str) -> Optional['Symmetry']:
+        """Read cached permutations, None if they are missing or do not fit the board."""
+        try:
+            perms = np.load(_cache_path(cache_dir, map_hash))
+        except (OSError, ValueError):
+            return None
+        if perms.ndim != 2 or perms.shape[1] != board.n_cells:
+            return None
+        return cls(perms)
+
+
+def _cache_path(cache_dir: str, map_hash: str) -> str:
+    return os.path.join(cache_dir, f'{map_hash}.symmetry.npy')
+
+
+def map_symmetry(board: Board, positions: np.ndarray, cache_dir: Optional[str] = None,
+                 map_hash: Optional[str] = None, **options) -> Symmetry:
+    """
+    Get the symmetries of a map, from the disk cache when possible.
+
+    Args:
+        board: The map.
+        positions: Cell centres.
+        cache_dir: Directory of cached results, no caching if omitted.
+        map_hash: ``Board.map_hash`` of the map, computed if omitted.
+        **options: Passed to :func:`find_automorphisms` on a cache miss.
+    """
+    if cache_dir is None:
+        return Symmetry.find(board, positions, **options)
+    map_hash = map_hash or board.map_hash()
+    symmetry = Symmetry.load(board, cache_dir, map_hash)
+    if symmetry is None:
+        symmetry = Symmetry.find(board, positions, **options)
+        symmetry.save(cache_dir, map_hash)
+    return symmetry
@@ -0,0 +1,153 @@
+import numpy as np
+from typing import NamedTuple, Optional
+
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+NO_MOVE = -1
+
+ENTRY_DTYPE = np.dtype([
+    ('key', np.uint64),
+    ('value', np.float32),
+    ('move', np.int32),
+    ('depth', np.int16),
+    ('flag', np.int8),
+    ('age', np.uint8),
+])
+
+SLOTS = 2
+
+
+class TTEntry(NamedTuple):
+    """A stored search result."""
+    value: float
+    move: int
+    depth: int
+    flag: int
+
+
+class TranspositionTable:
+    """
+    Fixed-size hash table of search results keyed by Zobrist hashes.
+
+    The table is one preallocated structured array of ``n_buckets`` buckets
+    with two slots each, so its memory never grows. The first slot of a
+    bucket is depth-preferred: it keeps the deepest result and is only
+    overwritten by one at least as deep, by an exact result for the same
+    position or by a result from a newer search. The second slot always
+    takes whatever the first one rejected. A store without a best move keeps
+    the move already known for the position.
+
+    The array can live in a caller-provided buffer (for example
+    ``multiprocessing.shared_memory``), so several processes can share it.
+
+    Attributes:
+        n_buckets (int): The number of buckets, a power of two.
+        age (int): Generation of the current search, see :meth:`new_search`.
+    """
+
+    def __init__(self, n_buckets: int = 1 << 16, buffer=None):
+        """
+        Initialize the table.
+
+        Args:
+            n_buckets: The number of buckets, rounded up to a power of two.
+            buffer: Optional buffer to keep the entries in, at least
+                :meth:`nbytes` long. It is cleared only when omitted.
+        """
+        self.n_buckets = 1 << max(0, int(n_buckets - 1).bit_length())
+        self._mask = self.n_buckets - 1
+        self.age = 0
+
+        shape = (self.n_buckets, SLOTS)
+        if buffer is None:
+            self._entries = np.zeros(shape, dtype=ENTRY_DTYPE)
+            self._entries['depth'] = -1
+        else:
+            self._entries = np.ndarray(shape, dtype=ENTRY_DTYPE, buffer=buffer)
+
+        self._key = self._entries['key']
+        self._value = self._entries['value']
+        self._move = self._entries['move']
+        self._depth = self._entries['depth']
+        self._flag = self._entries['flag']
+        self._age = self._entries['age']
+
+    @classmethod
+    def from_megabytes(cls, megabytes: float, buffer=None) -> 'TranspositionTable':
+        """Create the largest table that fits into the given memory budget."""
+        buckets = int(megabytes * (1 << 20)) // (ENTRY_DTYPE.itemsize * SLOTS)
+        return cls(1 << max(0, buckets.bit_length() - 1), buffer)
+
+    @staticmethod
+    def nbytes(n_buckets: int) -> int:
+        """Get the memory a table with that many buckets needs."""
+        return ENTRY_DTYPE.itemsize * SLOTS * n_buckets
+
+    def clear(self):
+        """Forget every entry."""
+        self._entries.fill(0)
+        self._depth.fill(-1)
+        self.age = 0
+
+    def new_search(self):
+        """Start a new generation, so entries of older searches become replaceable."""
+        self.age = (self.age + 1) & 0xFF
+
+    def probe(self, key: int) -> Optional[TTEntry]:
+        """
+        Look a position up.
+
+        Args:
+            key: The Zobrist hash of the position.
+
+        Returns:
+            The stored entry, or None if the position is not in the table.
+        """
+        bucket = key & self._mask
+        keys = self._key[bucket]
+        for slot in range(SLOTS):
+            if keys[slot] == key and self._depth[bucket, slot] >= 0:
+                return TTEntry(
+                    value=float(self._value[bucket, slot]),
+                    move=int(self._move[bucket, slot]),
+                    depth=int(self._depth[bucket, slot]),
+                    flag=int(self._flag[bucket, slot]),
+                )
+        return None
+
+    def store(self, key: int, depth: int, value: float, flag: int, move: int = NO_MOVE):
+        """
+        Save a search result.
+
+        Args:
+            key: The Zobrist hash of the position.
+            depth: The remaining search depth the value was computed with.
+            value: The search value.
+            flag: ``EXACT``, ``LOWER`` or ``UPPER`` bound.
+            move: The best move found, ``NO_MOVE`` if none.
+        """
+        bucket = key & self._mask
+        slot = 1
+        if (depth >= self._depth[bucket, 0] or self._age[bucket, 0] != self.age
+                or (self._key[bucket, 0] == key and flag == EXACT)):
+            slot = 0
+        if move == NO_MOVE:
+            # Не теряем лучший ход, если новая запись его не знает
+            for known in range(SLOTS):
+                if self._key[bucket, known] == key and self._move[bucket, known] != NO_MOVE:
+                    move = int(self._move[bucket, known])
+                    break
+
+        self._key[bucket, slot] = key
+        self._value[bucket, slot] = value
+        self._move[bucket, slot] = move
+        self._depth[bucket, slot] = depth
+        self._flag[bucket, slot] = flag
+        self._age[bucket, slot] = self.age
+
+    def fill_ratio(self) -> float:
+        """Get the share of slots in use."""
+        return float(np.count_nonzero(self._depth >= 0)) / self._depth.size
@@ -0,0 +1,101 @@
+import numpy as np
+
+from .board import Board
+
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+_CELL = np.uint64(0xD6E8FEB86659FD93)
+_TURN = np.uint64(0xA0761D6478BD642F)
+
+
+def splitmix64(values: np.ndarray) -> np.ndarray:
+    """Scramble 64-bit integers into well-distributed keys (SplitMix64 finalizer)."""
+    z = np.atleast_1d(np.asarray(values, dtype=np.uint64)) + _GOLDEN
+    z = (z ^ (z >> np.uint64(30))) * _MIX1
+    z = (z ^ (z >> np.uint64(27))) * _MIX2
+    return z ^ (z >> np.uint64(31))
+
+
+class ZobristKeys:
+    """
+    Zobrist keying of board states.
+
+    The hash of a position is the XOR of one 64-bit key per cell, chosen by the
+    cell's owner and energy, and one key for the player to move. Keys are not
+    stored in tables but derived on the fly from ``(seed, cell, owner, energy)``
+    with a 64-bit mixer, so the scheme costs no memory on huge maps and gives
+    the same keys in every process that uses the same seed.
+
+    Attributes:
+        seed (int): The seed all keys are derived from.
+    """
+
+    def __init__(self, seed: int = 0):
+        """
+        Initialize the keying scheme.
+
+        Args:
+            seed: The seed all keys are derived from.
+        """
+        self.seed = int(seed)
+        self._seed = splitmix64(self.seed & 0xFFFFFFFFFFFFFFFF)[0]
+
+    def cell_keys(self, cells: np.ndarray, owner: np.ndarray, energy: np.ndarray) -> np.ndarray:
+        """
+        Get the keys of cells in the given states.
+
+        Args:
+            cells: Cell ids.
+            owner: Owner of each cell, ``NEUTRAL`` allowed.
+            energy: Energy of each cell.
+
+        Returns:
+            One uint64 key per cell.
+        """
+        cells = np.asarray(cells, dtype=np.uint64)
+        state = (np.asarray(owner, dtype=np.int64) + 1).astype(np.uint64) << np.uint64(32)
+        state |= np.asarray(energy, dtype=np.int64).astype(np.uint64) & np.uint64(0xFFFFFFFF)
+        return splitmix64(splitmix64(cells * _CELL ^ self._seed) ^ state)
+
+    def turn_key(self, player: int) -> int:
+        """Get the key of the player to move."""
+        return int(splitmix64(np.array([player], dtype=np.uint64) * _TURN ^ self._seed)[0])
+
+    def hash_cells(self, cells: np.ndarray, owner: np.ndarray, energy: np.ndarray) -> int:
+        """Get the XOR of the keys of several cells."""
+        if len(cells) == 0:
+            return 0
+        return int(np.bitwise_xor.reduce(self.cell_keys(cells, owner, energy)))
+
+    def full_hash(self, board: Board, player: int) -> int:
+        """
+        Compute the hash of a position from scratch.
+
+        Args:
+            board: The board.
+            player: The player to move.
+
+        Returns:
+            The 64-bit hash.
+        """
+        cells = np.arange(board.n_cells)
+        return self.hash_cells(cells, board.owner, board.energy) ^ self.turn_key(player)
+
+    def delta(self, board: Board, cells: np.ndarray,
+              old_owner: np.ndarray, old_energy: np.ndarray) -> int:
+        """
+        Get the value to XOR into a hash after some cells changed.
+
+        Args:
+            board: The board with the new cell state.
+            cells: Ids of the changed cells.
+            old_owner: Owners of these cells before the change.
+            old_energy: Energy of these cells before the change.
+
+        Returns:
+            The XOR of the old and the new keys of the cells.
+        """
+        return (self.hash_cells(cells, old_owner, old_energy) ^
+                self.hash_cells(cells, board.owner[cells], board.energy[cells]))
@@ -0,0 +1,185 @@
+import numpy as np
+import pyglet
+
+from Scene import Scene
+from ui_element import UIEvents
+from board_renderer import BoardRenderer
+from camera import Camera
+from engine.ai_host import AIHost
+from engine.mapfile import load_map
+from engine.state import GameState
+
+ZOOM_STEP = 1.15
+# Пауза между волнами цепной реакции при анимации хода, в секундах
+WAVE_DELAY = 0.08
+# Кэш расчётов по картам: симметрии, таблицы расстояний
+CACHE_PATH = 'maps/cache/'
+
+
+class BoardLayer(UIEvents):
+    '''Поле как фон индекса попаданий: всё, что не попало в виджеты'''
+    def __init__(self, scene):
+        self.scene = scene
+
+    def on_mouse_motion(self, x, y, dx, dy):
+        self.scene.renderer.set_highlight(self.scene.cell_at(x, y))
+
+    def on_mouse_out(self, x, y):
+        self.scene.renderer.set_highlight(None)
+
+    def on_mouse_scroll(self, x, y, scroll_x, scroll_y):
+        self.scene.camera.zoom_at(x, y, ZOOM_STEP ** scroll_y)
+
+
+class BoardScene(Scene):
+    '''Сцена партии: поле и ходы игроков, ходы ИИ считаются в отдельном процессе'''
+    def __init__(self, app, map_path, ai_players=(), difficulty='normal'):
+        super().__init__(app)
+        self.map = load_map(map_path)
+        self.state = GameState(self.map.board())
+        self.state.enable_undo()
+        symmetry = self.map.symmetry(CACHE_PATH, self.state.board)
+        if symmetry.order > 1:
+            self.state.enable_symmetry(symmetry)
+        self.renderer = BoardRenderer(self.state.board, self.map.positions)
+        self.camera = Camera(app.width, app.height)
+        self.camera.fit(*self.renderer.bounds())
+        self._dragged = False
+        self._log = None
+        self._next_wave = 0
+        self._wave_timer = 0.0
+        self.ai_players = frozenset(ai_players)
+        self.ai = AIHost(difficulty) if self.ai_players else None
+        self.hit_index.background = BoardLayer(self)
+
+    def cell_at(self, x, y):
+        '''Клетка под точкой экрана или None'''
+        wx, wy = self.camera.screen_to_world(x, y)
+        return self.renderer.grid.pick(wx, wy, self.renderer.radius)
+
+    def play(self, cell):
+        '''Ход текущего игрока и перерисовка изменённых клеток'''
+        self.flush_waves()
+        result = self.state.play(cell, record_waves=True)
+        self._log, self._next_wave, self._wave_timer = result.log, 0, 0.0
+        self.show_wave()
+        if self.state.is_over:
+            self.app.debuger.log(f'Winner: P{self.state.winner}')
+        return result
+
+    def step_history(self, step):
+        '''Отмена или повтор хода; ходы ИИ проходятся вместе с ходом человека'''
+        self.flush_waves()
+        if self.ai is not None:
+            self.ai.cancel()
+        changed = []
+        cells = step()
+        while cells is not None:
+            changed.append(cells)
+            if self.human_turn():
+                break
+            cells = step()
+        if changed:
+            self.renderer.update_cells(np.concatenate(changed))
+
+    def show_wave(self):
+        '''Отрисовка следующей волны из лога хода'''
+        self.renderer.apply_changes(*self._log.wave(self._next_wave))
+        self._next_wave += 1
+        if self._next_wave >= self._log.n_waves:
+            self._log = None
+
+    def flush_waves(self):
+        '''Сразу показать итог недоигранной анимации'''
+        if self._log is not None:
+            self.renderer.apply_changes(*self._log.final())
+            self._log = None
+
+    def update(self, dt):
+        super().update(dt)
+        self._wave_timer += dt
+        while self._log is not None and self._wave_timer >= WAVE_DELAY:
+            self._wave_timer -= WAVE_DELAY
+            self.show_wave()
+        self.think()
+
+    def human_turn(self):
+        return not self.state.is_over and self.state.current not in self.ai_players
+
+    def think(self):
+        '''Опрос ИИ без ожидания: ход делается, когда поиск закончился'''
+        if self.ai is None or self.state.is_over:
+            return
+        self.ai.poll()
+        if self.human_turn():
+            return
+        if self.ai.job is None or self.ai.pondering:
+            self.ai.start(self.state)
+        elif self.ai.done:
+            move = self.ai.best.move
+            self.ai.cancel()
+            self.play(move)
+            # Пока думает человек, ИИ заранее считает ответ на его вероятный ход
+            if self.human_turn():
+                self.ai.ponder(self.state)
+
+    def relayout(self, root_ctx):
+        '''Новый размер окна: камера сохраняет центр, видимые чанки пересчитываются'''
+        if not self.released:
+            self.camera.resize(root_ctx['vw'], root_ctx['vh'])
+            self.renderer.update_view(self.camera)
+        return super().relayout(root_ctx)
+
+    def close(self):
+        if self.ai is not None:
+            self.ai.close()
+
+    def release(self):
+        '''Остановка ИИ и удаление вершин поля'''
+        if not self.released:
+            self.close()
+            self.renderer.delete()
+        super().release()
+
+    def on_mouse_press(self, x, y, button, modifiers):
+        self._dragged = False
+        return super().on_mouse_press(x, y, button, modifiers)
+
+    def on_mouse_release(self, x, y, button, modifiers):
+        # Отпускание после перетаскивания поля ходом не считается
+        over_board = self.hit_index.hit(x, y) is self.hit_index.background
+        if button == pyglet.window.mouse.LEFT and not self._dragged and over_board:
+            cell = self.cell_at(x, y)
+            if cell is not None and self.human_turn() and self.state.is_legal(cell):
+                self.play(cell)
+        return super().on_mouse_release(x, y, button, modifiers)
+
+    def on_mouse_drag(self, x, y, dx, dy, buttons, modifiers):
+        self._dragged = True
+        self.camera.pan(dx, dy)
+        return super().on_mouse_drag(x, y, dx, dy, buttons, modifiers)
+
+    def on_key_press(self, symbol, modifiers):
+        if symbol == pyglet.window.key.ESCAPE and self.app.scenes.history:
+            self.app.back()
+            return
+        if symbol == pyglet.window.key.SPACE and self.ai is not None:
+            # Ходить сразу с лучшим найденным на сейчас ходом
+            self.ai.stop()
+            return
+        if symbol == pyglet.window.key.Z and modifiers & pyglet.window.key.MOD_CTRL:
+            self.step_history(self.state.undo)
+            return
+        if symbol == pyglet.window.key.Y and modifiers & pyglet.window.key.MOD_CTRL:
+            self.step_history(self.state.redo)
+            return
+        if symbol == pyglet.window.key.HOME:
+            self.camera.fit(*self.renderer.bounds())
+            return
+        return super().on_key_press(symbol, modifiers)
+
+    def draw(self):
+        self.renderer.update_view(self.camera)
+        with self.camera.apply(self.app):
+            self.renderer.draw()
+        super().draw()
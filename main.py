@@ -1,7 +1,8 @@
 import pyglet
 import menu_scenes
 import config
-from Debuger import Debuger
+from scene_manager import SceneManager
+from Debuger import Debuger, COUNT_KEY
 from Background import Background
 
 
@@ -18,14 +19,32 @@ class Game(pyglet.window.Window):
         self.bg = Background(self)
         self.bg.config(config.background)
         
+        self.scenes = SceneManager(self, interface_size=config.interface_size)
         self.scene = menu_scenes.get_start_scene(self)
         
         pyglet.clock.schedule_interval(self.update, 1/60)
 
-    def switch_scene(self, new_scene):
+    def switch_scene(self, new_scene, remember=True):
+        '''Переход на сцену; прежняя попадает в историю или освобождается'''
         data = self.scene.get_record()
-        new_scene.notify(ctx={"prev_scene": self.scene}, **data)
-        self.scene = new_scene
+        new_scene.notify(ctx={}, **data)
+        old, self.scene = self.scene, new_scene
+        if remember:
+            self.scenes.push(old)
+        else:
+            self.scenes.discard(old)
+
+    def back(self):
+        '''Возврат к предыдущей сцене истории'''
+        scene = self.scenes.pop()
+        if scene is not None:
+            self.switch_scene(scene, remember=False)
+
+    def on_resize(self, width, height):
+        '''Пересчёт раскладки сцен под новый размер окна'''
+        super().on_resize(width, height)
+        if hasattr(self, 'scenes'):
+            self.scenes.relayout(width, height)
 
     def on_draw(self):
         '''Обновление и отрисовка окна'''
@@ -39,61 +58,61 @@ class Game(pyglet.window.Window):
     def update(self, dt):
         '''Обновление игры'''
         self.scene.update(dt)
+        self.scenes.update(dt)
         
         if self.DEBUG:
             self.debuger.debug(dt)
 
     def on_mouse_press(self, x, y, button, modifiers):
         """Нажатие кнопки мыши"""
-        self.scene.on_mouse_press(self, x, y, button, modifiers)
-    
-    def on_mouse_press(self, x, y, button, modifiers):
-        """Нажатие кнопки мыши"""
-        self.scene.on_mouse_press(self, x, y, button, modifiers)
+        self.scene.on_mouse_press(x, y, button, modifiers)
     
     def on_mouse_release(self, x, y, button, modifiers):
         """Отпускание кнопки мыши"""
-        self.scene.on_mouse_release(self, x, y, button, modifiers)
+        self.scene.on_mouse_release(x, y, button, modifiers)
     
     def on_mouse_drag(self, x, y, dx, dy, buttons, modifiers):
         """Перемещение мыши с нажатой кнопкой"""
-        self.scene.on_mouse_drag(self, x, y, dx, dy, buttons, modifiers)
+        self.scene.on_mouse_drag(x, y, dx, dy, buttons, modifiers)
     
     def on_mouse_enter(self, x, y):
         """Курсор мыши вошел в окно"""
-        self.scene.on_mouse_enter(self, x, y)
+        self.scene.on_mouse_enter(x, y)
     
     def on_mouse_leave(self, x, y):
         """Курсор мыши покинул окно"""
-        self.scene.on_mouse_leave(self, x, y)
+        self.scene.on_mouse_leave(x, y)
     
     def on_mouse_motion(self, x, y, dx, dy):
         """Перемещение мыши"""
-        self.scene.on_mouse_motion(self, x, y, dx, dy)
+        self.scene.on_mouse_motion(x, y, dx, dy)
     
     def on_mouse_scroll(self, x, y, scroll_x, scroll_y):
         """Прокрутка колесика мыши"""
-        self.scene.on_mouse_scroll(self, x, y, scroll_x, scroll_y)
+        self.scene.on_mouse_scroll(x, y, scroll_x, scroll_y)
     
     def on_key_press(self, symbol, modifiers):
         """Нажатие клавиши"""
-        self.scene.on_key_press(self, symbol, modifiers)
+        if self.DEBUG and symbol == COUNT_KEY:
+            self.debuger.count_resources()
+            return
+        self.scene.on_key_press(symbol, modifiers)
     
     def on_key_release(self, symbol, modifiers):
         """Отпускание клавиши"""
-        self.scene.on_key_release(self, symbol, modifiers)
+        self.scene.on_key_release(symbol, modifiers)
     
     def on_text(self, text):
         """Ввод текста (с учетом раскладки клавиатуры)"""
-        self.scene.on_text(self, text)
+        self.scene.on_text(text)
     
     def on_text_motion(self, motion):
         """Движение текстового курсора"""
-        self.scene.on_text_motion(self, motion)
+        self.scene.on_text_motion(motion)
     
     def on_text_motion_select(self, motion):
         """Движение текстового курсора с выделением"""
-        self.scene.on_text_motion_select(self, motion)
+        self.scene.on_text_motion_select(motion)
 
 if __name__ == "__main__":
     app = Game()
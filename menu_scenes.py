@@ -1,8 +1,16 @@
+import os
+import random
 import pyglet 
 
-from Scene import Scene, SceneConstructor
+from Scene import Scene
+from game_scenes import BoardScene
+from engine.generator import generate_map, FAMILIES
 
 PATH = 'menu_scene/'
+MAPS_PATH = 'maps/'
+QUICK_MATCH_CELLS = 400
+# Номера игроков за ИИ в быстрой игре
+QUICK_MATCH_AI = (1,)
 development_scene = 'dev'
 
 
@@ -12,22 +20,6 @@ class MainMenu(Scene):
         if cmd == 'exit_game':
             pyglet.app.exit()
             return
-        elif cmd == 'start_game':
-            scene = SceneConstructor(self.app).construct_scene(f'{PATH}select-on-game-menu.xml', SelectOnGameMenu)
-            self.app.switch_scene(scene)
-            return
-        elif cmd == 'open_settings':
-            scene = SceneConstructor(self.app).construct_scene(f'{PATH}settings.xml', InfoMenu)
-            self.app.switch_scene(scene)     
-            return 
-        elif cmd == "open_info":
-            scene = SceneConstructor(self.app).construct_scene(f'{PATH}info-menu.xml', InfoMenu)
-            self.app.switch_scene(scene)
-            return
-        elif cmd == 'run_tests':
-            scene = SceneConstructor(self.app).construct_scene(f'{PATH}tester-menu.xml', TesterMenu)
-            self.app.switch_scene(scene)
-            return
         return super().execute(cmd)
 
 class EscapeIsExit:
@@ -40,16 +32,29 @@ class EscapeIsExit:
 class WithCancel:
     def execute(self, cmd):
         if cmd == "cancel":
-            scene = self.ctx["prev_scene"]
-            self.app.switch_scene(scene)
+            self.app.back()
             return
         return super().execute(cmd)
 
 class SelectOnGameMenu(EscapeIsExit, WithCancel, Scene):
     '''Выбор в пункте меню играть'''
     def execute(self, cmd):
+        if cmd == 'quick_match':
+            scene = BoardScene(self.app, self.quick_match(), ai_players=QUICK_MATCH_AI)
+            self.app.switch_scene(scene)
+            return
         return super().execute(cmd)
 
+    def quick_match(self):
+        '''Случайная карта для быстрой игры'''
+        family = random.choice(FAMILIES)
+        seed = random.randrange(2**31)
+        os.makedirs(MAPS_PATH, exist_ok=True)
+        path = f'{MAPS_PATH}quick-match.gecm'
+        board = generate_map(path, family, QUICK_MATCH_CELLS, seed=seed)
+        self.app.debuger.log(f'Quick match map: {family}, seed {seed}, {board.n_cells} cells')
+        return path
+
 class SettingsMenu(EscapeIsExit, WithCancel, Scene):
     '''Основное меню настроек'''
     def execute(self, cmd):
@@ -77,15 +82,21 @@ class TesterMenu(EscapeIsExit, WithCancel, Scene):
         if cmd == 'hello':
             self.app.debuger.log('Привет, пидор')
             return
-        elif cmd == 'temp-dev-scene':
-            scene = SceneConstructor(self.app).construct_scene(f'{PATH}dev.xml', DevMenu)
-            self.app.switch_scene(scene)
-            return
         elif cmd=="debug-mod":
             self.app.DEBUG = not self.app.DEBUG
             return
 
         return super().execute(cmd)
 
+MainMenu.transitions = {
+    'start_game': (f'{PATH}select-on-game-menu.xml', SelectOnGameMenu),
+    'open_settings': (f'{PATH}settings.xml', InfoMenu),
+    'open_info': (f'{PATH}info-menu.xml', InfoMenu),
+    'run_tests': (f'{PATH}tester-menu.xml', TesterMenu),
+}
+TesterMenu.transitions = {
+    'temp-dev-scene': (f'{PATH}dev.xml', DevMenu),
+}
+
 def get_start_scene(app) -> Scene:
-    return SceneConstructor(app).construct_scene(f'{PATH}dev.xml', MainMenu)
\ No newline at end of file
+    return app.scenes.get(f'{PATH}dev.xml', MainMenu)
\ No newline at end of file
@@ -1,55 +1,125 @@
+import ast
+import functools
 import re
 
 def get_param(property, element, propertys, default=None):
     return element.get(property, propertys.get(property, default))
 
-def parse_expression(expression: str, propertys):
-    if not isinstance(expression, str):
-        return expression
-    if expression in {
-        'top': 1,
-        'right': 1,
-        'left': 0,
-        'bottom': 0,
-        'center': 0.5
-    }:
-        return expression
+# Единица -> имя параметра скомпилированной функции
+UNITS = {'vw': 'vw', 'vh': 'vh', 'em': 'em', 'rem': 'rem', '%': 'percent'}
+FUNCTIONS = {
+    'min': min,
+    'max': max,
+    'abs': abs,
+    'round': round,
+}
+ALIGNMENTS = {
+    'top': 1,
+    'right': 1,
+    'left': 0,
+    'bottom': 0,
+    'center': 0.5
+}
+EXPRESSION_CACHE = 4096
 
-    def replace_units(match):
-        value = match.group(1) or '1'
-        unit = match.group(2)
+_UNIT_PATTERN = re.compile(r'(\d+\.?\d*|\.\d+)(px|vw|vh|em|rem|%)')
+_CALC_PATTERN = re.compile(r'\bcalc\(')
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.UAdd, ast.USub,
+)
+
+
+class Expression:
+    """
+    Выражение размера, разобранное один раз.
+
+    Числа с единицами становятся параметрами функции: ``1.5em + 2px``
+    превращается в ``lambda em: 1.5*em + 2``. Выражения без единиц
+    вычисляются сразу при компиляции.
 
+    Attributes:
+        source (str): Исходная строка.
+        units (tuple): Единицы, от которых зависит значение.
+        constant: Значение выражения без единиц, иначе None.
+    """
+    __slots__ = ('source', 'units', 'constant', '_function')
+
+    def __init__(self, source: str, units: tuple, function):
+        self.source = source
+        self.units = units
+        self._function = function
+        self.constant = function() if not units else None
+
+    def __call__(self, ctx):
+        """Значение при единицах из ctx; отсутствующая единица считается нулём"""
+        if not self.units:
+            return self.constant
+        values = []
+        for unit in self.units:
+            value = ctx.get(unit, 0)
+            if isinstance(value, str):
+                value = parse_expression(value, ctx)
+            values.append(value)
+        return self._function(*values)
+
+    def __repr__(self):
+        return f"Expression({self.source!r}, units={self.units})"
+
+    def __reduce__(self):
+        # Функция не сериализуется, при загрузке выражение компилируется заново
+        return compile_expression, (self.source,)
+
+
+@functools.lru_cache(maxsize=EXPRESSION_CACHE)
+def compile_expression(expression: str) -> Expression:
+    """
+    Разбор выражения с calc(), единицами px/vw/vh/em/rem/% и функциями min/max/abs/round.
+
+    Результат кэшируется по строке выражения.
+
+    Raises:
+        SyntaxError: Выражение не разбирается или содержит недопустимые конструкции.
+    """
+    units = []
+
+    def replace_units(match):
+        value, unit = match.groups()
         if unit == 'px':
             return value
-        elif unit in ['vh', 'vw', 'em', 'rem', '%']:
-            return f'({value})*({propertys.get(unit, 0)})'
-        else:
-            return match.group(0)
-
-    def replace_calc(match):
-        inner_expr = match.group(1)
-        # Рекурсивно парсим выражение внутри calc
-        return str(parse_expression(inner_expr, propertys))
-
-    allowed_names = {
-        'min': min,
-        'max': max,
-        'abs': abs,
-        'round': round,
-        'calc': lambda x: x,  # Заглушка, фактически не используется
-    }
-
-    # Сначала обрабатываем calc()
-    calc_pattern = r'calc\(([^)]+)\)'
-    processed_expr = re.sub(calc_pattern, replace_calc, expression)
-    
-    # Затем обрабатываем единицы измерения
-    units_pattern = r'([-+]?[\d.]+)(px|vw|vh|em|rem|%)'
-    processed_expr = re.sub(units_pattern, replace_units, processed_expr)
-    
+        if unit not in units:
+            units.append(unit)
+        return f'({value}*{UNITS[unit]})'
+
+    # calc() — просто скобки, единицы внутри обрабатываются как везде
+    processed = _CALC_PATTERN.sub('(', expression)
+    processed = _UNIT_PATTERN.sub(replace_units, processed)
+    params = [UNITS[unit] for unit in units]
+
+    tree = ast.parse(processed.strip(), mode='eval')
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise SyntaxError(f'Unsupported expression: {expression!r}')
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise SyntaxError(f'Unsupported constant in {expression!r}')
+        if isinstance(node, ast.Name) and node.id not in FUNCTIONS and node.id not in params:
+            raise SyntaxError(f'Unknown name {node.id!r} in {expression!r}')
+        if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS):
+            raise SyntaxError(f'Unsupported call in {expression!r}')
+
+    code = compile(f"lambda {', '.join(params)}: ({processed.strip()})", '<expression>', 'eval')
+    function = eval(code, {'__builtins__': None, **FUNCTIONS})
+    return Expression(expression, tuple(units), function)
+
+
+def parse_expression(expression: str, propertys):
+    if not isinstance(expression, str):
+        return expression
+    if expression in ALIGNMENTS:
+        return expression
     try:
-        return eval(processed_expr, {'__builtins__': None}, allowed_names)
-    except:
+        return compile_expression(expression)(propertys)
+    except Exception:
         return 0
 
 def parse_gap(element, propertys, gap_name):
@@ -0,0 +1,384 @@
+import hashlib
+import os
+import pickle
+import xml.etree.ElementTree as ET
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from css_parser import CSSParser
+from parsers import parse_expression, compile_expression, ALIGNMENTS
+from UIelements import TextUIElement, ButtonUIElement, CheckButton, Entry, RangeSlider, SelectorInRow
+
+CACHE_PATH = 'menu_scene/cache/'
+# Файлы кэша другой версии формата игнорируются
+TEMPLATE_VERSION = 2
+
+WIDGETS = {
+    'text': TextUIElement,
+    'button': ButtonUIElement,
+    'checkbutton': CheckButton,
+    'entry': Entry,
+    'rangeslider': RangeSlider,
+    'selector_in_row': SelectorInRow,
+}
+# Остальные теги — контейнеры, они только передают свойства вниз
+LIST_TAG = 'list'
+
+# Единицы вычисляются по порядку: каждая может ссылаться на предыдущие
+UNITS = ('vw', 'vh', 'rem', 'em')
+UNITS_SET = frozenset(UNITS)
+EXPRESSIONS = frozenset({
+    'x', 'y', 'width', 'height', 'size', 'padx', 'pady', 'thumb_radius', 'arrow_size',
+})
+
+# Множитель для чисел, попавших в шаблон уже вычисленными
+_ONE = compile_expression('1')
+_templates: Dict[Tuple[str, int, int], 'SceneTemplate'] = {}
+
+
+class WidgetTemplate(NamedTuple):
+    """
+    One widget of a compiled scene: its class and fully resolved attributes.
+
+    ``bound`` and ``ctx_bound`` keep, for the values of ``attrib`` and
+    ``ctx`` that came from expressions, the terms to compute them again
+    under other units, see :func:`evaluate`.
+    """
+    widget: type
+    tag: str
+    attrib: Dict
+    ctx: Dict
+    bound: Dict
+    ctx_bound: Dict
+
+    def values(self, root: Dict) -> Tuple[Dict, Dict]:
+        """Get ``attrib`` and ``ctx`` computed for the units of a resolved root context."""
+        attrib = dict(self.attrib)
+        for name, terms in self.bound.items():
+            attrib[name] = evaluate(terms, root)
+        ctx = dict(self.ctx)
+        ctx.update((unit, root[unit]) for unit in UNITS if unit in root)
+        for name, terms in self.ctx_bound.items():
+            ctx[name] = evaluate(terms, root)
+        return attrib, ctx
+
+
+class _ReadRecorder(dict):
+    """Context that remembers which keys a widget looked up."""
+
+    def __init__(self, values: Dict):
+        super().__init__(values)
+        self.read = set()
+
+    def get(self, key, default=None):
+        self.read.add(key)
+        return super().get(key, default)
+
+    def __getitem__(self, key):
+        self.read.add(key)
+        return super().__getitem__(key)
+
+
+class SceneTemplate:
+    """
+    A scene XML file compiled for one viewport.
+
+    Compilation walks the tree once: stylesheets are applied, inherited
+    properties are merged, list layouts are placed and every size or
+    position expression is evaluated to a number. What is left is the flat
+    list of widgets in document order, so building a scene is a loop of
+    constructor calls without parsing.
+
+    Expression values keep their compiled terms. The first instantiation
+    also records which context keys every widget reads. Together they give
+    the units each widget depends on, so :meth:`relayout` after a resize or
+    a change of interface scale touches only the widgets whose values
+    actually change. It moves a widget that can move, and builds it anew
+    otherwise.
+
+    Attributes:
+        path (str): The XML file.
+        root (dict): The root context the template was compiled with.
+        sources (dict): Modification time of the XML and every stylesheet it uses.
+        widgets (list): The widgets, see :class:`WidgetTemplate`.
+    """
+
+    def __init__(self, path: str, root: Dict, sources: Dict[str, Optional[int]], widgets: List[WidgetTemplate]):
+        self.path = path
+        self.root = root
+        self.sources = sources
+        self.widgets = widgets
+        # Ключи контекста, прочитанные каждым виджетом; заполняются при первой сборке
+        self.reads = None
+
+    @classmethod
+    def compile(cls, path: str, root_ctx: Dict) -> 'SceneTemplate':
+        """
+        Compile a scene file.
+
+        Args:
+            path: The XML file.
+            root_ctx: Viewport size in ``vw``/``vh`` and the default properties.
+        """
+        root = resolve_root(root_ctx)
+        bound = {}
+        for name in EXPRESSIONS.intersection(root_ctx):
+            terms = _bind(root_ctx[name])
+            if terms is not None:
+                bound[name] = terms
+        sources = {os.path.abspath(path): _mtime(path)}
+        element = ET.parse(path).getroot()
+        sheets = _stylesheets(element, os.path.dirname(path), sources)
+        widgets = []
+        _compile_element(element, dict(root), bound, sheets, widgets)
+        return cls(path, root, sources, widgets)
+
+    def is_fresh(self, root: Optional[Dict] = None) -> bool:
+        """Check that no source file has changed and the root context is the same."""
+        if root is not None and root != self.root:
+            return False
+        return all(_mtime(source) == mtime for source, mtime in self.sources.items())
+
+    def iter_units(self, scene):
+        """Create the widgets of the template for a scene one at a time."""
+        scene.template, scene.layout_root = self, self.root
+        record = self.reads is None
+        reads = []
+        for spec in self.widgets:
+            ctx = _ReadRecorder(spec.ctx) if record else spec.ctx
+            yield _build(spec, spec.attrib, ctx, scene)
+            if record:
+                reads.append(frozenset(ctx.read))
+        if record:
+            self.reads = reads
+
+    def dependencies(self, index: int) -> frozenset:
+        """Get the units the values of a widget depend on."""
+        spec = self.widgets[index]
+        read = self.reads[index] if self.reads is not None else spec.ctx.keys()
+        units = set(read).intersection(UNITS)
+        for terms in spec.bound.values():
+            units.update(_units(terms))
+        for name in read:
+            if name in spec.ctx_bound and name not in spec.attrib:
+                units.update(_units(spec.ctx_bound[name]))
+        return frozenset(units)
+
+    def relayout(self, scene, root_ctx: Dict) -> int:
+        """
+        Bring the widgets of a scene built from this template to new units.
+
+        Only widgets depending on a unit whose value has changed are looked
+        at. A widget whose only change is its position is moved, if its class
+        supports moving; any other widget is built again from the template.
+
+        Args:
+            scene: The scene, its ``units`` in template order.
+            root_ctx: The new root context.
+
+        Returns:
+            Number of widgets moved or rebuilt.
+        """
+        root = resolve_root(root_ctx)
+        old_root = scene.layout_root
+        changed = {unit for unit in UNITS if old_root.get(unit) != root.get(unit)}
+        scene.layout_root = root
+        if not changed or self.reads is None:
+            return 0
+        touched = 0
+        rebuilt = False
+        for index, spec in enumerate(self.widgets):
+            if not changed & self.dependencies(index):
+                continue
+            old_attrib, old_ctx = spec.values(old_root)
+            attrib, ctx = spec.values(root)
+            read = self.reads[index]
+            names = set(spec.bound) | (read - UNITS_SET)
+            differs = {name for name in names
+                       if _effective(name, attrib, ctx) != _effective(name, old_attrib, old_ctx)}
+            if not differs and not changed & read:
+                continue
+            touched += 1
+            unit = scene.units[index]
+            if differs <= {'x', 'y'} and not changed & read and getattr(unit, 'movable', False):
+                unit.box.goto(_effective('x', attrib, ctx), _effective('y', attrib, ctx))
+            else:
+                unit.release()
+                scene.units[index] = _build(spec, attrib, ctx, scene)
+                rebuilt = True
+        if rebuilt:
+            scene.attach(scene.units)
+        return touched
+
+    def instantiate(self, scene) -> list:
+        """Create all widgets of the template for a scene."""
+        return list(self.iter_units(scene))
+
+    def save(self, cache_dir: str):
+        """Write the template into ``cache_dir``."""
+        os.makedirs(cache_dir, exist_ok=True)
+        path = _cache_path(cache_dir, self.path, self.root)
+        # Сначала во временный файл: оборванная запись не испортит кэш
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as file:
+            pickle.dump((TEMPLATE_VERSION, self), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, cache_dir: str, path: str, root: Dict) -> Optional['SceneTemplate']:
+        """Read a cached template, None if it is missing or out of date."""
+        try:
+            with open(_cache_path(cache_dir, path, root), 'rb') as file:
+                version, template = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError):
+            return None
+        if version != TEMPLATE_VERSION or not template.is_fresh(root):
+            return None
+        return template
+
+
+def resolve_root(root_ctx: Dict) -> Dict:
+    """Evaluate the units and expressions of a root context to numbers."""
+    root = dict(root_ctx)
+    for unit in UNITS:
+        if unit in root:
+            root[unit] = parse_expression(root[unit], root)
+    for name in EXPRESSIONS.intersection(root):
+        root[name] = parse_expression(root[name], root)
+    return root
+
+
+def evaluate(terms: tuple, root: Dict) -> float:
+    """Compute a bound value: the sum of ``coefficient * expression(root)`` over its terms."""
+    return sum(coefficient * expression(root) for coefficient, expression in terms)
+
+
+def compile_scene(path: str, root_ctx: Dict, cache_dir: Optional[str] = CACHE_PATH) -> SceneTemplate:
+    """
+    Get the compiled template of a scene file.
+
+    Templates are kept in memory and on disk under the file and the viewport
+    size, and compiled again only when the file or one of its stylesheets
+    has changed.
+
+    Args:
+        path: The XML file.
+        root_ctx: Viewport size in ``vw``/``vh`` and the default properties.
+        cache_dir: Directory of cached templates, memory only if None.
+    """
+    root = resolve_root(root_ctx)
+    key = (os.path.abspath(path), root.get('vw'), root.get('vh'))
+    template = _templates.get(key)
+    if template is not None and template.is_fresh(root):
+        return template
+    template = SceneTemplate.load(cache_dir, path, root) if cache_dir is not None else None
+    if template is None:
+        template = SceneTemplate.compile(path, root_ctx)
+        if cache_dir is not None:
+            template.save(cache_dir)
+    _templates[key] = template
+    return template
+
+
+def _stylesheets(root: ET.Element, base: str, sources: Dict[str, Optional[int]]) -> list:
+    """Read the stylesheets named by ``style`` attributes; they apply to the whole document."""
+    sheets = []
+    for element in root.iter():
+        style = element.get('style')
+        if not style:
+            continue
+        path = os.path.join(base, style)
+        # Отсутствующий файл тоже запоминается: его появление пересоберёт шаблон
+        mtime = sources[os.path.abspath(path)] = _mtime(path)
+        if mtime is None:
+            continue
+        parser = CSSParser()
+        parser.parse_file(path)
+        sheets.append(parser.get_stylesheet())
+    return sheets
+
+
+def _compile_element(element: ET.Element, ctx: Dict, bound: Dict, sheets: list,
+                     out: List[WidgetTemplate]):
+    # Атрибуты элемента важнее стилей, стили важнее унаследованного
+    own = {}
+    for sheet in sheets:
+        own.update(sheet.get_styles_for_element(element))
+    own.update(element.attrib)
+    own.pop('style', None)
+    own_bound = {}
+    for name in EXPRESSIONS.intersection(own):
+        terms = _bind(own[name])
+        if terms is None:
+            own[name] = parse_expression(own[name], ctx)
+        else:
+            own[name] = evaluate(terms, ctx)
+            own_bound[name] = terms
+
+    widget = WIDGETS.get(element.tag)
+    if widget is not None:
+        out.append(WidgetTemplate(widget, element.tag, own, ctx, own_bound, bound))
+
+    inner = {**ctx, **own}
+    inner_bound = {name: terms for name, terms in bound.items() if name not in own}
+    inner_bound.update(own_bound)
+    for index, child in enumerate(element):
+        if not isinstance(child.tag, str):
+            continue
+        child_ctx, child_bound = inner, inner_bound
+        if element.tag == LIST_TAG:
+            # Дети списка идут друг за другом с шагом padx/pady
+            child_ctx, child_bound = dict(inner), dict(inner_bound)
+            _place(child_ctx, child_bound, 'x', 'padx', index)
+            _place(child_ctx, child_bound, 'y', 'pady', -index)
+        _compile_element(child, child_ctx, child_bound, sheets, out)
+
+
+def _place(ctx: Dict, bound: Dict, name: str, step: str, shift: int):
+    """Shift a coordinate of a list child by ``shift`` steps, with its terms if they are known."""
+    static = any(key in ctx and key not in bound for key in (name, step))
+    ctx[name] = ctx.get(name, 0) + shift * ctx.get(step, 0)
+    if static:
+        bound.pop(name, None)
+    else:
+        bound[name] = bound.get(name, ()) + tuple((shift * c, e) for c, e in bound.get(step, ()))
+
+
+def _bind(value) -> Optional[tuple]:
+    """Get the terms of a value, None if it is not an expression."""
+    if isinstance(value, (int, float)):
+        return ((value, _ONE),)
+    if not isinstance(value, str) or value in ALIGNMENTS:
+        return None
+    try:
+        return ((1, compile_expression(value)),)
+    except (SyntaxError, ArithmeticError, TypeError, ValueError):
+        return None
+
+
+def _units(terms: tuple) -> set:
+    return {unit for _, expression in terms for unit in expression.units}
+
+
+def _effective(name: str, attrib: Dict, ctx: Dict):
+    # Виджеты берут значение из атрибутов, а при его отсутствии из контекста
+    return attrib[name] if name in attrib else ctx.get(name)
+
+
+def _build(spec: WidgetTemplate, attrib: Dict, ctx: Dict, scene):
+    unit = spec.widget(ET.Element(spec.tag, attrib), ctx=ctx)
+    if hasattr(unit, 'scene'):
+        unit.scene = scene
+    return unit
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _cache_path(cache_dir: str, path: str, root: Dict) -> str:
+    name = os.path.splitext(os.path.basename(path))[0]
+    digest = hashlib.sha1(f'{os.path.abspath(path)}|{root.get("vw")}x{root.get("vh")}'.encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f'{name}.{digest}.scene.pickle')
@@ -0,0 +1,164 @@
+import time
+from collections import OrderedDict, deque
+
+from Scene import Scene, SceneConstructor
+from scene_compiler import compile_scene
+
+# Оценка памяти сцены: объект виджета и вершины одного глифа подписи
+WIDGET_BYTES = 4096
+GLYPH_BYTES = 256
+MEMORY_LIMIT = 4 << 20
+# Время кадра на подготовку сцен и кадр, считающийся опоздавшим, в секундах
+PRELOAD_BUDGET = 0.004
+LATE_FRAME = 1.5 / 60
+# Сколько предыдущих сцен помнит история переходов
+HISTORY_DEPTH = 8
+
+
+def scene_memory(scene) -> int:
+    '''Примерный объём памяти сцены в байтах'''
+    total = 0
+    for unit in scene.units:
+        total += WIDGET_BYTES
+        label = getattr(unit, 'label', None)
+        if label is not None:
+            total += GLYPH_BYTES * len(label.text)
+    return total
+
+
+class SceneManager:
+    '''
+    Пул готовых сцен меню и история переходов.
+
+    Сцены хранятся по (путь, класс) в порядке последнего использования;
+    при превышении лимита памяти выбрасываются самые давние, кроме текущей.
+    Сцены, куда можно перейти из полученной, ставятся в очередь и строятся
+    по нескольку виджетов в свободных кадрах, так что переход не ждёт сборки.
+
+    История хранит не больше history_depth предыдущих сцен. Сцена, которой
+    нет ни в пуле, ни в истории и которая не показана, освобождается сразу.
+    '''
+    def __init__(self, app, memory_limit=MEMORY_LIMIT, frame_budget=PRELOAD_BUDGET,
+                 history_depth=HISTORY_DEPTH, interface_size='normal'):
+        self.app = app
+        self.history_depth = history_depth
+        self.history = []
+        self.constructor = SceneConstructor(app, interface_size)
+        self.memory_limit = memory_limit
+        self.frame_budget = frame_budget
+        self.memory = 0
+        self._pool = OrderedDict()
+        self._queue = deque()
+        # (ключ, сцена, итератор виджетов, готовые виджеты) собираемой сцены
+        self._building = None
+
+    def __contains__(self, key):
+        return key in self._pool
+
+    def __len__(self):
+        return len(self._pool)
+
+    def get(self, path, scene=Scene):
+        '''Сцена из пула, недостроенная достраивается, отсутствующая создаётся'''
+        key = (path, scene)
+        if key in self._pool:
+            self._pool.move_to_end(key)
+            result = self._pool[key][0]
+        elif self._building is not None and self._building[0] == key:
+            result = self._finish(self._building)
+        else:
+            result = self.constructor.construct_scene(path, scene)
+            self._store(key, result)
+        self.preload(result)
+        return result
+
+    def push(self, scene):
+        '''Запомнить сцену, с которой ушли; не поместившиеся в историю освобождаются'''
+        self.history.append(scene)
+        while len(self.history) > self.history_depth:
+            self.discard(self.history.pop(0))
+
+    def pop(self):
+        '''Последняя сцена истории или None'''
+        return self.history.pop() if self.history else None
+
+    def discard(self, scene):
+        '''Освободить сцену, если она не показана и не лежит ни в пуле, ни в истории'''
+        if scene is getattr(self.app, 'scene', None) or any(scene is kept for kept in self.history):
+            return
+        if any(scene is kept for kept, _ in self._pool.values()):
+            return
+        scene.release()
+
+    def relayout(self, width=None, height=None, interface_size=None):
+        '''Смена размера окна или масштаба: все живые сцены пересчитываются за один проход'''
+        self.constructor.configure(width, height, interface_size)
+        root_ctx = self.constructor.root_ctx
+        scenes = {}
+        for scene in (getattr(self.app, 'scene', None), *self.history,
+                      *(scene for scene, _ in self._pool.values())):
+            if scene is not None:
+                scenes[id(scene)] = scene
+        touched = sum(scene.relayout(root_ctx) for scene in scenes.values())
+        # Недостроенная сцена начинается заново уже с новыми единицами
+        if self._building is not None:
+            key, scene, _, units = self._building
+            for unit in units:
+                unit.release()
+            self._building = None
+            self._queue.appendleft(key)
+        return touched
+
+    def preload(self, scene):
+        '''Очередь на подготовку всех сцен, доступных из данной'''
+        for key in scene.transitions.values():
+            if key not in self._pool and key not in self._queue:
+                self._queue.append(key)
+
+    def update(self, dt):
+        '''Подготовка сцен из очереди в пределах бюджета кадра; опоздавшие кадры пропускаются'''
+        if dt > LATE_FRAME:
+            return
+        deadline = time.perf_counter() + self.frame_budget
+        while time.perf_counter() < deadline:
+            if self._building is None:
+                if not self._queue:
+                    return
+                key = self._queue.popleft()
+                if key in self._pool:
+                    continue
+                path, scene_class = key
+                template = compile_scene(path, self.constructor.root_ctx)
+                scene = scene_class(self.app)
+                self._building = (key, scene, template.iter_units(scene), [])
+                continue
+            units = self._building[3]
+            unit = next(self._building[2], None)
+            if unit is None:
+                self._finish(self._building)
+            else:
+                units.append(unit)
+
+    def _finish(self, building):
+        key, scene, iterator, units = building
+        units.extend(iterator)
+        scene.attach(units)
+        self._building = None
+        self._store(key, scene)
+        return scene
+
+    def _store(self, key, scene):
+        self._pool[key] = (scene, scene_memory(scene))
+        self.memory += self._pool[key][1]
+        self._evict()
+
+    def _evict(self):
+        for key in list(self._pool):
+            if self.memory <= self.memory_limit:
+                break
+            scene, cost = self._pool[key]
+            if scene is getattr(self.app, 'scene', None) or key == next(reversed(self._pool)):
+                continue
+            del self._pool[key]
+            self.memory -= cost
+            self.discard(scene)
@@ -0,0 +1,263 @@
+import math
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+
+CHUNK_CELLS = 1024
+
+
+def boxes_intersect(boxes: np.ndarray, rect: Tuple[float, float, float, float]) -> np.ndarray:
+    """
+    Check which boxes overlap a rectangle.
+
+    Args:
+        boxes: ``(n, 4)`` array of ``(left, bottom, right, top)``.
+        rect: ``(left, bottom, right, top)``.
+
+    Returns:
+        Boolean mask of the overlapping boxes.
+    """
+    left, bottom, right, top = rect
+    return ((boxes[:, 0] <= right) & (boxes[:, 2] >= left) &
+            (boxes[:, 1] <= top) & (boxes[:, 3] >= bottom))
+
+
+class ChunkGrid:
+    """
+    Uniform grid over cell positions that splits the board into chunks.
+
+    Every cell falls into the grid square holding its centre. The cells of a
+    chunk are stored contiguously in ``order``, so per-chunk data can be
+    built with one argsort and ``reduceat`` instead of a loop over cells.
+
+    Attributes:
+        positions (np.ndarray): The indexed cell centres.
+        origin (np.ndarray): World position of the grid corner.
+        step (float): Side of a grid square in world units.
+        cols (int): Number of grid columns.
+        rows (int): Number of grid rows.
+        chunk_of (np.ndarray): Chunk id of every cell.
+        order (np.ndarray): Cell ids sorted by chunk.
+        starts (np.ndarray): Offset of each chunk in ``order``.
+        counts (np.ndarray): Number of cells in each chunk.
+        slot (np.ndarray): Position of every cell inside its chunk.
+        boxes (np.ndarray): ``(n_chunks, 4)`` bounding box of the cells of each
+            chunk grown by ``margin``, empty chunks never intersect anything.
+    """
+
+    def __init__(self, positions: np.ndarray, margin: float = 0.0, cells_per_chunk: int = CHUNK_CELLS):
+        """
+        Build the grid.
+
+        Args:
+            positions: Cell centres, shape ``(n_cells, 2)``.
+            margin: Extra size added around every cell, e.g. its radius.
+            cells_per_chunk: Average number of cells a chunk should hold.
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        self.positions = positions
+        n = len(positions)
+        low = positions.min(axis=0) if n else np.zeros(2)
+        high = positions.max(axis=0) if n else np.ones(2)
+        extent = np.maximum(high - low, 1e-9)
+
+        area = extent[0] * extent[1]
+        self.step = float(np.sqrt(area * cells_per_chunk / max(n, 1)))
+        self.step = max(self.step, float(extent.max()) / 4096, 1e-9)
+        self.origin = low
+        self.cols, self.rows = (np.floor(extent / self.step).astype(np.int64) + 1).tolist()
+
+        col, row = self._grid_coords(positions)
+        self.chunk_of = row * self.cols + col
+        self.order = np.argsort(self.chunk_of, kind='stable')
+        self.counts = np.bincount(self.chunk_of, minlength=self.n_chunks)
+        self.starts = np.concatenate(([0], np.cumsum(self.counts)[:-1]))
+        self.slot = np.empty(n, dtype=np.int64)
+        self.slot[self.order] = np.arange(n) - np.repeat(self.starts, self.counts)
+
+        self.boxes = np.empty((self.n_chunks, 4))
+        self.boxes[:] = (np.inf, np.inf, -np.inf, -np.inf)
+        filled = self.counts > 0
+        if n:
+            starts = self.starts[filled]
+            for axis in range(2):
+                column = positions[self.order, axis]
+                self.boxes[filled, axis] = np.minimum.reduceat(column, starts) - margin
+                self.boxes[filled, axis + 2] = np.maximum.reduceat(column, starts) + margin
+
+    def _grid_coords(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        cell = np.floor((points - self.origin) / self.step).astype(np.int64)
+        return np.clip(cell[:, 0], 0, self.cols - 1), np.clip(cell[:, 1], 0, self.rows - 1)
+
+    @property
+    def n_chunks(self) -> int:
+        """Get the number of grid squares, empty ones included."""
+        return self.cols * self.rows
+
+    def cells(self, chunk: int) -> np.ndarray:
+        """Get the ids of the cells of a chunk."""
+        start = self.starts[chunk]
+        return self.order[start:start + self.counts[chunk]]
+
+    def rects(self) -> np.ndarray:
+        """Get the grid square of every chunk as ``(left, bottom, right, top)``."""
+        chunk = np.arange(self.n_chunks)
+        row, col = np.divmod(chunk, self.cols)
+        left = self.origin[0] + col * self.step
+        bottom = self.origin[1] + row * self.step
+        return np.stack((left, bottom, left + self.step, bottom + self.step), axis=1)
+
+    def visible(self, rect: Tuple[float, float, float, float]) -> np.ndarray:
+        """Get the mask of chunks whose cells may overlap a world rectangle."""
+        return boxes_intersect(self.boxes, rect)
+
+    def pick(self, x: float, y: float, radius: float) -> Optional[int]:
+        """
+        Find the cell nearest to a point within a radius.
+
+        Only the chunks overlapping the square around the point are searched.
+
+        Args:
+            x: World coordinate of the point.
+            y: World coordinate of the point.
+            radius: Largest distance to a cell centre.
+
+        Returns:
+            The cell id, or None if no cell is close enough.
+        """
+        corners = np.array([(x - radius, y - radius), (x + radius, y + radius)])
+        cols, rows = self._grid_coords(corners)
+        chunks = (np.arange(rows[0], rows[1] + 1)[:, None] * self.cols +
+                  np.arange(cols[0], cols[1] + 1)).ravel()
+        cells = np.concatenate([self.cells(chunk) for chunk in chunks])
+        if not len(cells):
+            return None
+        dist = np.sum((self.positions[cells] - (x, y)) ** 2, axis=1)
+        best = int(np.argmin(dist))
+        return int(cells[best]) if dist[best] <= radius ** 2 else None
+
+
+class HitIndex:
+    """
+    Bucket grid of screen rectangles for pointer hit-testing.
+
+    Every item is stored in the buckets its rectangle overlaps, so finding
+    the element under the cursor looks at one bucket instead of every
+    element. Moving an item only re-buckets it when its rectangle crosses
+    into other buckets. Items added later are considered on top; an item may
+    refine its rectangle with a ``hit_test(x, y)`` method. The
+    ``background`` item, if set, is returned when nothing else is hit.
+
+    Attributes:
+        bucket_size (float): Side of a bucket in pixels.
+        background: The item under everything else, e.g. the game board.
+    """
+
+    def __init__(self, bucket_size: float = 64.0, background=None):
+        """
+        Initialize an empty index.
+
+        Args:
+            bucket_size: Side of a bucket in pixels.
+            background: The item returned when no rectangle is hit.
+        """
+        self.bucket_size = bucket_size
+        self.background = background
+        self._buckets: Dict[Tuple[int, int], List] = {}
+        self._rects: Dict[int, Tuple] = {}
+        self._spans: Dict[int, Tuple[int, int, int, int]] = {}
+        self._z: Dict[int, int] = {}
+        self._counter = 0
+
+    def __len__(self) -> int:
+        return len(self._rects)
+
+    def __contains__(self, item) -> bool:
+        return id(item) in self._rects
+
+    def _span(self, rect) -> Tuple[int, int, int, int]:
+        left, bottom, right, top = rect
+        size = self.bucket_size
+        return (int(math.floor(left / size)), int(math.floor(bottom / size)),
+                int(math.floor(right / size)), int(math.floor(top / size)))
+
+    def _buckets_of(self, span):
+        c0, r0, c1, r1 = span
+        for col in range(c0, c1 + 1):
+            for row in range(r0, r1 + 1):
+                yield col, row
+
+    def insert(self, item, rect: Tuple[float, float, float, float]):
+        """
+        Add an item on top of the others.
+
+        Args:
+            item: The element, any object.
+            rect: Its screen rectangle ``(left, bottom, right, top)``.
+        """
+        if item in self:
+            self.remove(item)
+        key = id(item)
+        self._counter += 1
+        self._z[key] = self._counter
+        self._rects[key] = (item, tuple(rect))
+        self._spans[key] = span = self._span(rect)
+        for bucket in self._buckets_of(span):
+            self._buckets.setdefault(bucket, []).append(item)
+
+    def update(self, item, rect: Tuple[float, float, float, float]):
+        """Change the rectangle of an item, keeping its stacking order."""
+        key = id(item)
+        if key not in self._rects:
+            self.insert(item, rect)
+            return
+        self._rects[key] = (item, tuple(rect))
+        span = self._span(rect)
+        if span == self._spans[key]:
+            return
+        self._unbucket(item)
+        self._spans[key] = span
+        for bucket in self._buckets_of(span):
+            self._buckets.setdefault(bucket, []).append(item)
+
+    def _unbucket(self, item):
+        for bucket in self._buckets_of(self._spans[id(item)]):
+            items = self._buckets[bucket]
+            items.remove(item)
+            if not items:
+                del self._buckets[bucket]
+
+    def remove(self, item):
+        """Remove an item; unknown items are ignored."""
+        key = id(item)
+        if key not in self._rects:
+            return
+        self._unbucket(item)
+        del self._rects[key], self._spans[key], self._z[key]
+
+    def clear(self):
+        """Remove every item except the background."""
+        self._buckets.clear()
+        self._rects.clear()
+        self._spans.clear()
+        self._z.clear()
+
+    def query(self, x: float, y: float) -> List:
+        """Get the items whose rectangles contain a point, topmost first."""
+        size = self.bucket_size
+        items = self._buckets.get((int(math.floor(x / size)), int(math.floor(y / size))), ())
+        found = []
+        for item in items:
+            left, bottom, right, top = self._rects[id(item)][1]
+            if left <= x <= right and bottom <= y <= top:
+                found.append(item)
+        found.sort(key=lambda item: self._z[id(item)], reverse=True)
+        return found
+
+    def hit(self, x: float, y: float):
+        """Get the topmost item under a point, or the background if there is none."""
+        for item in self.query(x, y):
+            hit_test = getattr(item, 'hit_test', None)
+            if hit_test is None or hit_test(x, y):
+                return item
+        return self.background
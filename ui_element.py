@@ -2,7 +2,6 @@ from box_model import UIBox
 import pyglet
 import colorsys
 from Background import Background
-from Color import ColorMamager
 from parsers import *
 
 class UIEvents:
@@ -27,6 +26,12 @@ class UIEvents:
     def on_mouse_scroll(self, x, y, scroll_x, scroll_y):
         """Прокрутка колесика мыши"""
     
+    def on_mouse_over(self, x, y):
+        """Курсор мыши наведён на элемент"""
+    
+    def on_mouse_out(self, x, y):
+        """Курсор мыши ушёл с элемента"""
+    
     def on_key_press(self, symbol, modifiers):
         """Нажатие клавиши"""
     
@@ -47,6 +52,9 @@ class UIEvents:
     
     def update(self, dt):
         """Обновление элемента"""
+    
+    def release(self):
+        """Освобождение ресурсов видеокарты"""
 
 class UIElement(UIEvents):
     def __init__(self, element, properties, extra=None):
@@ -81,6 +89,10 @@ class UIElement(UIEvents):
         if self.bg:
             self.bg.draw()
 
+    def release(self):
+        if getattr(self, 'bg', None):
+            self.bg._sprite.delete()
+
 class TextUIELement(UIElement):
     def __init__(self, element, propertys, extra=None):
         super().__init__(element, propertys, extra)
@@ -98,4 +110,8 @@ class TextUIELement(UIElement):
 
     def draw(self):
         super().draw()
-        self.lable.draw()
\ No newline at end of file
+        self.lable.draw()
+
+    def release(self):
+        super().release()
+        self.lable.delete()
\ No newline at end of file